@@ -0,0 +1,12 @@
+import os
+
+
+class BatchConfig:
+    # Giới hạn cho /predict-batch và /analyze-batch (tính sau khi giải nén zip/tar)
+    MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 256))
+    MAX_TOTAL_BYTES = int(os.getenv("BATCH_MAX_TOTAL_BYTES", 256 * 1024 * 1024))
+    # Số ảnh xử lý chung một lượt: decode song song, detect + classify chung một batch.
+    # Chunk tiếp theo được decode trong lúc chunk hiện tại chạy model.
+    CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", 8))
+    IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+    ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
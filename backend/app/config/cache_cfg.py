@@ -0,0 +1,16 @@
+import os
+from pathlib import Path
+
+
+class ResultCacheConfig:
+    ROOT_DIR = Path(__file__).parent.parent.parent
+
+    MAX_ENTRIES = 2048
+    TTL_SECONDS = 3600
+    # Tầng thứ 2 trên đĩa (sqlite), giữ kết quả qua các lần restart
+    DISK_ENABLED = os.getenv("RESULT_CACHE_DISK", "0") == "1"
+    DISK_PATH = ROOT_DIR / "cache" / "result_cache.sqlite3"
+    DISK_MAX_ENTRIES = 100_000
+    # Ghi đĩa ở thread nền theo lô; queue đầy thì bỏ bản ghi (chỉ là cache)
+    DISK_QUEUE_SIZE = 1024
+    DISK_BATCH_SIZE = 64
@@ -0,0 +1,18 @@
+import os
+from pathlib import Path
+
+
+class CaptureConfig:
+    ROOT_DIR = Path(__file__).parent.parent.parent
+
+    CAPTURE_DIR = ROOT_DIR / "cache" / "capture_data"
+    PREDICTION_LOG_DIR = ROOT_DIR / "cache" / "prediction_log"
+
+    # Tỉ lệ request được lưu lại (1.0 = lưu tất cả, 0.0 = tắt)
+    SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", 1.0))
+    # Queue đầy thì bỏ record thay vì chặn request
+    QUEUE_SIZE = 1024
+    BATCH_SIZE = 64
+    FLUSH_INTERVAL = 1.0
+    # Xoay vòng file log khi vượt quá kích thước này
+    MAX_LOG_BYTES = 64 * 1024 * 1024
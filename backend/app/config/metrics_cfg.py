@@ -0,0 +1,11 @@
+import os
+
+
+class MetricsConfig:
+    # Tắt hẳn việc đo (timer thành no-op) bằng METRICS_ENABLED=0
+    ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    # Bucket (giây) cho histogram thời gian từng stage và từng request
+    STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    # Hệ số EMA cho fps của mỗi WebSocket session
+    FPS_SMOOTHING = 0.1
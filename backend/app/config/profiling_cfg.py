@@ -0,0 +1,20 @@
+import os
+
+
+class ProfilingConfig:
+    # Chỉ profile khi server bật PROFILING_ENABLED=1 VÀ request tự yêu cầu (header / query)
+    ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+    HEADER = "x-profile"
+    QUERY_PARAM = "profile"
+    # Tỉ lệ request có cờ thật sự được profile + khoảng nghỉ tối thiểu giữa hai lần
+    SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 1.0))
+    MIN_INTERVAL_SECONDS = float(os.getenv("PROFILING_MIN_INTERVAL", 5.0))
+    # WebSocket: số frame được profile kể từ khi kết nối
+    WS_FRAMES = int(os.getenv("PROFILING_WS_FRAMES", 30))
+    # Profile dài hơn mức này bị dừng (stream lớn, client treo)
+    MAX_SECONDS = 60.0
+    # Chu kỳ lấy mẫu stack Python
+    SAMPLE_INTERVAL_MS = 5.0
+    RECORD_SHAPES = True
+    # Giữ lại số profile mới nhất, xoá bớt profile cũ
+    MAX_PROFILES = 50
@@ -1,2 +1,4 @@
 from .http import LogMiddleware
-from .cors import setup_cors
\ No newline at end of file
+from .profiling import ProfileMiddleware
+from .body_limit import BodySizeLimitMiddleware
+from .cors import setup_cors
@@ -0,0 +1,47 @@
+from typing import Dict
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+# Boundary + header của từng part multipart, cộng thêm vào giới hạn nội dung file
+MULTIPART_OVERHEAD_BYTES = 256 * 1024
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects upload bodies over the limit of their route with 413 before the route handler
+    (and Starlette's multipart parser, which spools the whole body) reads them: right away from
+    Content-Length when declared, otherwise as soon as the streamed body passes the limit.
+    Pure ASGI so the body stream is not buffered by another layer.
+    """
+
+    def __init__(self, app, limits: Dict[str, int], overhead: int = MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.limits = {path: limit + overhead for path, limit in limits.items()}
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            response = JSONResponse(status_code=413, content={
+                "detail": f"Request body is {int(declared)} bytes, the limit is {limit}"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException đi qua phần parse body của FastAPI nguyên vẹn → 413
+                    raise HTTPException(status_code=413, detail=f"Request body is larger than {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -2,6 +2,7 @@ import sys
 import time
 
 from app.utils.logger import Logger
+from app.utils.metrics import METRICS
 from starlette.requests import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
@@ -15,6 +16,9 @@ class LogMiddleware(BaseHTTPMiddleware):
         start_time = time.time()
         response = await call_next(request)
         process_time = time.time() - start_time
+        # Label theo route template (/items/{id}) để số series không tăng theo URL
+        route_path = getattr(request.scope.get("route"), "path", "unmatched") or "/"
+        METRICS.observe_request(request.method, route_path, response.status_code, process_time)
         LOGGER.log.info (
             f"{request.client.host} - \"{request.method} {request.url.path} {request.scope['http_version']}\"{response.status_code} {process_time:.2f}s"
         ) 
@@ -0,0 +1,32 @@
+from app.utils.profiler import PROFILER
+from starlette.requests import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+
+async def _profiled_body(body_iterator, session):
+    # Response streaming (NDJSON) vẫn đang chạy sau call_next → dừng profile khi gửi xong body
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        session.finish()
+
+
+class ProfileMiddleware(BaseHTTPMiddleware):
+    """Profiles requests sent with `X-Profile: 1` or `?profile=1` (see RequestProfiler)."""
+
+    async def dispatch(self, request: Request, call_next):
+        if not PROFILER.requested(request.headers, request.query_params):
+            return await call_next(request)
+        session = await PROFILER.begin(f"{request.method} {request.url.path}", "http")
+        if session is None:
+            return await call_next(request)
+
+        try:
+            response = await call_next(request)
+        except BaseException:
+            session.finish()
+            raise
+        response.headers["X-Profile-Id"] = session.profile_id
+        response.body_iterator = _profiled_body(response.body_iterator, session)
+        return response
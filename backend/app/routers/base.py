@@ -1,11 +1,19 @@
 # Định nghĩa API Endpoint
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from .emotion_router import router as emotion_cls_route
 from .stream_router import router as stream_router
 from .game_ws_router import router as game_ws_router
+from .system_router import router as system_router
+from .metrics_router import router as metrics_router
+from .health_router import router as health_router, require_models
 
 router = APIRouter()
-router.include_router(emotion_cls_route, prefix="/v1/emotion_classification")
+# Model load ở thread nền lúc startup, các route cần model chờ tới khi sẵn sàng (hoặc 503)
+router.include_router(emotion_cls_route, prefix="/v1/emotion_classification", dependencies=[Depends(require_models)])
 router.include_router(stream_router, prefix="/v1/emotion_classification")
 router.include_router(game_ws_router, prefix="/v1/emotion_classification")
+router.include_router(system_router, prefix="/v1/system")
+# Prometheus scrape ở đường dẫn mặc định /metrics
+router.include_router(metrics_router)
+router.include_router(health_router)
 
@@ -1,46 +1,75 @@
+import os
 import sys
-import io
-import numpy as np
-import cv2
+import json
+import asyncio
+import contextlib
+import tempfile
 import torch
-from torch.nn import functional as F
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from PIL import Image
-from src.emotion_classification.models.emotion_predictor import Predictor
-from src.emotion_classification.models.yolo_detector import FacesDetector
-from src.emotion_classification.config.emotion_cfg import ModelConfig, EmotionDataConfig
+from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
+from src.emotion_classification.config.serving_cfg import VideoConfig
+from src.emotion_classification.utils.executor import EXECUTOR
+from src.emotion_classification.utils.tracker import FaceTracker
+from src.emotion_classification.utils.video import VideoSampler, EmotionTimeline
+from src.emotion_classification.utils.processor import (
+    PREPROCESSOR, check_upload_size, decode_rgb_array, decode_for_detection, decode_scaled, detail_size,
+    pad_boxes, crop_scaled_faces
+)
+from app.config.batch_cfg import BatchConfig
+from app.utils import METRICS, RESULT_CACHE, read_batch_upload
 from app.schemas.emotion_schema import EmotionResponse
 from app.schemas.face_schema import FaceResponse
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from fastapi import File, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
 
 router = APIRouter()
-predictor = Predictor(
-    model_name=ModelConfig.MODEL_NAME,
-    model_weight=ModelConfig.MODEL_WEIGHT,
-    device=ModelConfig.DEVICE
-)
 
-detector = FacesDetector(
-    model_name="yolov8n-face-lindevs",
-)
+
+async def _read_upload(file_upload: UploadFile, endpoint: str) -> bytes:
+    """Read an upload, rejecting it (413) from the declared size before reading when possible."""
+    if file_upload.size is not None:
+        check_upload_size(file_upload.size)
+    with METRICS.stage(endpoint, "upload_read"):
+        return await file_upload.read()
 
 
 @router.post('/predict')
 async def predict(file_upload: UploadFile = File(...)):
+    predictor = MODEL_REGISTRY.get_predictor()
+    image_bytes = await _read_upload(file_upload, "predict")
+
+    # Ảnh đã gặp → trả kết quả cũ, không decode lại
+    cache_key = RESULT_CACHE.make_key(image_bytes, "predict", predictor.cache_tag)
+    cached = await RESULT_CACHE.aget(cache_key)
+    if cached is not None:
+        return EmotionResponse(**cached)
+
     response = await predictor.predict(
-        image=file_upload.file,
+        image=image_bytes,
         image_name=file_upload.filename
     )
-    return EmotionResponse(**response)
+    response = EmotionResponse(**response)
+    RESULT_CACHE.set(cache_key, response.model_dump())
+    return response
 
 @router.post('/detect')
 async def detectFace(file_upload: UploadFile = File(...)):
+    detector = MODEL_REGISTRY.get_detector()
+    image_bytes = await _read_upload(file_upload, "detect")
+
+    cache_key = RESULT_CACHE.make_key(image_bytes, "detect", detector.cache_tag)
+    cached = await RESULT_CACHE.aget(cache_key)
+    if cached is not None:
+        return FaceResponse(**cached)
+
     response = await detector.detect_faces(
-        image=file_upload.file,
+        image=image_bytes,
         image_name=file_upload.filename
     )
     data_to_response = {
@@ -49,7 +78,51 @@ async def detectFace(file_upload: UploadFile = File(...)):
         "face_count": len(response),
         "results": response
     }
-    return FaceResponse(**data_to_response)
+    response = FaceResponse(**data_to_response)
+    RESULT_CACHE.set(cache_key, response.model_dump())
+    return response
+
+
+def _face_boxes(scaled, faces, pad=30):
+    """Padded boxes (original coordinates) of every detected face and their response entries."""
+    w, h = scaled.original_size
+    boxes, keep = pad_boxes(faces, w, h, pad)
+    faces_data = []
+    for i in keep:
+        x1, y1, x2, y2, conf = faces[i]
+        faces_data.append({
+            "face_id": i + 1,
+            "box": [x1, y1, x2, y2],
+            "confidence": round(float(conf), 3),
+        })
+    return faces_data, boxes
+
+
+async def _detail_decode(image_bytes: bytes, scaled, boxes, endpoint: str):
+    """Mặt quá nhỏ ở độ phân giải detect → decode lại lớn hơn, chỉ để lấy crop các mặt đó."""
+    longest_side = detail_size(scaled, boxes)
+    if longest_side is None:
+        return None
+    with METRICS.stage(endpoint, "decode_detail"):
+        return await EXECUTOR.run_decode(decode_scaled, image_bytes, longest_side)
+
+
+def _attach_emotions(faces_data, face_probs):
+    best_probs, pred_ids = torch.max(face_probs, 1)
+    for face, probs, best_prob, pred_id in zip(faces_data, face_probs.tolist(), best_probs.tolist(), pred_ids.tolist()):
+        face.update({
+            "predicted_class": EmotionDataConfig.ID2LABEL[pred_id],
+            "best_prob": round(best_prob, 4),
+            "probs": [round(p, 4) for p in probs],
+        })
+
+
+def _analyze_response(faces_data, predictor) -> dict:
+    return {
+        "face_count": len(faces_data),
+        "faces": faces_data,
+        "predictor_name": predictor.model_name,
+    }
 
 
 @router.post('/analyze')
@@ -58,70 +131,309 @@ async def analyze_faces(file_upload: UploadFile = File(...)):
     Detect all faces → crop each → predict emotion per face.
     Returns combined bounding boxes + per-face emotion results.
     """
-    image_bytes = await file_upload.read()
-    pil_img = Image.open(io.BytesIO(image_bytes))
+    predictor = MODEL_REGISTRY.get_predictor()
+    detector = MODEL_REGISTRY.get_detector()
+    image_bytes = await _read_upload(file_upload, "analyze")
 
-    if pil_img.mode == 'RGBA':
-        pil_img = pil_img.convert('RGB')
+    cache_key = RESULT_CACHE.make_key(image_bytes, "analyze", predictor.cache_tag, detector.cache_tag)
+    cached = await RESULT_CACHE.aget(cache_key)
+    if cached is not None:
+        return cached
 
-    # Convert to numpy for OpenCV operations
-    img_np = np.array(pil_img)
+    # Decode ở cỡ input của YOLO thay vì toàn bộ ảnh gốc
+    with METRICS.stage("analyze", "decode"):
+        scaled = await EXECUTOR.run_decode(decode_for_detection, image_bytes)
 
     # Step 1: Detect faces
-    results = detector.model.predict(
-        pil_img,
-        conf=detector.conf_threshold,
-        iou=detector.iou_threshold,
-        verbose=False
-    )
+    with METRICS.stage("analyze", "detect"):
+        faces = await EXECUTOR.run_inference(detector.detect_scaled, scaled)
+    faces_data, boxes = _face_boxes(scaled, faces)
 
-    faces_data = []
+    detail = await _detail_decode(image_bytes, scaled, boxes, "analyze")
+    with METRICS.stage("analyze", "preprocess"):
+        face_batch = await EXECUTOR.run_inference(crop_scaled_faces, boxes, scaled, detail)
 
-    if len(results) > 0:
-        result = results[0]
-        if result.boxes is not None and len(result.boxes) > 0:
-            boxes = result.boxes.xyxy.cpu().numpy()
-            confidences = result.boxes.conf.cpu().numpy()
-
-            h, w = img_np.shape[:2]
-
-            for i, (box, conf) in enumerate(zip(boxes, confidences)):
-                x1, y1, x2, y2 = map(int, box)
-
-                # Padded crop (30px)
-                pad = 30
-                cx1 = max(0, x1 - pad)
-                cy1 = max(0, y1 - pad)
-                cx2 = min(w, x2 + pad)
-                cy2 = min(h, y2 + pad)
-
-                face_crop = img_np[cy1:cy2, cx1:cx2]
-
-                if face_crop.size == 0:
-                    continue
-
-                # Step 2: Predict emotion for this face
-                face_pil = Image.fromarray(face_crop)
-                face_tensor = predictor.transforms_(face_pil).unsqueeze(0)
-
-                with torch.no_grad():
-                    output = predictor.model(face_tensor.to(predictor.device))
-                    probs = F.softmax(output, dim=1)
-                    probs_list = probs.squeeze().tolist()
-                    best_prob, pred_id = torch.max(probs, 1)
-                    predicted_class = EmotionDataConfig.ID2LABEL[pred_id.item()]
-
-                faces_data.append({
-                    "face_id": i + 1,
-                    "box": [x1, y1, x2, y2],
-                    "confidence": round(float(conf), 3),
-                    "predicted_class": predicted_class,
-                    "best_prob": round(best_prob.item(), 4),
-                    "probs": [round(p, 4) for p in probs_list],
-                })
+    # Step 2: Predict emotion for all faces in a single forward pass
+    if len(faces_data) > 0:
+        with METRICS.stage("analyze", "classify"):
+            face_probs = await predictor.classify(face_batch)
+        _attach_emotions(faces_data, face_probs)
 
-    return {
-        "face_count": len(faces_data),
-        "faces": faces_data,
-        "predictor_name": predictor.model_name,
-    }
+    response = _analyze_response(faces_data, predictor)
+    RESULT_CACHE.set(cache_key, response)
+    return response
+
+
+
+def _predict_input(data: bytes) -> torch.Tensor:
+    """Decode + preprocess one /predict-batch image (decode pool), same input as /predict."""
+    return PREPROCESSOR(decode_rgb_array(data))
+
+
+async def _decode_item(data: bytes, decode_fn, endpoint: str):
+    with METRICS.stage(endpoint, "decode"):
+        return await EXECUTOR.run_decode(decode_fn, data)
+
+
+async def _decode_chunk(chunk, decode_fn, endpoint: str):
+    """Decode every uncached item of a chunk in parallel; errors are kept per item."""
+    pending = [item for item in chunk if "result" not in item]
+    decoded = await asyncio.gather(*(_decode_item(item["data"], decode_fn, endpoint) for item in pending),
+                                   return_exceptions=True)
+    for item, value in zip(pending, decoded):
+        item["decoded"] = value
+    return chunk
+
+
+async def _stream_batch(items, decode_fn, infer_chunk, endpoint: str):
+    """
+    NDJSON lines, one per item, chunk by chunk in upload order. While a chunk runs through
+    the models the next chunk is already decoding. Cached items skip decode and inference.
+    """
+    chunk_size = max(1, BatchConfig.CHUNK_SIZE)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    next_chunk = asyncio.ensure_future(_decode_chunk(chunks[0], decode_fn, endpoint)) if chunks else None
+    try:
+        for k in range(len(chunks)):
+            chunk = await next_chunk
+            next_chunk = (asyncio.ensure_future(_decode_chunk(chunks[k + 1], decode_fn, endpoint))
+                          if k + 1 < len(chunks) else None)
+
+            ready = [item for item in chunk if "result" not in item and not isinstance(item["decoded"], BaseException)]
+            if ready:
+                try:
+                    await infer_chunk(ready)
+                except Exception as e:
+                    for item in ready:
+                        item["decoded"] = e
+
+            for item in chunk:
+                line = {"index": item["index"], "filename": item["filename"]}
+                if "result" in item:
+                    line.update(item["result"])
+                else:
+                    line["error"] = f"{type(item['decoded']).__name__}: {item['decoded']}"
+                yield json.dumps(line) + "\n"
+                # Giải phóng bytes + ảnh đã decode ngay sau khi trả kết quả
+                item.pop("data", None)
+                item.pop("decoded", None)
+    finally:
+        if next_chunk is not None:
+            next_chunk.cancel()
+
+
+async def _batch_items(uploads, mode: str, *cache_tags):
+    items = []
+    for index, (filename, data) in enumerate(uploads):
+        item = {"index": index, "filename": filename, "data": data,
+                "cache_key": RESULT_CACHE.make_key(data, mode, *cache_tags)}
+        cached = await RESULT_CACHE.aget(item["cache_key"])
+        if cached is not None:
+            item["result"] = cached
+        items.append(item)
+    return items
+
+
+@router.post('/predict-batch')
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """
+    /predict for many images (several files and/or .zip / .tar archives).
+    Streams one JSON line per image: {"index", "filename", ...EmotionResponse} or {"index", "filename", "error"}.
+    """
+    predictor = MODEL_REGISTRY.get_predictor()
+    with METRICS.stage("predict_batch", "upload_read"):
+        uploads = await read_batch_upload(files)
+    items = await _batch_items(uploads, "predict", predictor.cache_tag)
+
+    async def infer_chunk(ready):
+        # Một forward cho cả chunk (batcher còn gộp thêm với request khác)
+        with METRICS.stage("predict_batch", "classify"):
+            probabilities = await predictor.classify(torch.cat([item["decoded"] for item in ready]))
+        for item, item_probs in zip(ready, probabilities):
+            probs, best_prob, predicted_id, predicted_class = predictor.probs2pred(item_probs.unsqueeze(0))
+            item["result"] = EmotionResponse(
+                probs=probs, best_prob=best_prob, predicted_id=predicted_id,
+                predicted_class=predicted_class, predictor_name=predictor.model_name
+            ).model_dump()
+            RESULT_CACHE.set(item["cache_key"], item["result"])
+
+    return StreamingResponse(_stream_batch(items, _predict_input, infer_chunk, "predict_batch"),
+                             media_type="application/x-ndjson")
+
+
+@router.post('/analyze-batch')
+async def analyze_batch(files: List[UploadFile] = File(...)):
+    """
+    /analyze for many images (several files and/or .zip / .tar archives).
+    Detection runs on the whole chunk in one detector call, all face crops of the chunk are
+    classified together. Streams one JSON line per image, same fields as /analyze plus index / filename.
+    """
+    predictor = MODEL_REGISTRY.get_predictor()
+    detector = MODEL_REGISTRY.get_detector()
+    with METRICS.stage("analyze_batch", "upload_read"):
+        uploads = await read_batch_upload(files)
+    items = await _batch_items(uploads, "analyze", predictor.cache_tag, detector.cache_tag)
+
+    async def infer_chunk(ready):
+        scaled_images = [item["decoded"] for item in ready]
+        with METRICS.stage("analyze_batch", "detect"):
+            batch_faces = await EXECUTOR.run_inference(detector.detect_scaled_batch, scaled_images)
+        face_boxes = [_face_boxes(scaled, faces) for scaled, faces in zip(scaled_images, batch_faces)]
+        details = await asyncio.gather(*(_detail_decode(item["data"], scaled, boxes, "analyze_batch")
+                                         for item, scaled, (_, boxes) in zip(ready, scaled_images, face_boxes)))
+
+        with METRICS.stage("analyze_batch", "preprocess"):
+            face_batches = await EXECUTOR.run_inference(
+                lambda: [crop_scaled_faces(boxes, scaled, detail)
+                         for scaled, (_, boxes), detail in zip(scaled_images, face_boxes, details)])
+        n_faces = [len(batch) for batch in face_batches]
+        face_probs = None
+        if sum(n_faces) > 0:
+            with METRICS.stage("analyze_batch", "classify"):
+                face_probs = await predictor.classify(torch.cat(face_batches))
+
+        start = 0
+        for item, (faces_data, _), n in zip(ready, face_boxes, n_faces):
+            if n > 0:
+                _attach_emotions(faces_data, face_probs[start:start + n])
+                start += n
+            item["result"] = _analyze_response(faces_data, predictor)
+            RESULT_CACHE.set(item["cache_key"], item["result"])
+
+    return StreamingResponse(_stream_batch(items, decode_for_detection, infer_chunk, "analyze_batch"),
+                             media_type="application/x-ndjson")
+
+
+def _spool_video(upload_file, suffix: str) -> str:
+    """Copy the uploaded video to a temp file in 1 MB chunks (OpenCV reads from a path), enforcing the size limit."""
+    copied = 0
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        try:
+            while True:
+                chunk = upload_file.read(1024 * 1024)
+                if not chunk:
+                    break
+                copied += len(chunk)
+                if copied > VideoConfig.MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Video is larger than {VideoConfig.MAX_BYTES} bytes")
+                f.write(chunk)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    return f.name
+
+
+def _track_chunk(frames, batch_faces, tracker, pad=30):
+    """Run the tracker over one chunk of sampled frames; returns per-frame (t, track ids, boxes) and all face crops."""
+    per_frame, crops = [], []
+    for (_, t, frame), faces in zip(frames, batch_faces):
+        # Mỗi frame lấy mẫu đều đã detect (theo batch), tracker chỉ gán id
+        tracks = tracker.step_tracks(frame, lambda _: faces)
+        h, w = frame.shape[:2]
+        boxes, keep = pad_boxes([track.as_face() for track in tracks], w, h, pad)
+        per_frame.append((t, [tracks[i].track_id for i in keep], boxes))
+        crops.append(PREPROCESSOR.crop_batch(frame, boxes, bgr=True))
+    return per_frame, torch.cat(crops)
+
+
+async def _video_timeline(sampler: VideoSampler, detector, predictor):
+    tracker = FaceTracker(detect_interval=1)
+    timeline = EmotionTimeline()
+    track_ids = set()
+    try:
+        yield json.dumps({
+            "type": "video",
+            "source_fps": round(sampler.source_fps, 3),
+            "frame_count": sampler.frame_count,
+            "every": sampler.step,
+            "sample_fps": round(sampler.sample_fps, 3),
+        }) + "\n"
+
+        while True:
+            # VideoCapture không pickle được → đọc trong thread pool, không dùng decode pool
+            with METRICS.stage("analyze_video", "decode"):
+                frames = await EXECUTOR.run_inference(sampler.read_chunk, VideoConfig.CHUNK_FRAMES)
+            if not frames:
+                break
+            with METRICS.stage("analyze_video", "detect"):
+                batch_faces = await EXECUTOR.run_inference(detector.detect_batch, [frame for _, _, frame in frames])
+            with METRICS.stage("analyze_video", "preprocess"):
+                per_frame, crops = await EXECUTOR.run_inference(_track_chunk, frames, batch_faces, tracker)
+            probs = None
+            if len(crops) > 0:
+                with METRICS.stage("analyze_video", "classify"):
+                    probs = (await predictor.classify(crops)).numpy()
+
+            start = 0
+            for t, ids, boxes in per_frame:
+                track_ids.update(ids)
+                frame_probs = probs[start:start + len(ids)] if probs is not None else []
+                start += len(ids)
+                for window in timeline.add(t, ids, boxes, frame_probs):
+                    yield json.dumps(window) + "\n"
+
+        for window in timeline.finish():
+            yield json.dumps(window) + "\n"
+        yield json.dumps({
+            "type": "summary",
+            "frames_read": sampler.frame_idx,
+            "frames_sampled": sampler.sampled,
+            "detections_run": tracker.detections_run,
+            "track_count": len(track_ids),
+        }) + "\n"
+    finally:
+        sampler.release()
+
+
+class _SpooledVideoResponse(StreamingResponse):
+    """
+    NDJSON stream over a spooled upload. The temp file is removed however the response ends,
+    including a client that disconnects before the first line (the generator never starts then).
+    """
+
+    def __init__(self, content, path: str, sampler: VideoSampler):
+        super().__init__(content, media_type="application/x-ndjson")
+        self.path = path
+        self.sampler = sampler
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            self.sampler.release()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+
+
+@router.post('/analyze-video')
+async def analyze_video(
+    file_upload: UploadFile = File(...),
+    every: Optional[int] = None,
+    fps: Optional[float] = None
+):
+    """
+    Emotion timeline of an uploaded video. Frames are sampled every `every` frames or at
+    `fps` (default VideoConfig.SAMPLE_FPS), detected and classified in chunks, and faces are
+    tracked across sampled frames. Streams NDJSON: a "video" header, one "window" line per
+    WINDOW_SECONDS with the mean probabilities of each track, then a "summary" line.
+    """
+    if file_upload.size is not None and file_upload.size > VideoConfig.MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Video is larger than {VideoConfig.MAX_BYTES} bytes")
+    predictor = MODEL_REGISTRY.get_predictor()
+    detector = MODEL_REGISTRY.get_detector()
+
+    suffix = os.path.splitext(file_upload.filename or "")[1] or ".mp4"
+    # Copy file là I/O: chạy ở thread pool thường, không chiếm thread của inference pool
+    with METRICS.stage("analyze_video", "upload_read"):
+        path = await asyncio.to_thread(_spool_video, file_upload.file, suffix)
+    try:
+        sampler = VideoSampler(path, every=every, fps=fps)
+    except ValueError as e:
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        os.unlink(path)
+        raise
+    return _SpooledVideoResponse(_video_timeline(sampler, detector, predictor), path, sampler)
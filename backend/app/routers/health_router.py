@@ -0,0 +1,43 @@
+import time
+
+from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi.responses import JSONResponse
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+from src.emotion_classification.config.serving_cfg import StartupConfig
+
+router = APIRouter()
+
+STARTED_AT = time.time()
+
+
+async def require_models():
+    """Router dependency: wait for the background warm-up instead of loading models on the event loop."""
+    if not await MODEL_REGISTRY.wait_ready(StartupConfig.MODEL_WAIT_SECONDS):
+        raise HTTPException(status_code=503, detail=f"Models are not ready ({MODEL_REGISTRY.state})",
+                            headers={"Retry-After": "5"})
+
+
+async def websocket_models_ready(websocket: WebSocket) -> bool:
+    """Same wait for WebSocket handlers (after accept); closes with 1013 "try again later" on failure."""
+    if await MODEL_REGISTRY.wait_ready(StartupConfig.MODEL_WAIT_SECONDS):
+        return True
+    await websocket.close(code=1013, reason=f"Models are not ready ({MODEL_REGISTRY.state})")
+    return False
+
+
+@router.get('/healthz')
+async def healthz():
+    """Liveness: the process is up and the event loop answers, models may still be loading."""
+    return {"status": "ok", "uptime_seconds": round(time.time() - STARTED_AT, 3)}
+
+
+@router.get('/readyz')
+async def readyz():
+    """Readiness: 200 once both models are loaded and warmed up, 503 while loading or after a failure."""
+    status = MODEL_REGISTRY.status()
+    return JSONResponse(status_code=200 if MODEL_REGISTRY.ready else 503, content=status)
@@ -0,0 +1,36 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+from src.emotion_classification.utils.executor import EXECUTOR
+from app.utils import CAPTURE_WRITER, METRICS
+from app.routers.stream_router import CAMERA_SERVICE
+
+router = APIRouter()
+
+
+def _queue_depths() -> dict:
+    depths = {
+        ("executor_jobs",): EXECUTOR.active_jobs,
+        ("capture_writer",): CAPTURE_WRITER.stats()["queue_depth"],
+    }
+    # Chỉ đọc model đã load, scrape không được kích hoạt việc load model
+    predictor = MODEL_REGISTRY.loaded("predictor")
+    if predictor is not None:
+        depths[("classifier_batcher",)] = predictor.batcher.queue_depth
+    return depths
+
+
+METRICS.gauge("emotion_queue_depth", "Items waiting or running in each internal queue.", ("queue",), _queue_depths)
+METRICS.gauge("emotion_camera_subscribers", "Viewers of the server camera stream.", (),
+              lambda: {(): CAMERA_SERVICE.stats()["subscribers"]})
+
+
+@router.get('/metrics', response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the stage latencies, request counts, WebSocket sessions and queue depths."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,27 +1,23 @@
 import cv2
-import asyncio
-import base64
-import numpy as np
-import torch
 
 from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
 from fastapi.templating import Jinja2Templates
 from websockets.exceptions import ConnectionClosed
-from PIL import Image
-from ultralytics import YOLO
-from utils.app_path import AppPath
-from src.emotion_classification.models.emotion_predictor import Predictor
-from src.emotion_classification.models.yolo_detector import FacesDetector
-from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
+from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+from src.emotion_classification.utils.executor import EXECUTOR
+from src.emotion_classification.utils.tracker import FaceTracker
+from src.emotion_classification.utils.emotion_smoother import TrackEmotionSmoother
+from src.emotion_classification.utils.camera import CameraService
+from src.emotion_classification.utils.processor import decode_ws_frame, encode_jpeg, pad_boxes, crop_faces_batch
+from app.utils import LatestFrameReceiver, METRICS, PROFILER, pack_frame
+from app.routers.health_router import websocket_models_ready
 
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 router = APIRouter()
-camera = cv2.VideoCapture(0)
 templates = Jinja2Templates(directory="templates")
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 
 @router.get('/')
@@ -29,137 +25,135 @@ def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
-def _process_frame(frame, detector, predictor, face_buffer, last_label, batch_size):
-    """Shared face detection + emotion prediction logic for both server and client camera."""
-    results = detector.model.predict(
-        frame,
-        conf=detector.conf_threshold,
-        iou=detector.iou_threshold,
-        verbose=False
-    )
+def _process_frame(frame, detector, predictor, tracker, smoother, endpoint="ws"):
+    """Shared face detection + emotion prediction logic for both server and client camera.
+    YOLO only runs when the tracker asks for it; each track keeps its own smoothed emotion
+    and is only re-classified when it is new or its face has changed."""
+    tracks = tracker.step_tracks(frame, METRICS.timed(detector.detect, endpoint, "detect"))
+    faces = [track.as_face() for track in tracks]
+    h, w = frame.shape[:2]
+    # Padded bounding boxes
+    boxes, keep = pad_boxes(faces, w, h, pad=50)
+    track_ids = [tracks[i].track_id for i in keep]
 
-    if len(results) > 0:
-        result = results[0]
-        boxes = result.boxes.xyxy.cpu().numpy()
-        confidences = result.boxes.conf.cpu().numpy()
+    # Crop + classify trước khi vẽ lên frame, chỉ các track cần cập nhật
+    smoother.step(frame, track_ids, boxes, tracker.frame_idx, METRICS.timed(predictor.forward, endpoint, "classify"),
+                  bgr=True, crop_fn=METRICS.timed(crop_faces_batch, endpoint, "preprocess"))
+    smoother.prune(track.track_id for track in tracker.tracks)
 
-        for box, conf in zip(boxes, confidences):
-            x1, y1, x2, y2 = map(int, box)
-            h, w = frame.shape[:2]
-            # Padded bounding box
-            x1_p = max(0, x1 - 50)
-            y1_p = max(0, y1 - 50)
-            x2_p = min(w, x2 + 50)
-            y2_p = min(h, y2 + 50)
+    for (x1_p, y1_p, x2_p, y2_p), i, track_id in zip(boxes.tolist(), keep, track_ids):
+        x1, y1 = faces[i][:2]
+        cv2.rectangle(frame, (x1_p, y1_p), (x2_p, y2_p), (0, 255, 0), 2)
+        cv2.putText(frame, f"#{track_id} {smoother.label(track_id)}", (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
-            cv2.rectangle(frame, (x1_p, y1_p), (x2_p, y2_p), (0, 255, 0), 2)
-            cv2.putText(frame, last_label, (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return frame
 
-            face_img = frame[y1_p:y2_p, x1_p:x2_p]
 
-            if face_img.size > 0:
-                face_img = Image.fromarray(face_img)
-                predictor.create_transform()
-                transform = predictor.transforms_
-                face_tensor = transform(face_img)
-                face_buffer.append(face_tensor)
+def _camera_pipeline():
+    """Per-run pipeline of the server camera: fresh tracker + smoother every time the camera starts."""
+    detector = MODEL_REGISTRY.get_detector()
+    predictor = MODEL_REGISTRY.get_predictor()
+    tracker = FaceTracker()
+    smoother = TrackEmotionSmoother()
+    return lambda frame: _process_frame(frame, detector, predictor, tracker, smoother)
 
-                if len(face_buffer) == batch_size:
-                    input_batch = torch.stack(face_buffer).to(device)
 
-                    with torch.no_grad():
-                        outputs = predictor.model(input_batch)
-                        probs = torch.softmax(outputs, dim=1)
-                        avg_probs = torch.mean(probs, dim=0)
-                        max_idx = torch.argmax(avg_probs).item()
-                        last_label = f"{EmotionDataConfig.ID2LABEL[max_idx]} ({avg_probs[max_idx]*100:.1f}%)"
-
-                    face_buffer.clear()
-
-    return frame, face_buffer, last_label
+# Camera server chỉ mở khi có viewer đầu tiên, mỗi frame chỉ xử lý + encode một lần cho mọi viewer
+CAMERA_SERVICE = CameraService(pipeline_factory=_camera_pipeline)
 
 
 @router.websocket("/ws")
 async def get_stream(websocket: WebSocket):
-    """Server camera: reads from cv2.VideoCapture on the server machine."""
+    """Server camera: subscribes to the shared capture service and forwards its annotated JPEG frames.
+    A slow viewer skips frames instead of falling behind."""
     await websocket.accept()
+    if not await websocket_models_ready(websocket):
+        return
 
-    detector = FacesDetector(model_weight=AppPath.YOLO_MODEL_WEIGHT)
-    predictor = Predictor(
-        model_name="ResNet18",
-        model_weight=AppPath.RESNET_MODEL_WEIGHT,
-        device="cpu"
-    )
-
-    face_buffer = []
-    last_label = "Initializing..."
-    batch_size = 5
-
+    subscription = session = profile = None
     try:
-        while True:
-            success, frame = camera.read()
+        subscription = await CAMERA_SERVICE.subscribe()
+        session = METRICS.open_session("ws", subscription)
+        profile = await PROFILER.ws_window(websocket, "ws")
 
-            if not success:
+        while True:
+            item = await subscription.get()
+            if item is None:
+                # Camera không mở được hoặc đã dừng
                 break
-            else:
-                frame, face_buffer, last_label = _process_frame(
-                    frame, detector, predictor, face_buffer, last_label, batch_size
-                )
-
-                ret, buffer = cv2.imencode('.jpg', frame)
-                await websocket.send_bytes(buffer.tobytes())
-
-            await asyncio.sleep(0.03)
+            _, jpeg_bytes = item
+            with METRICS.stage("ws", "send"):
+                await websocket.send_bytes(jpeg_bytes)
+            session.frame_done()
+            profile.step()
 
+        await websocket.close()
     except (WebSocketDisconnect, ConnectionClosed):
         print("Client disconnected")
+    finally:
+        if profile is not None:
+            profile.close()
+        if session is not None:
+            session.close()
+        if subscription is not None:
+            CAMERA_SERVICE.unsubscribe(subscription)
 
 
 @router.websocket("/ws-client")
 async def get_stream_client(websocket: WebSocket):
-    """Client camera: receives base64 JPEG frames from the browser webcam,
-    processes them, and sends back annotated JPEG bytes."""
+    """Client camera: receives JPEG/WebP frames from the browser webcam (raw binary,
+    or base64 text from older clients), processes the newest one and sends back
+    annotated JPEG bytes. Binary senders get a 4-byte big-endian sequence number
+    in front of each JPEG so they can measure end-to-end latency."""
     await websocket.accept()
+    if not await websocket_models_ready(websocket):
+        return
 
-    detector = FacesDetector(model_weight=AppPath.YOLO_MODEL_WEIGHT)
-    predictor = Predictor(
-        model_name="ResNet18",
-        model_weight=AppPath.RESNET_MODEL_WEIGHT,
-        device="cpu"
-    )
+    detector = MODEL_REGISTRY.get_detector()
+    predictor = MODEL_REGISTRY.get_predictor()
 
-    face_buffer = []
-    last_label = "Initializing..."
-    batch_size = 5
+    tracker = FaceTracker()
+    smoother = TrackEmotionSmoother()
+    # Chỉ giữ frame mới nhất, frame cũ bị bỏ nếu server xử lý chậm hơn client gửi
+    receiver = LatestFrameReceiver(websocket).start()
+    session = METRICS.open_session("ws_client", receiver)
+    profile = await PROFILER.ws_window(websocket, "ws_client")
 
     try:
         while True:
-            data = await websocket.receive_text()
-
-            # Strip data URI prefix if present
-            if "," in data:
-                data = data.split(",", 1)[1]
+            item = await receiver.next_frame()
+            if item is None:
+                break
+            seq, payload = item
 
             try:
-                img_bytes = base64.b64decode(data)
-                nparr = np.frombuffer(img_bytes, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                with METRICS.stage("ws_client", "decode"):
+                    frame = await EXECUTOR.run_decode(decode_ws_frame, payload)
 
                 if frame is None:
                     continue
             except Exception:
                 continue
 
-            frame, face_buffer, last_label = _process_frame(
-                frame, detector, predictor, face_buffer, last_label, batch_size
+            frame = await EXECUTOR.run_inference(
+                _process_frame, frame, detector, predictor, tracker, smoother, "ws_client"
             )
 
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if ret:
-                await websocket.send_bytes(buffer.tobytes())
+            with METRICS.stage("ws_client", "encode"):
+                jpeg_bytes = await EXECUTOR.run_decode(encode_jpeg, frame)
+            if jpeg_bytes is not None:
+                with METRICS.stage("ws_client", "send"):
+                    await websocket.send_bytes(pack_frame(seq, jpeg_bytes) if receiver.binary else jpeg_bytes)
+                session.frame_done()
+                profile.step()
 
+        print(f"[Client Camera] Client disconnected ({receiver.dropped}/{receiver.received} frames dropped)")
     except (WebSocketDisconnect, ConnectionClosed):
         print("[Client Camera] Client disconnected")
     except Exception as e:
         print(f"[Client Camera] Error: {e}")
+    finally:
+        profile.close()
+        session.close()
+        await receiver.close()
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+from src.emotion_classification.models.weight_store import process_memory_mb
+from src.emotion_classification.utils.executor import EXECUTOR
+from app.utils import CAPTURE_WRITER, RESULT_CACHE, PROFILER
+from app.routers.stream_router import CAMERA_SERVICE
+
+router = APIRouter()
+
+
+@router.get('/models')
+async def loaded_models():
+    """Memory used by each model held in the shared registry."""
+    return MODEL_REGISTRY.memory_report()
+
+
+@router.get('/memory')
+async def memory_stats():
+    """Process RSS plus the load time and RSS growth of each loaded model's weights."""
+    # Chỉ đọc model đã load, không kích hoạt load
+    return {"process": process_memory_mb(), "weights_load": MODEL_REGISTRY.weights_report()}
+
+
+@router.get('/batching')
+async def batching_stats():
+    """Batch-size distribution and queue wait of the classifier micro-batcher."""
+    # Không kích hoạt load model từ endpoint thống kê
+    predictor = MODEL_REGISTRY.loaded("predictor")
+    if predictor is None:
+        return {"loaded": False}
+    return {
+        "max_batch_size": predictor.batcher.max_batch_size,
+        "max_wait_ms": predictor.batcher.max_wait * 1000,
+        "queue_depth": predictor.batcher.queue_depth,
+        **predictor.batcher.stats.snapshot(),
+    }
+
+
+@router.get('/executor')
+async def executor_stats():
+    """Pool sizes and jobs currently running in the inference executor."""
+    return EXECUTOR.stats()
+
+
+@router.get('/capture')
+async def capture_stats():
+    """Queue depth and counters of the background capture writer."""
+    return CAPTURE_WRITER.stats()
+
+
+@router.get('/cache')
+async def result_cache_stats():
+    """Hit/miss counters of the content-addressed result cache."""
+    return RESULT_CACHE.stats()
+
+
+@router.get('/camera')
+async def camera_stats():
+    """Frames captured, processed and skipped by the server camera, plus per-viewer drops."""
+    return CAMERA_SERVICE.stats()
+
+
+@router.get('/profiles')
+async def list_profiles():
+    """Profiles captured with X-Profile / ?profile=1, newest first."""
+    return {**PROFILER.stats(), "profiles": PROFILER.list_profiles()}
+
+
+@router.get('/profiles/{profile_id}/{kind}')
+async def download_profile(profile_id: str, kind: str):
+    """One file of a profile: `trace` (Chrome trace JSON), `folded` (flamegraph stacks) or `meta`."""
+    path = PROFILER.profile_file(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No {kind} file for profile {profile_id}")
+    media_type = "text/plain" if kind == "folded" else "application/json"
+    return FileResponse(path, media_type=media_type, filename=path.name)
@@ -1,3 +1,9 @@
 from .utils import *
 from .app_path import *
-from .logger import *
\ No newline at end of file
+from .logger import *
+from .capture import *
+from .result_cache import *
+from .ws_frames import *
+from .batch_upload import *
+from .metrics import *
+from .profiler import *
@@ -5,6 +5,7 @@ class AppPath:
     BACKEND_DIR = Path(__file__).parent.parent.parent
 
     LOG_DIR = BACKEND_DIR / "app" / "logs"
+    PROFILE_DIR = LOG_DIR / "profiles"
 
     CACHE_DIR = BACKEND_DIR / "cache"
     CAPTURED_DATA_DIR = CACHE_DIR / "capture_data"
@@ -13,6 +14,8 @@ class AppPath:
         'models' / 'weights' / 'emotion_classification_weights.pt'
     YOLO_MODEL_WEIGHT = BACKEND_DIR / "src" / 'emotion_classification' / \
         'models' / 'weights' / 'yolov8n-face-lindevs.pt'
+    YOLO_ONNX_WEIGHT = BACKEND_DIR / "src" / 'emotion_classification' / \
+        'models' / 'weights' / 'yolov8n-face-lindevs.onnx'
 
 
 AppPath.LOG_DIR.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,75 @@
+import io
+import tarfile
+import zipfile
+
+from typing import List, Tuple
+from fastapi import HTTPException, UploadFile
+from app.config.batch_cfg import BatchConfig
+from src.emotion_classification.utils.processor import ImageTooLarge
+
+BatchItem = Tuple[str, bytes]
+
+
+class BatchLimits:
+    """Running item count / byte total of one batch request; raises ImageTooLarge (413) when exceeded."""
+
+    def __init__(self, max_items: int = BatchConfig.MAX_ITEMS, max_total_bytes: int = BatchConfig.MAX_TOTAL_BYTES):
+        self.max_items = max_items
+        self.max_total_bytes = max_total_bytes
+        self.items = 0
+        self.total_bytes = 0
+
+    def add(self, n_bytes: int, n_items: int = 1):
+        self.items += n_items
+        self.total_bytes += n_bytes
+        if self.items > self.max_items:
+            raise ImageTooLarge(f"Batch has more than {self.max_items} images")
+        if self.total_bytes > self.max_total_bytes:
+            raise ImageTooLarge(f"Batch is larger than {self.max_total_bytes} bytes")
+
+
+def is_image_name(name: str) -> bool:
+    """True for image file names (BatchConfig.IMAGE_SUFFIXES), hidden files excluded; shared with score.py."""
+    return name.lower().endswith(BatchConfig.IMAGE_SUFFIXES) and not name.rsplit("/", 1)[-1].startswith(".")
+
+
+def _zip_items(data: bytes, limits: BatchLimits) -> List[BatchItem]:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = [m for m in archive.infolist() if not m.is_dir() and is_image_name(m.filename)]
+        # Kiểm tra kích thước khai báo trước khi giải nén (zip bomb)
+        limits.add(sum(m.file_size for m in members), len(members))
+        return [(m.filename, archive.read(m)) for m in members]
+
+
+def _tar_items(data: bytes, limits: BatchLimits) -> List[BatchItem]:
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as archive:
+        members = [m for m in archive.getmembers() if m.isfile() and is_image_name(m.name)]
+        limits.add(sum(m.size for m in members), len(members))
+        return [(m.name, archive.extractfile(m).read()) for m in members]
+
+
+async def read_batch_upload(files: List[UploadFile], limits: BatchLimits = None) -> List[BatchItem]:
+    """
+    (filename, bytes) of every image in a batch upload: plain image files are taken as they are,
+    .zip / .tar(.gz) archives are expanded. Limits are checked on declared sizes before reading.
+    """
+    limits = limits or BatchLimits()
+    items = []
+    for file_upload in files:
+        name = file_upload.filename or f"file_{len(items)}"
+        if file_upload.size is not None and file_upload.size > limits.max_total_bytes:
+            raise ImageTooLarge(f"Batch is larger than {limits.max_total_bytes} bytes")
+        data = await file_upload.read()
+
+        if name.lower().endswith(BatchConfig.ARCHIVE_SUFFIXES):
+            try:
+                if name.lower().endswith(".zip"):
+                    items.extend(_zip_items(data, limits))
+                else:
+                    items.extend(_tar_items(data, limits))
+            except (zipfile.BadZipFile, tarfile.TarError) as e:
+                raise HTTPException(status_code=400, detail=f"{name} is not a valid archive: {e}") from e
+        else:
+            limits.add(len(data))
+            items.append((name, data))
+    return items
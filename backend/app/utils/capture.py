@@ -0,0 +1,174 @@
+import json
+import os
+import queue
+import random
+import struct
+import threading
+import time
+import zlib
+
+from pathlib import Path
+from typing import Iterator, Optional
+from app.config.capture_cfg import CaptureConfig
+from .logger import Logger
+from .utils import content_hash
+
+LOGGER = Logger(__file__, log_file="capture.log")
+
+# Mỗi record: [độ dài payload: uint32][crc32 payload: uint32][payload JSON UTF-8]
+RECORD_HEADER = struct.Struct("<II")
+
+
+class CaptureWriter:
+    """
+    Background writer for request captures.
+    Images are stored once under a content-hash name, prediction rows are appended to
+    a length-prefixed binary log that rotates by size. `submit` never blocks the request:
+    records are sampled with `sample_rate` and dropped when the bounded queue is full.
+    """
+
+    def __init__(
+        self,
+        capture_dir: Path = CaptureConfig.CAPTURE_DIR,
+        log_dir: Path = CaptureConfig.PREDICTION_LOG_DIR,
+        sample_rate: float = CaptureConfig.SAMPLE_RATE,
+        queue_size: int = CaptureConfig.QUEUE_SIZE,
+        batch_size: int = CaptureConfig.BATCH_SIZE,
+        flush_interval: float = CaptureConfig.FLUSH_INTERVAL,
+        max_log_bytes: int = CaptureConfig.MAX_LOG_BYTES
+    ):
+        self.capture_dir = Path(capture_dir)
+        self.log_dir = Path(log_dir)
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_log_bytes = max_log_bytes
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._log_file = None
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, image: bytes, image_name: str, record: dict) -> bool:
+        """Queue one capture, returns False if it was sampled out or dropped."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            self.skipped += 1
+            return False
+
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((image, image_name, record, time.time()))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                LOGGER.log.error(f"Fail to write {len(batch)} captures: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        self.capture_dir.mkdir(parents=True, exist_ok=True)
+        payload = bytearray()
+        for image, image_name, record, timestamp in batch:
+            if image is None:
+                continue
+            image_path = self._save_image(image, image_name)
+            row = {
+                "timestamp": timestamp,
+                "image_name": image_name,
+                "image_path": image_path.name,
+                **record,
+            }
+            data = json.dumps(row, ensure_ascii=False, default=str).encode("utf-8")
+            payload += RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data
+
+        if payload:
+            log_file = self._get_log_file(len(payload))
+            log_file.write(payload)
+            log_file.flush()
+        self.written += sum(1 for item in batch if item[0] is not None)
+
+    def _save_image(self, image: bytes, image_name: str) -> Path:
+        suffix = Path(image_name or "").suffix.lower() or ".jpg"
+        image_path = self.capture_dir / f"{content_hash(image)}{suffix}"
+        # Cùng nội dung → cùng tên file, không ghi lại
+        if not image_path.exists():
+            tmp_path = image_path.with_suffix(image_path.suffix + ".tmp")
+            tmp_path.write_bytes(image)
+            os.replace(tmp_path, image_path)
+        return image_path
+
+    def _get_log_file(self, incoming_bytes: int):
+        if self._log_file is not None and self._log_file.tell() + incoming_bytes > self.max_log_bytes:
+            self._log_file.close()
+            self._log_file = None
+
+        if self._log_file is None:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            log_path = self.log_dir / f"predictions-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.bin"
+            self._log_file = open(log_path, "ab")
+            LOGGER.log.info(f"Writing prediction log to {log_path}")
+        return self._log_file
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until every queued capture has been written."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "queue_depth": self._queue.qsize(),
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+        }
+
+
+CAPTURE_WRITER = CaptureWriter()
+
+
+def read_prediction_log(log_path: Path) -> Iterator[dict]:
+    """Iterate over the rows of one prediction log file, stopping at a torn or corrupt record."""
+    with open(log_path, "rb") as f:
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            length, checksum = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length or zlib.crc32(data) != checksum:
+                return
+            yield json.loads(data)
@@ -1,5 +1,4 @@
 import sys
-import os
 import logging
 from logging.handlers import RotatingFileHandler
 from .app_path import AppPath
@@ -40,11 +39,6 @@ class Logger:
         file_handler.setFormatter(self.formatter)
         self.log.addHandler(file_handler)
 
-    def save_requests(self, image, image_name):
-        path_save = os.path.join(AppPath.CAPTURED_DATA_DIR, image_name)
-        self.log.info(f"Save image to {path_save}")
-        image.save(path_save)
-
     def log_model(self, predictor_name):
         self.log.info(f"Predictor name: {predictor_name}")
 
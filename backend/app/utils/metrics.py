@@ -0,0 +1,278 @@
+import itertools
+import threading
+import time
+
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from app.config.metrics_cfg import MetricsConfig
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one series per label tuple."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(values)]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. `observe` is a bisect plus two additions under a lock,
+    cheap enough to run on every frame; buckets are only made cumulative when rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = (),
+                 buckets: Tuple[float, ...] = MetricsConfig.STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [count theo từng bucket (+Inf ở cuối), sum]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def render(self) -> list:
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        lines = []
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                label_str = _format_labels(self.labelnames + ("le",), labels + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {total!r}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class CallbackGauge:
+    """Gauge read at scrape time: `fn` returns {label tuple: value}, e.g. current queue depths."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels, fn: Callable[[], Dict[Labels, float]],
+                 metric_type: str = "gauge"):
+        self.type = metric_type
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.fn = fn
+
+    def render(self) -> list:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(self.fn().items())]
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class WsSession:
+    """
+    Live counters of one WebSocket connection. `source` is the frame receiver (or camera
+    subscription) of the connection; its `dropped` counter is read at scrape time.
+    """
+
+    def __init__(self, metrics: "Metrics", endpoint: str, session_id: int, source=None):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.session_id = session_id
+        self.source = source
+        self.frames = 0
+        self.fps = 0.0
+        self._last_frame: Optional[float] = None
+
+    @property
+    def dropped(self) -> int:
+        return getattr(self.source, "dropped", 0) if self.source is not None else 0
+
+    def frame_done(self):
+        """Count one answered frame and update the smoothed fps."""
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            interval = now - self._last_frame
+            if interval > 0:
+                instant = 1.0 / interval
+                alpha = MetricsConfig.FPS_SMOOTHING
+                self.fps = instant if self.frames <= 1 else (1 - alpha) * self.fps + alpha * instant
+        self._last_frame = now
+        self.frames += 1
+        self.metrics.ws_frames.inc(self.endpoint)
+
+    def close(self):
+        self.metrics.close_session(self)
+
+
+class Metrics:
+    """
+    Process-wide metrics, rendered in the Prometheus text format by /metrics.
+    Per-stage latencies of the inference pipeline, HTTP request counts and durations,
+    live WebSocket sessions and any queue depth registered with `gauge`.
+    """
+
+    def __init__(self, enabled: bool = MetricsConfig.ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._session_ids = itertools.count(1)
+        self._sessions: Dict[int, WsSession] = {}
+        self._closed_dropped: Dict[str, int] = {}
+
+        self.stage_seconds = self.register(Histogram(
+            "emotion_stage_duration_seconds", "Time spent in one stage of the inference pipeline.",
+            ("endpoint", "stage"), MetricsConfig.STAGE_BUCKETS))
+        self.http_requests = self.register(Counter(
+            "emotion_http_requests_total", "HTTP requests by route and status code.",
+            ("method", "route", "status")))
+        self.http_seconds = self.register(Histogram(
+            "emotion_http_request_duration_seconds", "HTTP request duration until the response headers are sent.",
+            ("method", "route"), MetricsConfig.REQUEST_BUCKETS))
+        self.ws_frames = self.register(Counter(
+            "emotion_ws_frames_total", "WebSocket frames answered.", ("endpoint",)))
+        self.register(CallbackGauge(
+            "emotion_ws_frames_dropped_total", "WebSocket frames skipped because a newer frame arrived.",
+            ("endpoint",), self._dropped_totals, metric_type="counter"))
+        self.register(CallbackGauge(
+            "emotion_ws_sessions_active", "Open WebSocket sessions.", ("endpoint",), self._active_sessions))
+        self.register(CallbackGauge(
+            "emotion_ws_session_fps", "Smoothed answered frames per second of each open WebSocket session.",
+            ("endpoint", "session"),
+            lambda: {(s.endpoint, str(s.session_id)): round(s.fps, 3) for s in self._live_sessions()}))
+        self.register(CallbackGauge(
+            "emotion_ws_session_frames_dropped", "Frames dropped so far by each open WebSocket session.",
+            ("endpoint", "session"),
+            lambda: {(s.endpoint, str(s.session_id)): s.dropped for s in self._live_sessions()}))
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Labels, fn: Callable[[], Dict[Labels, float]]):
+        """Register a gauge computed at scrape time."""
+        return self.register(CallbackGauge(name, documentation, labelnames, fn))
+
+    def stage(self, endpoint: str, stage: str):
+        """Context manager timing one pipeline stage, works around sync code and awaits alike."""
+        if not self.enabled:
+            return nullcontext()
+        return _Timer(self.stage_seconds, (endpoint, stage))
+
+    def timed(self, fn: Callable, endpoint: str, stage: str) -> Callable:
+        """`fn` wrapped so every call is recorded as `stage`; for callbacks such as detector.detect."""
+        if not self.enabled:
+            return fn
+
+        def wrapper(*args, **kwargs):
+            with _Timer(self.stage_seconds, (endpoint, stage)):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        if not self.enabled:
+            return
+        self.http_requests.inc(method, route, str(status))
+        self.http_seconds.observe(seconds, method, route)
+
+    def open_session(self, endpoint: str, source=None) -> WsSession:
+        session = WsSession(self, endpoint, next(self._session_ids), source)
+        with self._lock:
+            self._sessions[session.session_id] = session
+        return session
+
+    def close_session(self, session: WsSession):
+        with self._lock:
+            if self._sessions.pop(session.session_id, None) is not None:
+                self._closed_dropped[session.endpoint] = self._closed_dropped.get(session.endpoint, 0) + session.dropped
+
+    def _live_sessions(self) -> list:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def _active_sessions(self) -> dict:
+        counts = {}
+        for session in self._live_sessions():
+            counts[(session.endpoint,)] = counts.get((session.endpoint,), 0) + 1
+        return counts
+
+    def _dropped_totals(self) -> dict:
+        with self._lock:
+            totals = {(endpoint,): dropped for endpoint, dropped in self._closed_dropped.items()}
+        for session in self._live_sessions():
+            totals[(session.endpoint,)] = totals.get((session.endpoint,), 0) + session.dropped
+        return totals
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
@@ -0,0 +1,338 @@
+import asyncio
+import collections
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from app.config.profiling_cfg import ProfilingConfig
+from .app_path import AppPath
+from .logger import Logger
+
+LOGGER = Logger(__file__, log_file="profiler.log")
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}-[0-9]{6}-[a-z0-9_-]+-[0-9a-f]{6}$")
+PROFILE_FILES = {
+    "trace": ".trace.json",    # Chrome trace (chrome://tracing, Perfetto) của torch.profiler
+    "folded": ".folded",       # stack Python dạng folded (flamegraph.pl, speedscope, inferno)
+    "meta": ".json",
+}
+
+# Leaf của thread đang rảnh (worker chờ job, event loop chờ IO), không đưa vào flamegraph
+_IDLE_LEAVES = {("threading.py", "wait"), ("selectors.py", "select"), ("thread.py", "_worker"),
+                ("queue.py", "get"), ("base_events.py", "_run_once")}
+
+
+class StackSampler:
+    """
+    Samples the Python stack of every thread every `interval` seconds and counts the
+    folded stacks ("thread;outer;...;inner"). Idle threads are skipped.
+    """
+
+    def __init__(self, interval: float = ProfilingConfig.SAMPLE_INTERVAL_MS / 1000, on_tick=None):
+        self.interval = interval
+        self.on_tick = on_tick
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> collections.Counter:
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            if self.on_tick is not None:
+                self.on_tick()
+
+
+class ProfileSession:
+    """
+    One captured profile: torch.profiler over every thread (when supported) plus the
+    stack sampler, from `start` until `finish`. Files are written on the profiler's
+    control thread, so finishing never blocks the caller.
+    """
+
+    def __init__(self, profiler: "RequestProfiler", target: str, trigger: str):
+        self.profiler = profiler
+        self.target = target
+        self.trigger = trigger
+        slug = re.sub(r"[^a-z0-9_-]+", "_", target.lower()).strip("_")[:40] or "profile"
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{os.urandom(3).hex()}"
+        self.started_at = time.time()
+        self.frames = 0
+        self._start_time = time.perf_counter()
+        self._torch_profile = None
+        self._sampler = StackSampler(on_tick=self._check_deadline)
+        self._finished = threading.Event()
+
+    def _start(self):
+        # Chạy trên control thread: kineto phải start / stop trên cùng một thread
+        self._torch_profile = self.profiler.new_torch_profile()
+        if self._torch_profile is not None:
+            self._torch_profile.start()
+        self._sampler.start()
+
+    def _check_deadline(self):
+        if time.perf_counter() - self._start_time > ProfilingConfig.MAX_SECONDS:
+            self.finish()
+
+    def finish(self):
+        """Stop capturing and write the files in the background; safe to call more than once."""
+        if self._finished.is_set():
+            return
+        self._finished.set()
+        self.profiler.submit(self._stop_and_write)
+
+    def _stop_and_write(self):
+        try:
+            duration = time.perf_counter() - self._start_time
+            stacks = self._sampler.stop()
+            if self._torch_profile is not None:
+                self._torch_profile.stop()
+            self.profiler.write(self, duration, stacks, self._torch_profile)
+        except Exception as e:
+            LOGGER.log.error(f"Fail to write profile {self.profile_id}: {e}")
+        finally:
+            self.profiler.release(self)
+
+
+class WsProfileWindow:
+    """Profiles the first `frames` frames of a WebSocket session (no-op when not requested)."""
+
+    def __init__(self, session: Optional[ProfileSession], frames: int = ProfilingConfig.WS_FRAMES):
+        self.session = session
+        self.remaining = frames
+
+    @property
+    def profile_id(self) -> Optional[str]:
+        return self.session.profile_id if self.session is not None else None
+
+    def step(self):
+        if self.session is None:
+            return
+        self.session.frames += 1
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.close()
+
+    def close(self):
+        if self.session is not None:
+            self.session.finish()
+            self.session = None
+
+
+class RequestProfiler:
+    """
+    Opt-in profiling of single requests or WebSocket frame windows.
+    A request asks for it with the `X-Profile: 1` header or `?profile=1`; the server only
+    honours it when profiling is enabled, the sample rate draws it and no other profile
+    is running (at most one at a time, at least `min_interval` seconds apart).
+    """
+
+    def __init__(
+        self,
+        enabled: bool = ProfilingConfig.ENABLED,
+        profile_dir: Path = AppPath.PROFILE_DIR,
+        sample_rate: float = ProfilingConfig.SAMPLE_RATE,
+        min_interval: float = ProfilingConfig.MIN_INTERVAL_SECONDS,
+        max_profiles: int = ProfilingConfig.MAX_PROFILES
+    ):
+        self.enabled = enabled
+        self.profile_dir = Path(profile_dir)
+        self.sample_rate = sample_rate
+        self.min_interval = min_interval
+        self.max_profiles = max_profiles
+        self.torch_supported = True
+        self._lock = threading.Lock()
+        self._active: Optional[ProfileSession] = None
+        self._last_start = 0.0
+        self._control: Optional[ThreadPoolExecutor] = None
+        self.captured = 0
+        self.skipped = 0
+
+    def _get_control(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._control is None:
+                self._control = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profiler")
+            return self._control
+
+    def submit(self, fn, *args):
+        return self._get_control().submit(fn, *args)
+
+    def new_torch_profile(self):
+        if not self.torch_supported:
+            return None
+        import torch
+        from torch.profiler import profile, ProfilerActivity
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        try:
+            from torch._C._profiler import _ExperimentalConfig
+            # Inference chạy trong thread pool, profiler mặc định chỉ ghi thread đã start nó
+            config = _ExperimentalConfig(profile_all_threads=True)
+        except (ImportError, TypeError):
+            self.torch_supported = False
+            LOGGER.log.warning("torch.profiler cannot profile all threads in this torch version, "
+                               "profiles only contain Python stack samples")
+            return None
+        return profile(activities=activities, record_shapes=ProfilingConfig.RECORD_SHAPES,
+                       experimental_config=config)
+
+    def requested(self, headers, query_params) -> bool:
+        flag = headers.get(ProfilingConfig.HEADER) or query_params.get(ProfilingConfig.QUERY_PARAM)
+        return self.enabled and flag is not None and flag.lower() in ("1", "true", "yes")
+
+    async def begin(self, target: str, trigger: str) -> Optional[ProfileSession]:
+        """Start a profile for `target` if sampling allows it, otherwise None."""
+        with self._lock:
+            now = time.monotonic()
+            if (self._active is not None or now - self._last_start < self.min_interval
+                    or random.random() >= self.sample_rate):
+                self.skipped += 1
+                return None
+            session = ProfileSession(self, target, trigger)
+            self._active = session
+            self._last_start = now
+        try:
+            await asyncio.wrap_future(self.submit(session._start))
+        except Exception as e:
+            LOGGER.log.error(f"Fail to start profile: {e}")
+            self.release(session)
+            return None
+        return session
+
+    async def ws_window(self, websocket, target: str) -> WsProfileWindow:
+        session = None
+        if self.requested(websocket.headers, websocket.query_params):
+            session = await self.begin(target, "websocket")
+        return WsProfileWindow(session)
+
+    def release(self, session: ProfileSession):
+        with self._lock:
+            if self._active is session:
+                self._active = None
+
+    def write(self, session: ProfileSession, duration: float, stacks: collections.Counter, torch_profile):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        base = self.profile_dir / session.profile_id
+        top_ops = []
+        if torch_profile is not None:
+            torch_profile.export_chrome_trace(str(base) + PROFILE_FILES["trace"])
+            averages = sorted(torch_profile.key_averages(), key=lambda e: e.self_cpu_time_total, reverse=True)
+            top_ops = [{"name": e.key, "count": e.count, "self_cpu_ms": round(e.self_cpu_time_total / 1000, 3),
+                        "cpu_total_ms": round(e.cpu_time_total / 1000, 3)} for e in averages[:15]]
+
+        with open(str(base) + PROFILE_FILES["folded"], "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        meta = {
+            "profile_id": session.profile_id,
+            "target": session.target,
+            "trigger": session.trigger,
+            "started_at": session.started_at,
+            "duration_ms": round(duration * 1000, 3),
+            "ws_frames": session.frames,
+            "stack_samples": session._sampler.samples,
+            "files": [kind for kind, suffix in PROFILE_FILES.items() if Path(str(base) + suffix).exists()] + ["meta"],
+            "top_ops": top_ops,
+        }
+        with open(str(base) + PROFILE_FILES["meta"], "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        self.captured += 1
+        LOGGER.log.info(f"Profile {session.profile_id} ({session.target}) written, {meta['duration_ms']} ms")
+        self._prune()
+
+    def _prune(self):
+        metas = sorted(self.profile_dir.glob("*" + PROFILE_FILES["meta"]))
+        metas = [path for path in metas if not path.name.endswith(PROFILE_FILES["trace"])]
+        for path in metas[:-self.max_profiles] if self.max_profiles > 0 else metas:
+            profile_id = path.name[:-len(PROFILE_FILES["meta"])]
+            for suffix in PROFILE_FILES.values():
+                Path(str(self.profile_dir / profile_id) + suffix).unlink(missing_ok=True)
+
+    def list_profiles(self) -> list:
+        profiles = []
+        for path in sorted(self.profile_dir.glob("*" + PROFILE_FILES["meta"]), reverse=True):
+            if path.name.endswith(PROFILE_FILES["trace"]):
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta.pop("top_ops", None)
+            profiles.append(meta)
+        return profiles
+
+    def profile_file(self, profile_id: str, kind: str) -> Optional[Path]:
+        """Path of one file of a captured profile, None for unknown ids / kinds."""
+        if kind not in PROFILE_FILES or not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = Path(str(self.profile_dir / profile_id) + PROFILE_FILES[kind])
+        return path if path.exists() else None
+
+    def warmup(self):
+        """Kineto takes ~1-2 s to initialise on first use; do it in the background at startup."""
+        if not self.enabled:
+            return
+
+        def _warmup():
+            torch_profile = self.new_torch_profile()
+            if torch_profile is not None:
+                torch_profile.start()
+                torch_profile.stop()
+        self.submit(_warmup)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "torch_profiler": self.torch_supported,
+            "sample_rate": self.sample_rate,
+            "min_interval_seconds": self.min_interval,
+            "active": self._active.profile_id if self._active is not None else None,
+            "captured": self.captured,
+            "skipped": self.skipped,
+        }
+
+    def shutdown(self):
+        if self._active is not None:
+            self._active.finish()
+        with self._lock:
+            control, self._control = self._control, None
+        if control is not None:
+            control.shutdown(wait=True)
+
+
+PROFILER = RequestProfiler()
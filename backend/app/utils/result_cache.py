@@ -0,0 +1,202 @@
+import json
+import queue
+import asyncio
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from app.config.cache_cfg import ResultCacheConfig
+from .logger import Logger
+from .utils import content_hash
+
+LOGGER = Logger(__file__, log_file="cache.log")
+
+
+class ResultCache:
+    """
+    Content-addressed cache of endpoint results.
+    Keys hash the raw upload bytes together with everything that changes the answer
+    (endpoint, model name/weights, thresholds). An in-memory LRU with TTL sits in front
+    of an optional sqlite tier that survives restarts. Disk writes go through a queue to a
+    background writer thread; from the event loop use `aget`, which reads the disk off the loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ResultCacheConfig.MAX_ENTRIES,
+        ttl_seconds: float = ResultCacheConfig.TTL_SECONDS,
+        disk_path: Optional[Path] = ResultCacheConfig.DISK_PATH if ResultCacheConfig.DISK_ENABLED else None,
+        disk_max_entries: int = ResultCacheConfig.DISK_MAX_ENTRIES,
+        disk_queue_size: int = ResultCacheConfig.DISK_QUEUE_SIZE,
+        disk_batch_size: int = ResultCacheConfig.DISK_BATCH_SIZE
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self.disk_batch_size = disk_batch_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Connection đọc dùng chung (có lock riêng), thread ghi mở connection của nó: WAL cho đọc song song với ghi
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._queue = queue.Queue(maxsize=disk_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dropped_writes = 0
+        self._disk_writes = 0
+
+    @staticmethod
+    def make_key(data: bytes, *parts) -> str:
+        return content_hash(data) + ":" + content_hash("|".join(map(str, parts)).encode("utf-8"))
+
+    def _connect(self) -> sqlite3.Connection:
+        self.disk_path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(self.disk_path), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+        db.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+        db.commit()
+        return db
+
+    def _get_memory(self, key: str, now: float) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        return None
+
+    def _get_disk(self, key: str, now: float) -> Optional[dict]:
+        """Blocking sqlite lookup; a hit is promoted to the memory tier."""
+        try:
+            with self._db_lock:
+                if self._db is None:
+                    self._db = self._connect()
+                row = self._db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            LOGGER.log.error(f"Fail to read result cache: {e}")
+            return None
+        if row is None or now - row[1] > self.ttl_seconds:
+            return None
+        value = json.loads(row[0])
+        with self._lock:
+            self._put_memory(key, value, row[1])
+            self.disk_hits += 1
+        return value
+
+    def _count_miss(self, value: Optional[dict]) -> Optional[dict]:
+        if value is None:
+            with self._lock:
+                self.misses += 1
+        return value
+
+    def get(self, key: str) -> Optional[dict]:
+        """Blocking lookup (memory, then disk); request handlers use `aget`."""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None and self.disk_path is not None:
+            value = self._get_disk(key, now)
+        return self._count_miss(value)
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """Same as `get`, but the sqlite lookup runs in a worker thread instead of on the event loop."""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None and self.disk_path is not None:
+            value = await asyncio.to_thread(self._get_disk, key, now)
+        return self._count_miss(value)
+
+    def set(self, key: str, value: dict):
+        """Store in memory now, queue the disk write for the writer thread (never blocks)."""
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, value, now)
+        if self.disk_path is None:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((key, json.dumps(value), now))
+        except queue.Full:
+            self.dropped_writes += 1
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="result-cache-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        db = None
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.disk_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if db is None:
+                    db = self._connect()
+                # Một transaction cho cả lô
+                db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", batch)
+                previous, self._disk_writes = self._disk_writes, self._disk_writes + len(batch)
+                # Dọn tầng đĩa định kỳ thay vì mỗi lần ghi
+                if previous // 256 != self._disk_writes // 256:
+                    self._prune_disk(db, time.time())
+                db.commit()
+            except sqlite3.Error as e:
+                LOGGER.log.error(f"Fail to write {len(batch)} results to the result cache: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until every queued disk write has been committed."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _put_memory(self, key: str, value: dict, created: float):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _prune_disk(self, db, now: float):
+        db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,))
+        db.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": self.disk_path is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_queue_depth": self._queue.qsize(),
+            "dropped_writes": self.dropped_writes,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+RESULT_CACHE = ResultCache()
@@ -1,11 +1,16 @@
 import os
-from .app_path import AppPath
-
-def save_cache(image_name, image_path, predictor_name, predictor_weight, probs, best_prob, pred_id, pred_class):
-    cache_path = f"{AppPath.CACHE_DIR}/predicted_cache.csv"
-    cache_exists = os.path.isfile(cache_path)
-    with open(cache_path, "a") as f:
-        if not cache_exists:
-            f.write("Image_name,Image_path,Predictor_name,Predictor_weight,Probabilities,Best_prob,Predicted_id,Predicted_class\n")
-        f.write(f"{image_name},{image_path},{predictor_name},{predictor_weight},{probs},{best_prob},{pred_id},{pred_class}\n")
-        
\ No newline at end of file
+import hashlib
+
+
+def content_hash(data: bytes) -> str:
+    """Short, fast content hash used to name captured images and key cached results."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_fingerprint(path) -> str:
+    """Path, size and mtime of a weight file, so cache keys change when the file is replaced."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return str(path)
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
@@ -0,0 +1,90 @@
+import asyncio
+import struct
+
+from typing import Optional, Union
+from fastapi import WebSocket, WebSocketDisconnect
+
+# Header của frame kết quả nhị phân: seq (uint32 big-endian) + JPEG
+SEQ_HEADER = struct.Struct(">I")
+
+
+class LatestFrameReceiver:
+    """
+    Per-connection reader that keeps only the newest pending frame.
+    A background task drains the socket as fast as frames arrive; when the pipeline
+    is slower than the client, older frames are overwritten (and counted as dropped)
+    instead of piling up. Frames are numbered 1, 2, 3... in arrival order, which is
+    the same order the client sent them, so the client can match results to send times.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.received = 0
+        self.dropped = 0
+        self.binary = False
+        self._pending = None
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._reader())
+        return self
+
+    async def _reader(self):
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                payload = message.get("bytes")
+                if payload is None:
+                    payload = message.get("text")
+                if payload is None:
+                    continue
+
+                self.received += 1
+                if self._pending is not None:
+                    self.dropped += 1
+                self._pending = (self.received, payload)
+                self._ready.set()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            self._closed = True
+            self._ready.set()
+
+    async def next_frame(self) -> Optional[tuple]:
+        """Wait for the newest frame, returns (seq, payload) or None once the client is gone."""
+        self.start()
+        while self._pending is None:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+
+        seq, payload = self._pending
+        self._pending = None
+        self.binary = isinstance(payload, (bytes, bytearray))
+        return seq, payload
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def stats(self) -> dict:
+        return {"received": self.received, "dropped": self.dropped}
+
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def pack_frame(seq: int, payload: Union[bytes, bytearray]) -> bytes:
+    """Prefix an encoded frame with its sequence number."""
+    return SEQ_HEADER.pack(seq & 0xFFFFFFFF) + payload
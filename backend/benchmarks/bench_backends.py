@@ -0,0 +1,74 @@
+"""
+Benchmark: eager PyTorch vs ONNX Runtime for the ResNet emotion classifier.
+Reports median latency per batch, throughput and the max logit difference at batch sizes 1, 8 and 32.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_backends.py                    # weights từ ModelConfig.MODEL_WEIGHT
+    python benchmarks/bench_backends.py --random-weights   # không cần checkpoint
+"""
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+from src.emotion_classification.models.resnet_model import ResNet, Block
+from src.emotion_classification.models.backends import TorchBackend, OnnxRuntimeBackend
+from src.emotion_classification.models.export_onnx import export_onnx
+
+
+def load_model(weight, random_weights):
+    model = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES)
+    if not random_weights:
+        checkpoint = torch.load(weight, map_location="cpu", weights_only=False)
+        state_dict = checkpoint.state_dict() if isinstance(checkpoint, torch.nn.Module) else checkpoint
+        model.load_state_dict(state_dict, strict=False)
+    return model.eval()
+
+
+def median_ms(fn, inputs, repeat):
+    fn(inputs)
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn(inputs)
+        timings.append(time.perf_counter() - start_time)
+    return float(np.median(timings)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weight", type=Path, default=ModelConfig.MODEL_WEIGHT)
+    parser.add_argument("--random-weights", action="store_true")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=0, help="torch / onnxruntime intra-op threads, 0 = default")
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    model = load_model(args.weight, args.random_weights)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        onnx_path = export_onnx(model, Path(tmp_dir) / "model.onnx")
+        backends = [TorchBackend(model), OnnxRuntimeBackend(onnx_path, num_threads=args.threads)]
+
+        img_size = EmotionDataConfig.IMG_SIZE
+        print(f"torch threads: {torch.get_num_threads()}")
+        print(f"{'batch':>5} | {'backend':>11} | {'ms/batch':>9} | {'img/s':>8} | {'max diff':>8}")
+        for batch_size in args.batch_sizes:
+            inputs = torch.randn(batch_size, 3, img_size, img_size, generator=torch.Generator().manual_seed(batch_size))
+            expected = backends[0](inputs)
+            for backend in backends:
+                diff = (backend(inputs) - expected).abs().max().item()
+                ms = median_ms(backend, inputs, args.repeat)
+                print(f"{batch_size:>5} | {backend.name:>11} | {ms:>9.2f} | {batch_size / ms * 1000:>8.1f} | {diff:>8.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: full-size decode of large uploads (old /detect and /analyze path) vs the
+resolution-aware decode (PIL draft mode at the detector input size).
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_decode.py
+    python benchmarks/bench_decode.py --image photo.jpg
+"""
+import io
+import sys
+import time
+import argparse
+import numpy as np
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from PIL import Image
+from src.emotion_classification.config.detect_cfg import YoloConfig
+from src.emotion_classification.utils.processor import decode_pil_image, decode_for_detection, decode_scaled
+
+
+def synthetic_jpeg(width: int, height: int, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(small).resize((width, height), Image.BICUBIC).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def time_ms(fn, repeat: int) -> float:
+    fn()
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start_time) / repeat * 1000
+
+
+def full_decode(data: bytes) -> int:
+    # Đường cũ: PIL decode toàn ảnh rồi analyze copy thêm một mảng numpy
+    pil_img = decode_pil_image(data)
+    array = np.asarray(pil_img.convert('RGB'))
+    return pil_img.width * pil_img.height * 4 + array.nbytes
+
+
+def detection_decode(data: bytes) -> int:
+    return decode_for_detection(data).image.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image", type=Path, default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.image is not None:
+        uploads = {args.image.name: args.image.read_bytes()}
+    else:
+        uploads = {f"{w}x{h}": synthetic_jpeg(w, h) for w, h in [(1280, 720), (1920, 1080), (4000, 3000)]}
+
+    print(f"{'image':>12} | {'full ms':>8} | {'full MB':>8} | {'detect ms':>9} | {'detect MB':>9} | "
+          f"{'detail ms':>9}")
+    for name, data in uploads.items():
+        full_bytes = full_decode(data)
+        detect_bytes = detection_decode(data)
+        # Trường hợp xấu nhất của analyze: decode thêm bản MAX_IMAGE_SIZE để crop mặt nhỏ
+        detail_ms = time_ms(lambda: decode_scaled(data, YoloConfig.MAX_IMAGE_SIZE), args.repeat)
+        print(f"{name:>12} | {time_ms(lambda: full_decode(data), args.repeat):>8.1f} | "
+              f"{full_bytes / 1024 ** 2:>8.1f} | {time_ms(lambda: detection_decode(data), args.repeat):>9.1f} | "
+              f"{detect_bytes / 1024 ** 2:>9.1f} | {detail_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: startup cost vs steady-state latency of the graph optimizations in graph_optimizer.py
+(BatchNorm folding, channels_last, TorchScript freeze, torch.compile) against the eager model.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_graph_opt.py --random-weights
+    python benchmarks/bench_graph_opt.py --modes off eager torchscript compile
+"""
+import sys
+import time
+import argparse
+import torch
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+from src.emotion_classification.models.graph_optimizer import optimize_for_inference, steady_state_ms
+from bench_backends import load_model
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weight", type=Path, default=ModelConfig.MODEL_WEIGHT)
+    parser.add_argument("--random-weights", action="store_true")
+    parser.add_argument("--modes", nargs="+", default=["off", "eager", "torchscript"])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    model = load_model(args.weight, args.random_weights)
+    img_size = EmotionDataConfig.IMG_SIZE
+
+    header = f"{'mode':>12} | {'CL':>5} | {'startup s':>9} | {'max diff':>8}"
+    header += "".join(f" | {'b' + str(b) + ' ms':>9}" for b in args.batch_sizes)
+    print(f"torch threads: {torch.get_num_threads()}")
+    print(header)
+    for mode in args.modes:
+        for channels_last in ([False] if mode == "off" else [False, True]):
+            start_time = time.perf_counter()
+            runtime, report = optimize_for_inference(model, mode=mode, channels_last=channels_last)
+            startup = time.perf_counter() - start_time
+
+            row = f"{report['mode']:>12} | {str(report['channels_last']):>5} | {startup:>9.2f} | " \
+                  f"{report.get('max_abs_diff', 0.0):>8.1e}"
+            for batch_size in args.batch_sizes:
+                inputs = torch.randn(batch_size, 3, img_size, img_size)
+                row += f" | {steady_state_ms(runtime, inputs, args.repeat):>9.2f}"
+            print(row)
+            for fallback in report.get("fallbacks", []):
+                print(f"{'':>12}   fallback: {fallback}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark: cold start of the API server. Spawns uvicorn in a fresh process and measures
+the time until the port answers (/healthz), until /readyz reports the models loaded and
+until the first /analyze request is answered. Servers without /readyz count as ready as
+soon as they listen (models loaded inside the startup hook).
+
+Runs offline with the synthetic weights of run_benchmarks.py unless --resnet-weight /
+--yolo-weight are given.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --blocking    # so sánh với warm up chặn startup
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import urllib.error
+import urllib.request
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from run_benchmarks import prepare_weights, synthetic_jpeg
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Chạy trong process server: trỏ config tới weights benchmark rồi mới import app
+SERVER_BOOTSTRAP = """
+import sys, json, time
+start_time = time.perf_counter()
+sys.path.insert(0, {backend!r})
+from pathlib import Path
+from src.emotion_classification.config.emotion_cfg import ModelConfig
+from app.utils import AppPath, CAPTURE_WRITER
+ModelConfig.MODEL_WEIGHT = {resnet!r}
+AppPath.RESNET_MODEL_WEIGHT = Path({resnet!r})
+AppPath.YOLO_MODEL_WEIGHT = Path({yolo!r})
+CAPTURE_WRITER.sample_rate = 0.0
+import main
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"import_seconds": time.perf_counter() - start_time, "heavy_modules": heavy}}), flush=True)
+import uvicorn
+uvicorn.run(main.app, host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+HEAVY_MODULES = ("torchvision", "ultralytics", "cv2", "onnxruntime", "gdown", "requests")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def http_status(url: str, data: bytes = None, headers: dict = None, timeout: float = 120.0):
+    """Status code of one request, None while the server does not accept connections."""
+    request = urllib.request.Request(url, data=data, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None
+
+
+def multipart(field: str, filename: str, payload: bytes, content_type: str):
+    boundary = "benchstartupboundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {content_type}\r\n\r\n").encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def one_run(weights: dict, env: dict, timeout: float, image: bytes) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    code = SERVER_BOOTSTRAP.format(backend=str(BACKEND_DIR), resnet=weights["resnet_weight"],
+                                   yolo=weights["yolo_weight"], heavy=HEAVY_MODULES, port=port)
+    start_time = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        info = json.loads(server.stdout.readline() or "{}")
+        deadline = start_time + timeout
+
+        # Port mở: request đầu tiên nhận được HTTP response (kể cả 404 ở server cũ)
+        while http_status(base_url + "/healthz", timeout=1.0) is None:
+            if server.poll() is not None or time.perf_counter() > deadline:
+                raise RuntimeError("server did not start")
+            time.sleep(0.01)
+        listening = time.perf_counter() - start_time
+
+        # Request đầu tiên gửi ngay khi port mở, chờ tới khi có kết quả
+        body, headers = multipart("file_upload", "bench.jpg", image, "image/jpeg")
+        status = http_status(base_url + "/v1/emotion_classification/analyze", body, headers, timeout=timeout)
+        first_analyze = time.perf_counter() - start_time
+
+        status_ready = http_status(base_url + "/readyz", timeout=1.0)
+        while status_ready == 503 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+            status_ready = http_status(base_url + "/readyz", timeout=1.0)
+        ready = time.perf_counter() - start_time if status_ready == 200 else listening
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    return {
+        "import_seconds": round(info.get("import_seconds", float("nan")), 3),
+        "listening_seconds": round(listening, 3),
+        "ready_seconds": round(ready, 3),
+        "first_analyze_seconds": round(first_analyze, 3),
+        "first_analyze_status": status,
+        "readyz": status_ready != 404,
+        "heavy_modules_after_import": info.get("heavy_modules", []),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--blocking", action="store_true", help="BACKGROUND_WARMUP=0: load models before listening")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--resnet-weight", type=Path, default=None)
+    parser.add_argument("--yolo-weight", type=Path, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    env = dict(os.environ, BACKGROUND_WARMUP="0" if args.blocking else "1", PROFILING_ENABLED="0")
+    weights = prepare_weights(args, Path(tempfile.mkdtemp(prefix="emotion_bench_")))
+    image = synthetic_jpeg(640, 480, args.seed)
+
+    runs = []
+    for i in range(args.runs):
+        runs.append(one_run(weights, env, args.timeout, image))
+        print(f"run {i + 1}: {json.dumps(runs[-1])}", flush=True)
+
+    summary = {key: round(float(np.median([run[key] for run in runs])), 3)
+               for key in ("import_seconds", "listening_seconds", "ready_seconds", "first_analyze_seconds")}
+    report = {"blocking": args.blocking, "median": summary, "runs": runs}
+    print(json.dumps(report["median"], indent=2))
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
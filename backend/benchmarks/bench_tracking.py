@@ -0,0 +1,138 @@
+"""
+Benchmark: per-frame YOLO detection vs FaceTracker (detect every N frames).
+Accuracy is measured against per-frame detection on the same frames (mean IoU of
+matched boxes, recall/precision at IoU >= 0.5), speed as frames per second.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_tracking.py                      # cảnh tổng hợp, detector giả lập
+    python benchmarks/bench_tracking.py --video clip.mp4     # video thật + YOLO từ MODEL_REGISTRY
+"""
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.emotion_classification.utils.tracker import FaceTracker, iou_matrix, greedy_match
+
+
+def synthetic_clip(n_frames, width=640, height=480, n_faces=2, seed=0):
+    """Textured background with textured ellipses moving on smooth paths; returns frames and true boxes."""
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    texture = cv2.GaussianBlur(rng.integers(0, 256, (160, 160, 3), dtype=np.uint8), (0, 0), 1.5)
+    start = rng.uniform([80, 80], [width - 200, height - 200], (n_faces, 2))
+    speed = rng.uniform(-4, 4, (n_faces, 2))
+    size = rng.uniform(70, 130, n_faces)
+
+    def bounce(position, low, high):
+        span = high - low
+        return low + span - abs((position - low) % (2 * span) - span)
+
+    frames, boxes = [], []
+    for t in range(n_frames):
+        frame = background.copy()
+        frame_boxes = []
+        for i in range(n_faces):
+            # Đi qua lại trong khung hình, có dao động nhẹ như người thật
+            half_w, half_h = size[i] / 2, size[i] * 0.6
+            cx = bounce(start[i, 0] + speed[i, 0] * t + 10 * np.sin(t / 7 + i), half_w, width - half_w)
+            cy = bounce(start[i, 1] + speed[i, 1] * t, half_h, height - half_h)
+            x1, y1, x2, y2 = int(cx - half_w), int(cy - half_h), int(cx + half_w), int(cy + half_h)
+
+            # Texture dính vào "khuôn mặt" để optical flow có điểm để bám
+            patch = cv2.resize(texture, (x2 - x1, y2 - y1))
+            mask = np.zeros(patch.shape[:2], dtype=np.uint8)
+            cv2.ellipse(mask, ((x2 - x1) // 2, (y2 - y1) // 2), ((x2 - x1) // 2, (y2 - y1) // 2), 0, 0, 360, 255, -1)
+            region = frame[y1:y2, x1:x2]
+            region[mask > 0] = patch[mask > 0]
+            frame_boxes.append((x1, y1, x2, y2, 0.9))
+        frames.append(frame)
+        boxes.append(frame_boxes)
+    return frames, boxes
+
+
+def read_video(path, max_frames):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def match_stats(reference, predicted):
+    ref = np.array([face[:4] for face in reference], dtype=np.float32).reshape(-1, 4)
+    pred = np.array([face[:4] for face in predicted], dtype=np.float32).reshape(-1, 4)
+    iou = iou_matrix(ref, pred)
+    matches = greedy_match(iou, 0.5)
+    return len(ref), len(pred), [float(iou[r, c]) for r, c in matches]
+
+
+def run(frames, detect_fn, reference, **tracker_kwargs):
+    tracker = FaceTracker(**tracker_kwargs)
+    outputs = []
+    start_time = time.perf_counter()
+    for frame in frames:
+        outputs.append(tracker.step(frame, detect_fn))
+    elapsed = time.perf_counter() - start_time
+
+    n_ref = n_pred = 0
+    ious = []
+    for ref_faces, faces in zip(reference, outputs):
+        r, p, matched = match_stats(ref_faces, faces)
+        n_ref += r
+        n_pred += p
+        ious.extend(matched)
+    return {
+        "fps": len(frames) / elapsed,
+        "detections": tracker.detections_run,
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        "recall": len(ious) / n_ref if n_ref else 1.0,
+        "precision": len(ious) / n_pred if n_pred else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video", type=Path, default=None, help="video file; YOLO is used as the detector")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--detect-ms", type=float, default=60.0,
+                        help="simulated detector latency for the synthetic clip (YOLOv8n on CPU is ~40-80 ms)")
+    parser.add_argument("--intervals", type=int, nargs="+", default=[1, 2, 3, 5, 10])
+    args = parser.parse_args()
+
+    if args.video is not None:
+        from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+        detector = MODEL_REGISTRY.get_detector()
+        frames = read_video(args.video, args.frames)
+        detect_fn = detector.detect
+        # Tham chiếu: detect mọi frame
+        reference = [detect_fn(frame) for frame in frames]
+    else:
+        frames, reference = synthetic_clip(args.frames)
+        lookup = {id(frame): boxes for frame, boxes in zip(frames, reference)}
+
+        def detect_fn(frame):
+            time.sleep(args.detect_ms / 1000)
+            return lookup[id(frame)]
+
+    print(f"{len(frames)} frames")
+    print(f"{'interval':>8} | {'flow':>5} | {'FPS':>7} | {'detects':>7} | {'mean IoU':>8} | {'recall':>6} | {'precision':>9}")
+    for interval in args.intervals:
+        for use_flow in (False, True):
+            if interval == 1 and use_flow:
+                continue
+            result = run(frames, detect_fn, reference, detect_interval=interval, use_optical_flow=use_flow)
+            print(f"{interval:>8} | {str(use_flow):>5} | {result['fps']:>7.1f} | {result['detections']:>7} | "
+                  f"{result['mean_iou']:>8.3f} | {result['recall']:>6.3f} | {result['precision']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: loading the classifier / detector weights from the pickled .pt checkpoints vs the
+converted .safetensors artifacts (convert_weights.py). Every load runs in a fresh process so
+the reported peak RSS growth (VmHWM) belongs to the load alone.
+
+Runs offline with the synthetic weights of run_benchmarks.py unless --resnet-weight /
+--yolo-weight are given; the artifacts are written to a temporary directory.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_weights.py
+    python benchmarks/bench_weights.py --runs 5 --output weights.json
+"""
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from run_benchmarks import prepare_weights
+from src.emotion_classification.models.convert_weights import convert_resnet, convert_yolo
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Import trước khi đo: chỉ tính phần load weights, không tính import torch / ultralytics
+LOADERS = {
+    "resnet_pickle": """
+import torch
+from src.emotion_classification.models.resnet_model import ResNet, Block
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig as C
+with LoadStats("pickle") as stats:
+    model = ResNet(Block, C.N_BLOCK_LST, num_classes=C.N_CLASSES)
+    model.load_state_dict(torch.load(WEIGHT, map_location="cpu", weights_only=False), strict=False)
+""",
+    "resnet_safetensors": """
+import torch
+from src.emotion_classification.models.resnet_model import ResNet, Block
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig as C
+from src.emotion_classification.models.weight_store import load_weights, load_into
+with LoadStats("safetensors") as stats:
+    tensors, manifest = load_weights(WEIGHT, verify=VERIFY)
+    with torch.device("meta"):
+        model = ResNet(Block, C.N_BLOCK_LST, num_classes=C.N_CLASSES)
+    load_into(model, tensors, WEIGHT)
+""",
+    "yolo_pickle": """
+from ultralytics import YOLO
+with LoadStats("pickle") as stats:
+    model = YOLO(WEIGHT)
+""",
+    "yolo_safetensors": """
+from ultralytics import YOLO
+from src.emotion_classification.models.weight_store import load_yolo
+with LoadStats("safetensors") as stats:
+    model = load_yolo(WEIGHT, verify=VERIFY)
+""",
+}
+
+BOOTSTRAP = """
+import sys, json
+sys.path.insert(0, {backend!r})
+from src.emotion_classification.models.weight_store import LoadStats
+WEIGHT, VERIFY = {weight!r}, {verify!r}
+{body}
+print(json.dumps(stats.report))
+"""
+
+
+def one_load(name: str, weight: Path, verify: bool) -> dict:
+    code = BOOTSTRAP.format(backend=str(BACKEND_DIR), weight=str(weight), verify=verify, body=LOADERS[name])
+    output = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--resnet-weight", type=Path, default=None)
+    parser.add_argument("--yolo-weight", type=Path, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="emotion_bench_"))
+    weights = prepare_weights(args, workdir)
+    resnet_pt = workdir / "resnet.pt"
+    yolo_pt = workdir / "yolo.pt"
+    shutil.copy(weights["resnet_weight"], resnet_pt)
+    shutil.copy(weights["yolo_weight"], yolo_pt)
+    convert_resnet(resnet_pt, resnet_pt.with_suffix(".safetensors"))
+    convert_yolo(yolo_pt, yolo_pt.with_suffix(".safetensors"))
+
+    cases = [
+        ("resnet_pickle", resnet_pt, False),
+        ("resnet_safetensors", resnet_pt.with_suffix(".safetensors"), True),
+        ("resnet_safetensors", resnet_pt.with_suffix(".safetensors"), False),
+        ("yolo_pickle", yolo_pt, False),
+        ("yolo_safetensors", yolo_pt.with_suffix(".safetensors"), True),
+        ("yolo_safetensors", yolo_pt.with_suffix(".safetensors"), False),
+    ]
+    results = []
+    for name, weight, verify in cases:
+        runs = [one_load(name, weight, verify) for _ in range(args.runs)]
+        row = {
+            "case": name + ("" if "pickle" in name else ("+sha256" if verify else "")),
+            "file_mb": round(weight.stat().st_size / 1024 ** 2, 1),
+            **{key: round(float(np.median([run[key] for run in runs if key in run] or [float("nan")])), 4)
+               for key in ("seconds", "rss_delta_mb", "peak_rss_delta_mb")},
+        }
+        results.append(row)
+        print(f"{row['case']:>26}: {row['seconds'] * 1000:8.1f} ms, RSS +{row['rss_delta_mb']} MB, "
+              f"peak +{row['peak_rss_delta_mb']} MB ({row['file_mb']} MB file)", flush=True)
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps({"runs": args.runs, "results": results}, indent=2))
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark: pre-fork serving (server.serve_prefork) at several worker counts. For each count
+the server is started in a fresh process, /analyze is loaded by `--concurrency-per-worker`
+clients per worker for `--seconds`, and the memory of every worker is read from /proc:
+RSS (pages the worker touches, shared ones included), PSS (shared pages split between
+the processes sharing them) and USS (pages only this worker owns).
+
+Linux only (fork + /proc). Runs offline with the synthetic weights of run_benchmarks.py
+unless --resnet-weight / --yolo-weight are given.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --workers 1 2 4 --seconds 20 --output workers.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from run_benchmarks import prepare_weights, synthetic_jpeg, latency_stats
+from bench_startup import free_port, http_status
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+SERVER_BOOTSTRAP = """
+import sys
+sys.path.insert(0, {backend!r})
+from pathlib import Path
+from src.emotion_classification.config.emotion_cfg import ModelConfig
+from app.utils import AppPath, CAPTURE_WRITER
+ModelConfig.MODEL_WEIGHT = {resnet!r}
+AppPath.RESNET_MODEL_WEIGHT = Path({resnet!r})
+AppPath.YOLO_MODEL_WEIGHT = Path({yolo!r})
+CAPTURE_WRITER.sample_rate = 0.0
+import server
+server.serve_prefork("127.0.0.1", {port}, {workers}, {threads})
+"""
+
+
+def memory_kb(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "uss_mb": round((fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024, 1),
+    }
+
+
+def child_pids(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+async def load(port: int, clients: int, seconds: float, image: bytes) -> dict:
+    import httpx
+
+    url = f"http://127.0.0.1:{port}/v1/emotion_classification/analyze"
+    latencies = []
+    errors = 0
+    counter = iter(range(10 ** 9))
+    deadline = time.perf_counter() + seconds
+
+    async def client(http):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            # Byte thừa sau JPEG EOI: decoder bỏ qua, nhưng mỗi request có hash khác nên không trúng result cache
+            payload = image + next(counter).to_bytes(8, "big")
+            start_time = time.perf_counter()
+            response = await http.post(url, files={"file_upload": ("bench.jpg", payload, "image/jpeg")})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start_time)
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(timeout=120.0, limits=limits) as http:
+        start_time = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(clients)))
+        elapsed = time.perf_counter() - start_time
+    return {"requests_per_second": round(len(latencies) / elapsed, 2), "errors": errors,
+            "latency": latency_stats(latencies) if latencies else None}
+
+
+def one_count(weights: dict, workers: int, args, image: bytes) -> dict:
+    port = free_port()
+    code = SERVER_BOOTSTRAP.format(backend=str(BACKEND_DIR), resnet=weights["resnet_weight"],
+                                   yolo=weights["yolo_weight"], port=port, workers=workers, threads=args.threads)
+    env = dict(os.environ, PROFILING_ENABLED="0")
+    server = subprocess.Popen([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.perf_counter() + args.timeout
+        while http_status(f"http://127.0.0.1:{port}/readyz", timeout=1.0) != 200:
+            if server.poll() is not None or time.perf_counter() > deadline:
+                raise RuntimeError(f"server with {workers} workers did not start")
+            time.sleep(0.1)
+        while len(child_pids(server.pid)) < workers:
+            time.sleep(0.1)
+
+        # Warm up mọi worker (lazy thread pool, allocator) trước khi đo
+        asyncio.run(load(port, workers * args.concurrency_per_worker, 2.0, image))
+        result = asyncio.run(load(port, workers * args.concurrency_per_worker, args.seconds, image))
+
+        per_worker = [memory_kb(pid) for pid in child_pids(server.pid)]
+        parent = memory_kb(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    return {
+        "workers": workers,
+        "clients": workers * args.concurrency_per_worker,
+        **result,
+        "parent_memory": parent,
+        "worker_memory": per_worker,
+        "rss_per_worker_mb": round(float(np.mean([m["rss_mb"] for m in per_worker])), 1),
+        "uss_per_worker_mb": round(float(np.mean([m["uss_mb"] for m in per_worker])), 1),
+        # Tổng bộ nhớ thật của cả server: PSS cộng lại không đếm trùng page dùng chung
+        "total_pss_mb": round(parent["pss_mb"] + sum(m["pss_mb"] for m in per_worker), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, default=0, help="torch threads per worker (0 = cores / workers)")
+    parser.add_argument("--concurrency-per-worker", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--resnet-weight", type=Path, default=None)
+    parser.add_argument("--yolo-weight", type=Path, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    weights = prepare_weights(args, Path(tempfile.mkdtemp(prefix="emotion_bench_")))
+    image = synthetic_jpeg(640, 480, args.seed)
+
+    results = []
+    for workers in args.workers:
+        results.append(one_count(weights, workers, args, image))
+        row = results[-1]
+        print(f"{workers} workers: {row['requests_per_second']} req/s, RSS/worker {row['rss_per_worker_mb']} MB, "
+              f"USS/worker {row['uss_per_worker_mb']} MB, total PSS {row['total_pss_mb']} MB", flush=True)
+
+    report = {"cpus": len(os.sched_getaffinity(0)), "weights": weights, "results": results}
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Saved {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
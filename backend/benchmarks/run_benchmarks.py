@@ -0,0 +1,329 @@
+"""
+Benchmark suite: Predictor.predict, Predictor.model_inference at several batch sizes,
+FacesDetector.detect_faces, /analyze through an in-process ASGI client and sustained
+fps / latency on the /ws-client and /game-ws WebSockets.
+
+Runs offline: images are synthetic and, unless --resnet-weight / --yolo-weight are given,
+the classifier gets random weights and the detector a random YOLOv8n built from its yaml
+(so it finds no faces and /analyze measures decode + detection only).
+Results are written as JSON so runs can be compared over time.
+
+Chạy từ thư mục backend:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --only predict model_inference --output before.json
+    python benchmarks/run_benchmarks.py --resnet-weight weights/resnet.pt --yolo-weight weights/yolo.pt
+"""
+import io
+import sys
+import json
+import time
+import queue
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import numpy as np
+import torch
+
+from datetime import datetime, timezone
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from PIL import Image
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+from src.emotion_classification.config.detect_cfg import YoloConfig
+from app.utils import AppPath
+
+BENCHMARKS = ("predict", "model_inference", "detect_faces", "analyze", "ws_client", "game_ws")
+
+
+def synthetic_jpeg(width: int, height: int, seed: int) -> bytes:
+    # Ảnh mượt (upsample từ noise thấp) gần với ảnh thật hơn noise thuần
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (max(2, height // 16), max(2, width // 16), 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(small).resize((width, height), Image.BICUBIC).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def latency_stats(seconds: list) -> dict:
+    ms = np.asarray(seconds) * 1000
+    return {
+        "n": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def prepare_weights(args, workdir: Path):
+    """Point the model config at the given checkpoints, or at synthetic ones written to `workdir`."""
+    from src.emotion_classification.models.resnet_model import ResNet, Block
+
+    resnet_weight = args.resnet_weight
+    if resnet_weight is None:
+        torch.manual_seed(args.seed)
+        model = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES)
+        resnet_weight = workdir / "resnet_random.pt"
+        torch.save(model.state_dict(), resnet_weight)
+
+    yolo_weight = args.yolo_weight
+    if yolo_weight is None:
+        from ultralytics import YOLO
+        yolo_weight = workdir / "yolov8n_random.pt"
+        YOLO("yolov8n.yaml").save(str(yolo_weight))
+
+    ModelConfig.MODEL_WEIGHT = str(resnet_weight)
+    AppPath.RESNET_MODEL_WEIGHT = Path(resnet_weight)
+    AppPath.YOLO_MODEL_WEIGHT = Path(yolo_weight)
+    return {"resnet_weight": str(resnet_weight), "yolo_weight": str(yolo_weight),
+            "synthetic": args.resnet_weight is None or args.yolo_weight is None}
+
+
+# ---------------------------------------------------------------- model-level
+
+async def bench_predict(args) -> dict:
+    from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+
+    predictor = MODEL_REGISTRY.get_predictor()
+    images = [synthetic_jpeg(224, 224, args.seed + i) for i in range(args.repeat)]
+    await predictor.predict(images[0], "warmup.jpg")
+    timings = []
+    for i, image in enumerate(images):
+        start_time = time.perf_counter()
+        await predictor.predict(image, f"{i}.jpg")
+        timings.append(time.perf_counter() - start_time)
+    return {"image": "224x224 jpeg", **latency_stats(timings)}
+
+
+async def bench_model_inference(args) -> dict:
+    from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+
+    predictor = MODEL_REGISTRY.get_predictor()
+    img_size = EmotionDataConfig.IMG_SIZE
+    results = {}
+    for batch_size in args.batch_sizes:
+        inputs = torch.randn(batch_size, 3, img_size, img_size)
+        await predictor.model_inference(inputs)
+        timings = []
+        for _ in range(args.repeat):
+            start_time = time.perf_counter()
+            await predictor.model_inference(inputs)
+            timings.append(time.perf_counter() - start_time)
+        stats = latency_stats(timings)
+        stats["images_per_s"] = round(batch_size / (stats["mean_ms"] / 1000), 1)
+        results[f"batch_{batch_size}"] = stats
+    return results
+
+
+async def bench_detect_faces(args) -> dict:
+    from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+
+    detector = MODEL_REGISTRY.get_detector()
+    results = {}
+    for width, height in [(640, 480), (1920, 1080)]:
+        images = [synthetic_jpeg(width, height, args.seed + i) for i in range(args.repeat)]
+        await detector.detect_faces(images[0], "warmup.jpg")
+        timings = []
+        for image in images:
+            start_time = time.perf_counter()
+            await detector.detect_faces(image, "bench.jpg")
+            timings.append(time.perf_counter() - start_time)
+        results[f"{width}x{height}"] = latency_stats(timings)
+    return results
+
+
+# ---------------------------------------------------------------- endpoints
+
+async def bench_analyze(args) -> dict:
+    import httpx
+    from main import app
+
+    # Ảnh khác nhau mỗi request để không trúng result cache
+    images = [synthetic_jpeg(640, 480, args.seed + 1000 + i) for i in range(args.repeat * (1 + args.concurrency))]
+    url = "/v1/emotion_classification/analyze"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def post(image):
+            start_time = time.perf_counter()
+            response = await client.post(url, files={"file_upload": ("bench.jpg", image, "image/jpeg")})
+            response.raise_for_status()
+            return time.perf_counter() - start_time
+
+        await post(synthetic_jpeg(640, 480, args.seed + 999))
+        sequential = [await post(image) for image in images[:args.repeat]]
+
+        # `concurrency` client gửi liên tục: throughput của cả server
+        concurrent_images = images[args.repeat:]
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited_post(image):
+            async with semaphore:
+                return await post(image)
+
+        start_time = time.perf_counter()
+        concurrent = await asyncio.gather(*(limited_post(image) for image in concurrent_images))
+        elapsed = time.perf_counter() - start_time
+
+    return {
+        "sequential": latency_stats(sequential),
+        "concurrent": {"concurrency": args.concurrency, **latency_stats(concurrent),
+                       "requests_per_s": round(len(concurrent_images) / elapsed, 2)},
+    }
+
+
+def _sustained_ws(client, path: str, args, parse_seq) -> dict:
+    """Send binary JPEG frames at `args.ws_fps` for `args.ws_seconds` and time every answer by its seq."""
+    frames = [synthetic_jpeg(640, 480, args.seed + 2000 + i) for i in range(10)]
+    sent_at = []
+    answers = queue.Queue()
+    interval = 1 / args.ws_fps
+
+    with client.websocket_connect(path) as websocket:
+        def receive():
+            try:
+                while True:
+                    message = websocket.receive()
+                    answers.put((time.perf_counter(), parse_seq(message)))
+            except Exception:
+                answers.put(None)
+
+        receiver = threading.Thread(target=receive, daemon=True)
+        receiver.start()
+
+        start_time = time.perf_counter()
+        next_time = start_time
+        while time.perf_counter() - start_time < args.ws_seconds:
+            sent_at.append(time.perf_counter())
+            websocket.send_bytes(frames[len(sent_at) % len(frames)])
+            next_time += interval
+            time.sleep(max(0.0, next_time - time.perf_counter()))
+
+        # Chờ kết quả của frame cuối (frame cũ hơn có thể đã bị bỏ qua)
+        latencies, last_seq, last_answer = [], 0, start_time
+        deadline = time.perf_counter() + args.ws_drain_seconds
+        while last_seq < len(sent_at) and time.perf_counter() < deadline:
+            try:
+                item = answers.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            received_at, seq = item
+            if seq is None or seq > len(sent_at):
+                continue
+            latencies.append(received_at - sent_at[seq - 1])
+            last_seq, last_answer = seq, received_at
+
+    duration = last_answer - start_time
+    return {
+        "target_fps": args.ws_fps,
+        "frames_sent": len(sent_at),
+        "frames_answered": len(latencies),
+        "answered_fps": round(len(latencies) / duration, 2) if duration > 0 else 0.0,
+        "dropped": len(sent_at) - len(latencies),
+        **(latency_stats(latencies) if latencies else {}),
+    }
+
+
+def _ws_client_seq(message: dict):
+    data = message.get("bytes")
+    return int.from_bytes(data[:4], "big") if data and len(data) >= 4 else None
+
+
+def _game_ws_seq(message: dict):
+    text = message.get("text")
+    return json.loads(text).get("seq") if text else None
+
+
+def bench_ws(args, path: str, parse_seq) -> dict:
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        return _sustained_ws(client, path, args, parse_seq)
+
+
+# ---------------------------------------------------------------- main
+
+def environment(weights: dict) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "device": ModelConfig.DEVICE,
+        "classifier_backend": ModelConfig.BACKEND,
+        "classifier_precision": ModelConfig.PRECISION,
+        "graph_optimization": ModelConfig.GRAPH_OPTIMIZATION,
+        "detector_backend": YoloConfig.DETECTOR_BACKEND,
+        **weights,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--output", type=Path, default=None,
+                        help="JSON file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--resnet-weight", type=Path, default=None)
+    parser.add_argument("--yolo-weight", type=Path, default=None)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ws-fps", type=float, default=15.0)
+    parser.add_argument("--ws-seconds", type=float, default=5.0)
+    parser.add_argument("--ws-drain-seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app.utils import CAPTURE_WRITER
+    # Không ghi ảnh benchmark vào thư mục capture
+    CAPTURE_WRITER.sample_rate = 0.0
+
+    workdir = Path(tempfile.mkdtemp(prefix="emotion_bench_"))
+    weights = prepare_weights(args, workdir)
+
+    from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+    MODEL_REGISTRY.warmup()
+
+    runners = {
+        "predict": lambda: asyncio.run(bench_predict(args)),
+        "model_inference": lambda: asyncio.run(bench_model_inference(args)),
+        "detect_faces": lambda: asyncio.run(bench_detect_faces(args)),
+        "analyze": lambda: asyncio.run(bench_analyze(args)),
+        "ws_client": lambda: bench_ws(args, "/v1/emotion_classification/ws-client", _ws_client_seq),
+        "game_ws": lambda: bench_ws(args, "/v1/emotion_classification/game-ws", _game_ws_seq),
+    }
+    results = {}
+    for name in BENCHMARKS:
+        if name not in args.only:
+            continue
+        print(f"Running {name}...", flush=True)
+        results[name] = runners[name]()
+        print(json.dumps(results[name], indent=2))
+
+    report = {"environment": environment(weights), "args": {k: str(v) if isinstance(v, Path) else v
+                                                            for k, v in vars(args).items()},
+              "results": results}
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = Path(__file__).parent / "results" / f"{stamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,58 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
-from app.middleware import LogMiddleware, setup_cors
+from app.middleware import BodySizeLimitMiddleware, LogMiddleware, ProfileMiddleware, setup_cors
+from app.config.batch_cfg import BatchConfig
+from app.config.profiling_cfg import ProfilingConfig
+from app.utils import CAPTURE_WRITER, PROFILER, RESULT_CACHE
 from app.routers.base import router
+from app.routers.stream_router import CAMERA_SERVICE
+from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+from src.emotion_classification.config.detect_cfg import YoloConfig
+from src.emotion_classification.config.serving_cfg import StartupConfig, VideoConfig
+from src.emotion_classification.utils.executor import EXECUTOR
+from src.emotion_classification.utils.processor import ImageTooLarge
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load + warm up models một lần cho toàn bộ process, mặc định ở thread nền (xem /readyz)
+    if StartupConfig.BACKGROUND_WARMUP:
+        MODEL_REGISTRY.start_warmup()
+    else:
+        MODEL_REGISTRY.warmup()
+    PROFILER.warmup()
+    yield
+    CAMERA_SERVICE.stop()
+    PROFILER.shutdown()
+    EXECUTOR.shutdown()
+    CAPTURE_WRITER.flush()
+    RESULT_CACHE.flush()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(ImageTooLarge)
+async def image_too_large(request: Request, exc: ImageTooLarge):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+
+# Chặn upload quá lớn theo Content-Length trước khi form được parse (Starlette spool cả body ra đĩa)
+UPLOAD_LIMITS = {
+    **{f"/v1/emotion_classification/{name}": YoloConfig.MAX_UPLOAD_BYTES for name in ("predict", "detect", "analyze")},
+    **{f"/v1/emotion_classification/{name}": BatchConfig.MAX_TOTAL_BYTES for name in ("predict-batch", "analyze-batch")},
+    "/v1/emotion_classification/analyze-video": VideoConfig.MAX_BYTES,
+}
+app.add_middleware(BodySizeLimitMiddleware, limits=UPLOAD_LIMITS)
+# Middleware thêm sau bọc ngoài → ProfileMiddleware nằm trong LogMiddleware.
+# Tắt profiling thì không thêm: BaseHTTPMiddleware tốn thêm một tầng task / stream cho mọi request
+if ProfilingConfig.ENABLED:
+    app.add_middleware(ProfileMiddleware)
 app.add_middleware(LogMiddleware)
 setup_cors(app)
 app.include_router(router)
@@ -0,0 +1,339 @@
+"""
+Offline bulk scoring: run the detector + emotion classifier over a directory, glob or
+.zip / .tar(.gz) archive and write one row per face (or per image with --mode predict).
+
+    decode workers (processes) → batched detection → batched classification (thread) → writer (thread)
+
+Results are appended to a CSV journal after every batch, so an interrupted run continues
+where it stopped when started again with the same --output. A .parquet output (needs
+pyarrow) is written from the journal at the end.
+
+Chạy từ thư mục backend:
+    python score.py ./images --output scores.csv
+    python score.py "archive/**/*.jpg" data.zip --output scores.parquet --decode-workers 4 --batch-size 16
+"""
+import io
+import os
+import sys
+import csv
+import glob
+import time
+import queue
+import argparse
+import tarfile
+import threading
+import zipfile
+import multiprocessing
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import torch
+
+sys.path.append(str(Path(__file__).parent))
+
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
+from src.emotion_classification.utils.processor import (
+    PREPROCESSOR, crop_scaled_faces, decode_for_detection, decode_rgb_array, decode_scaled, detail_size, pad_boxes
+)
+from app.config.batch_cfg import BatchConfig
+# Cùng định nghĩa ảnh / archive với /predict-batch và /analyze-batch
+from app.utils.batch_upload import is_image_name
+
+
+# ---------------------------------------------------------------- inputs
+
+def _archive_items(path: Path) -> Iterator[Tuple[str, bytes]]:
+    if path.name.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                if not member.is_dir() and is_image_name(member.filename):
+                    yield f"{path}!{member.filename}", archive.read(member)
+    else:
+        # "r|*": đọc tuần tự, không cần seek (tar.gz lớn)
+        with tarfile.open(path, mode="r|*") as archive:
+            for member in archive:
+                if member.isfile() and is_image_name(member.name):
+                    yield f"{path}!{member.name}", archive.extractfile(member).read()
+
+
+def _input_paths(spec: str) -> List[Path]:
+    path = Path(spec)
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.is_file() and (is_image_name(p.name) or p.name.lower().endswith(BatchConfig.ARCHIVE_SUFFIXES)))
+    if path.is_file():
+        return [path]
+    return sorted(Path(p) for p in glob.glob(spec, recursive=True) if Path(p).is_file())
+
+
+def iter_items(specs: List[str], done: set) -> Iterator[Tuple[str, bytes]]:
+    """(source, bytes) of every image under the inputs, archives expanded, already scored sources skipped."""
+    for spec in specs:
+        for path in _input_paths(spec):
+            if path.name.lower().endswith(BatchConfig.ARCHIVE_SUFFIXES):
+                for source, data in _archive_items(path):
+                    if source not in done:
+                        yield source, data
+            elif is_image_name(path.name) and str(path) not in done:
+                yield str(path), path.read_bytes()
+
+
+# ---------------------------------------------------------------- decode workers
+
+def _init_worker():
+    torch.set_num_threads(1)
+
+
+def _decode(mode: str, data: bytes):
+    if mode == "predict":
+        return PREPROCESSOR(decode_rgb_array(data))
+    return decode_for_detection(data)
+
+
+# ---------------------------------------------------------------- journal
+
+def output_columns() -> List[str]:
+    labels = [EmotionDataConfig.ID2LABEL[i] for i in range(EmotionDataConfig.N_CLASSES)]
+    return (["source", "face_count", "face_id", "x1", "y1", "x2", "y2", "det_confidence",
+             "predicted_class", "best_prob"] + [f"prob_{label}" for label in labels] + ["error"])
+
+
+def resume_journal(journal: Path) -> set:
+    """
+    Sources already in the journal. Rows of the last source may be incomplete if the previous
+    run was killed mid-write, so they are cut off and that source is scored again.
+    """
+    if not journal.exists():
+        return set()
+    with open(journal, "rb") as f:
+        content = f.read()
+    # Bỏ dòng cuối bị ghi dở
+    content = content[:content.rfind(b"\n") + 1]
+    lines = content.splitlines(keepends=True)
+    if len(lines) <= 1:
+        journal.write_bytes(content)
+        return set()
+
+    rows = list(csv.reader(io.StringIO(b"".join(lines[1:]).decode("utf-8"))))
+    last_source = rows[-1][0]
+    keep = len(rows)
+    while keep > 0 and rows[keep - 1][0] == last_source:
+        keep -= 1
+    journal.write_bytes(b"".join(lines[:1 + keep]))
+    return {row[0] for row in rows[:keep]}
+
+
+class JournalWriter:
+    """Writer thread: appends the rows of each finished batch to the CSV journal and flushes."""
+
+    def __init__(self, journal: Path, columns: List[str]):
+        new_file = not journal.exists() or journal.stat().st_size == 0
+        journal.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(journal, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(columns)
+        self._queue = queue.Queue(maxsize=8)
+        self._thread = threading.Thread(target=self._run, name="score-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            rows = self._queue.get()
+            if rows is None:
+                break
+            self._writer.writerows(rows)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def submit(self, rows: list):
+        self._queue.put(rows)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+def write_parquet(journal: Path, output: Path):
+    try:
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError(f"Writing {output} needs the pyarrow package, the CSV results are in {journal}") from e
+    pq.write_table(pa_csv.read_csv(journal), output)
+
+
+# ---------------------------------------------------------------- scoring
+
+class BulkScorer:
+    """Batched detection / classification on the main process, reusing the serving FacesDetector and Predictor."""
+
+    def __init__(self, mode: str, classify_batch: int, pad: int):
+        # Import ở đây: decode workers (spawn) import lại file này, không cần load ultralytics
+        from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+
+        self.mode = mode
+        self.classify_batch = classify_batch
+        self.pad = pad
+        self.predictor = MODEL_REGISTRY.get_predictor()
+        self.detector = MODEL_REGISTRY.get_detector() if mode == "analyze" else None
+        self.n_classes = EmotionDataConfig.N_CLASSES
+
+    def classify(self, batch: torch.Tensor) -> torch.Tensor:
+        """Softmax probabilities, at most `classify_batch` rows per forward pass."""
+        if len(batch) == 0:
+            return torch.empty(0, self.n_classes)
+        with torch.no_grad():
+            return torch.cat([torch.softmax(self.predictor.forward(batch[i:i + self.classify_batch]), dim=1)
+                              for i in range(0, len(batch), self.classify_batch)])
+
+    def detect_and_crop(self, items: list):
+        """Detection for a batch of decoded images, then the face crops of all of them as one tensor."""
+        faces_per_item = self.detector.detect_scaled_batch([item["decoded"] for item in items])
+        crops = []
+        for item, faces in zip(items, faces_per_item):
+            scaled = item["decoded"]
+            w, h = scaled.original_size
+            boxes, keep = pad_boxes(faces, w, h, self.pad)
+            longest_side = detail_size(scaled, boxes)
+            detail = decode_scaled(item["data"], longest_side) if longest_side is not None else None
+            item["faces"] = [(i + 1, faces[i]) for i in keep]
+            crops.append(crop_scaled_faces(boxes, scaled, detail))
+        return torch.cat(crops) if crops else torch.empty(0)
+
+    def batch_rows(self, items: list, classified) -> list:
+        """Rows of a batch once its classification future is done; a classifier error becomes an error row per image."""
+        try:
+            probabilities = classified.result()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            for item in items:
+                # Ảnh không có mặt không qua classifier, giữ dòng 0 mặt
+                if "error" not in item and (self.mode == "predict" or item.get("faces")):
+                    item["error"] = error
+            probabilities = torch.empty(0, self.n_classes)
+        return self.rows(items, probabilities)
+
+    def rows(self, items: list, probabilities: torch.Tensor) -> list:
+        empty = [""] * (9 + self.n_classes)
+        rows, start = [], 0
+        for item in items:
+            if "error" in item:
+                rows.append([item["source"]] + empty + [item["error"]])
+                continue
+            faces = item.get("faces", [(None, None)])
+            if self.mode == "analyze" and not faces:
+                # Ảnh không có mặt vẫn có một dòng để lần chạy sau bỏ qua
+                rows.append([item["source"], 0] + [""] * (8 + self.n_classes) + [""])
+                continue
+            for face_id, face in faces:
+                probs = probabilities[start].tolist()
+                start += 1
+                best = max(range(len(probs)), key=probs.__getitem__)
+                box = list(face[:4]) + [round(float(face[4]), 4)] if face is not None else [""] * 5
+                rows.append([item["source"], len(faces) if self.mode == "analyze" else "",
+                             face_id if face_id is not None else ""] + box +
+                            [EmotionDataConfig.ID2LABEL[best], round(probs[best], 4)] +
+                            [round(p, 4) for p in probs] + [""])
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score images offline with the serving detector + classifier")
+    parser.add_argument("inputs", nargs="+", help="directories, globs or .zip/.tar(.gz) archives")
+    parser.add_argument("--output", type=Path, required=True, help=".csv or .parquet")
+    parser.add_argument("--mode", choices=["analyze", "predict"], default="analyze",
+                        help="analyze: detect + classify every face; predict: classify the whole image")
+    parser.add_argument("--decode-workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--batch-size", type=int, default=16, help="images per detection batch")
+    parser.add_argument("--classify-batch", type=int, default=64, help="face crops per classifier forward")
+    parser.add_argument("--pad", type=int, default=30, help="face box padding, same as /analyze")
+    parser.add_argument("--restart", action="store_true", help="ignore previous results instead of resuming")
+    args = parser.parse_args()
+
+    journal = args.output if args.output.suffix.lower() == ".csv" else args.output.with_suffix(".partial.csv")
+    if args.restart and journal.exists():
+        journal.unlink()
+    done = resume_journal(journal)
+    if done:
+        print(f"Resuming: {len(done)} images already scored in {journal}")
+
+    scorer = BulkScorer(args.mode, args.classify_batch, args.pad)
+    writer = JournalWriter(journal, output_columns())
+    decode_pool = ProcessPoolExecutor(max_workers=args.decode_workers, initializer=_init_worker,
+                                      mp_context=multiprocessing.get_context("spawn"))
+    # Classify batch k trong lúc detect batch k + 1 (torch nhả GIL)
+    classify_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="classify")
+
+    n_images, n_faces, start_time = 0, 0, time.perf_counter()
+    in_flight = deque()
+    pending_classify = None
+
+    def finish(classified):
+        nonlocal n_images, n_faces
+        items, future = classified
+        rows = scorer.batch_rows(items, future)
+        writer.submit(rows)
+        n_images += len(items)
+        n_faces += sum(len(item.get("faces", ())) for item in items if scorer.mode == "analyze" and "error" not in item)
+        elapsed = time.perf_counter() - start_time
+        print(f"\r{n_images} images, {n_faces} faces, {n_images / elapsed:.1f} images/s", end="", flush=True)
+
+    def run_batch(batch):
+        nonlocal pending_classify
+        ok = []
+        for item in batch:
+            try:
+                item["decoded"] = item.pop("future").result()
+                ok.append(item)
+            except Exception as e:
+                item["error"] = f"{type(e).__name__}: {e}"
+
+        try:
+            if scorer.mode == "analyze":
+                inputs = scorer.detect_and_crop(ok) if ok else torch.empty(0)
+            else:
+                inputs = torch.cat([item["decoded"] for item in ok]) if ok else torch.empty(0)
+        except Exception as e:
+            for item in ok:
+                item["error"] = f"{type(e).__name__}: {e}"
+            inputs = torch.empty(0)
+        for item in batch:
+            # Ảnh decode + bytes không cần nữa, chỉ giữ box
+            item.pop("decoded", None)
+            item.pop("data", None)
+
+        if pending_classify is not None:
+            finish(pending_classify)
+        pending_classify = (batch, classify_pool.submit(scorer.classify, inputs))
+
+    try:
+        max_in_flight = args.batch_size * 2 + args.decode_workers
+        for source, data in iter_items(args.inputs, done):
+            in_flight.append({"source": source, "data": data,
+                              "future": decode_pool.submit(_decode, args.mode, data)})
+            if len(in_flight) >= max_in_flight:
+                run_batch([in_flight.popleft() for _ in range(args.batch_size)])
+        while in_flight:
+            run_batch([in_flight.popleft() for _ in range(min(args.batch_size, len(in_flight)))])
+        if pending_classify is not None:
+            finish(pending_classify)
+    finally:
+        decode_pool.shutdown(cancel_futures=True)
+        classify_pool.shutdown()
+        writer.close()
+        print()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Scored {n_images} images ({n_faces} faces) in {elapsed:.1f}s -> {journal}")
+    if journal != args.output:
+        write_parquet(journal, args.output)
+        journal.unlink()
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,173 @@
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+import traceback
 import uvicorn
 from src.emotion_classification.models.resnet_model import ResNet, Block
-from src.emotion_classification.models.load_model import resnet_download, yoloface_download
+from src.emotion_classification.config.emotion_cfg import ModelConfig
+from src.emotion_classification.config.detect_cfg import YoloConfig
+from src.emotion_classification.config.serving_cfg import WorkerConfig
 
 Resnet = ResNet
 
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def threads_per_worker(workers: int, threads: int = WorkerConfig.TORCH_THREADS) -> int:
+    """Torch intra-op threads of each worker so that workers x threads matches the cores."""
+    return threads if threads > 0 else max(1, available_cpus() // workers)
+
+
+def respawn_delay(failures: int) -> float:
+    """Seconds to wait before forking a worker again after `failures` quick deaths in a row (0 = it had been stable)."""
+    if failures <= 0:
+        return 0.0
+    return min(WorkerConfig.RESPAWN_MAX_BACKOFF_SECONDS, WorkerConfig.RESPAWN_BACKOFF_SECONDS * 2 ** (failures - 1))
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, worker_id: int, threads: int):
+    """Body of one forked worker: its own torch thread pool and event loop on the shared socket."""
+    import cv2
+    import torch
+
+    os.environ["WORKER_ID"] = str(worker_id)
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    # Lifespan của worker gọi start_warmup(): model đã ready từ process cha nên không load lại
+    config = uvicorn.Config(app, log_level="info", timeout_graceful_shutdown=WorkerConfig.SHUTDOWN_TIMEOUT_SECONDS)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve_prefork(host: str = WorkerConfig.HOST, port: int = WorkerConfig.PORT, workers: int = WorkerConfig.WORKERS,
+                  threads: int = WorkerConfig.TORCH_THREADS) -> int:
+    """
+    Production launch: load + warm up the models once in this process, then fork `workers`
+    uvicorn workers that accept on one shared socket. The weights are shared copy-on-write
+    by every worker instead of being loaded once per worker. Dead workers are forked again
+    with exponential backoff; returns 1 if a worker kept crashing, 0 after a normal shutdown.
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Pre-fork serving needs os.fork (Linux / macOS)")
+    import cv2
+    import torch
+
+    threads = threads_per_worker(workers, threads)
+    # Process cha không được tạo thread pool (OpenMP / OpenCV) trước khi fork: worker sẽ bị treo
+    torch.set_num_threads(1)
+    cv2.setNumThreads(1)
+
+    from main import app
+    from src.emotion_classification.models.model_registry import MODEL_REGISTRY
+
+    # onnxruntime tạo thread pool ngay khi load session, không fork được sau đó: mỗi worker tự load
+    preload = ModelConfig.BACKEND == "torch" and YoloConfig.DETECTOR_BACKEND in ("ultralytics", "opencv")
+    if preload:
+        MODEL_REGISTRY.warmup()
+    # Object đã tạo chuyển sang permanent generation: GC của worker không ghi vào các page dùng chung
+    gc.freeze()
+
+    sock = _bind_socket(host, port)
+    print(f"Pre-fork server on http://{host}:{port}: {workers} workers x {threads} torch threads, "
+          f"models {'shared' if preload else 'loaded per worker'}", flush=True)
+
+    children = {}
+    failures = {}
+    shutting_down = False
+    exit_code = 0
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                _run_worker(app, sock, worker_id, threads)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = (worker_id, time.monotonic())
+
+    def stop(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for worker_id in range(workers):
+        spawn(worker_id)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        worker_id, started = children.pop(pid, (None, 0.0))
+        if worker_id is None or shutting_down or not WorkerConfig.RESPAWN:
+            continue
+        # Worker đã chạy ổn định một lúc: không tính là crash loop
+        stable = time.monotonic() - started >= WorkerConfig.RESPAWN_STABLE_SECONDS
+        failures[worker_id] = 0 if stable else failures.get(worker_id, 0) + 1
+        if failures[worker_id] > WorkerConfig.RESPAWN_MAX_FAILURES:
+            print(f"Worker {worker_id} died {failures[worker_id]} times in a row, shutting down", flush=True)
+            exit_code = 1
+            stop(None, None)
+            continue
+        delay = respawn_delay(failures[worker_id])
+        print(f"Worker {worker_id} (pid {pid}) exited with status {status}, respawning in {delay:.1f}s", flush=True)
+        time.sleep(delay)
+        if not shutting_down:
+            spawn(worker_id)
+    sock.close()
+    return exit_code
+
+
 if __name__ == "__main__":
-    resnet_download()
-    yoloface_download()
-    uvicorn.run("main:app", host="127.0.0.1", port=5000, reload=True)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=None,
+                        help="pre-fork production server with this many workers, 1 included (default: WEB_WORKERS "
+                             "if set, otherwise the dev server)")
+    parser.add_argument("--dev", action="store_true", help="single-process dev server with reload")
+    parser.add_argument("--threads", type=int, default=WorkerConfig.TORCH_THREADS,
+                        help="torch threads per worker (0 = cores / workers)")
+    parser.add_argument("--host", default=WorkerConfig.HOST)
+    parser.add_argument("--port", type=int, default=WorkerConfig.PORT)
+    args = parser.parse_args()
+    if args.dev and args.workers is not None:
+        parser.error("--dev runs one reloading process, it cannot be combined with --workers")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    # Weights còn thiếu được tải trong warm-up của MODEL_REGISTRY, không chặn lúc khởi động
+    if args.dev or (args.workers is None and not WorkerConfig.PREFORK):
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=True)
+    else:
+        sys.exit(serve_prefork(args.host, args.port, args.workers or WorkerConfig.WORKERS, args.threads))
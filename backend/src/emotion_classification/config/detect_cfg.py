@@ -1,18 +1,39 @@
+import os
 import sys
 
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 class YoloConfig:
+    YOLO_MODEL_NAME = 'yolov8n-face-lindevs'
     YOLO_CONFIG_THRESHOLD = 0.5
     YOLO_IOU_THRESHOLD = 0.45
     YOLO_PERSON_CLASS_ID = 0
     YOLO_IMAGE_SIZE = 640
+    # Backend detect: "ultralytics" (YOLO.predict), "onnxruntime" hoặc "opencv" (cv2.dnn),
+    # hai backend sau chạy file ONNX export từ weights (export_detector.py)
+    DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "ultralytics")
+    YOLO_ONNX_OPSET = 12
+    YOLO_MAX_DETECTIONS = 300
     
     FACE_SCALE_FACTOR = 1.1
     FACE_MIN_NEIGHBORS = 5
     FACE_MIN_SIZE = (30, 30)
     FACE_PADDING = 10
     
+    # Upload được decode ở độ phân giải vừa đủ: YOLO chạy trên ảnh có cạnh dài YOLO_IMAGE_SIZE,
+    # crop mặt nhỏ lấy từ bản decode lớn hơn nhưng cạnh dài không vượt quá MAX_IMAGE_SIZE
     MAX_IMAGE_SIZE = 1920
+    # Ảnh vượt các giới hạn này bị từ chối (HTTP 413) trước khi decode
+    MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 64_000_000))
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 25 * 1024 * 1024))
+
+    # Tracking trong stream: chỉ chạy YOLO mỗi DETECT_INTERVAL frame, giữa các lần detect
+    # thì dời box theo tracker. DETECT_INTERVAL = 1 tương đương detect mọi frame.
+    DETECT_INTERVAL = 5
+    TRACK_IOU_THRESHOLD = 0.3        # IoU tối thiểu để ghép detection với track cũ
+    TRACK_MAX_MISSES = 2             # số lần detect liên tiếp không thấy trước khi xoá track
+    TRACK_CONFIDENCE_DECAY = 0.9     # confidence của track giảm mỗi frame không detect
+    TRACK_MIN_CONFIDENCE = 0.35      # dưới ngưỡng này thì detect lại ngay, không chờ hết interval
+    TRACK_USE_OPTICAL_FLOW = False   # dời box bằng Lucas-Kanade thay vì vận tốc không đổi
     
\ No newline at end of file
@@ -1,3 +1,4 @@
+import os
 import sys
 
 from pathlib import Path
@@ -21,5 +22,37 @@ class EmotionDataConfig():
 class ModelConfig:
     ROOT_DIR = Path(__file__).parent.parent.parent
     MODEL_NAME = 'ResNet18'
-    MODEL_WEIGHT = ROOT_DIR / 'models' / 'weights' /'emotion_classification_weights.pt'
-    DEVICE = 'cpu'
\ No newline at end of file
+    MODEL_WEIGHT = ROOT_DIR / 'emotion_classification' / 'models' / 'weights' / 'emotion_classification_weights.pt'
+    DEVICE = 'cpu'
+
+    # Định dạng weights: "auto" (dùng file .safetensors cạnh checkpoint nếu đã convert), "safetensors"
+    # (bắt buộc) hoặc "pickle" (torch.load checkpoint cũ). Convert bằng models/convert_weights.py
+    WEIGHT_FORMAT = os.getenv("WEIGHT_FORMAT", "auto")
+    WEIGHT_VERIFY_HASH = os.getenv("WEIGHT_VERIFY_HASH", "1") == "1"  # kiểm tra sha256 trong manifest khi load
+
+    # Backend chạy classifier: "torch" (eager) hoặc "onnxruntime" (cần export ONNX_WEIGHT trước)
+    BACKEND = os.getenv("EMOTION_BACKEND", "torch")
+    ONNX_WEIGHT = ROOT_DIR / 'emotion_classification' / 'models' / 'weights' / 'emotion_classification.onnx'
+    ONNX_OPSET = 17
+    ONNX_CHECK_TOLERANCE = 1e-4  # sai lệch logit tối đa giữa torch và onnxruntime khi export
+    ONNX_THREADS = int(os.getenv("ONNX_THREADS", 0))  # 0 = để onnxruntime tự chọn
+
+    # Độ chính xác của classifier: "fp32" hoặc "int8" (static PTQ, cần chạy quantization trước)
+    PRECISION = os.getenv("EMOTION_PRECISION", "fp32")
+    INT8_WEIGHT = ROOT_DIR / 'emotion_classification' / 'models' / 'weights' / 'emotion_classification_int8.pt'
+    QUANT_ENGINE = os.getenv("QUANT_ENGINE", "x86")  # "x86"/"fbgemm" cho server, "qnnpack" cho ARM
+
+    # Tối ưu graph khi load (fp32 + torch): gộp BatchNorm vào conv/linear, channels_last,
+    # rồi "torchscript" (freeze) / "compile" (torch.compile) / "eager" / "auto" / "off"
+    GRAPH_OPTIMIZATION = os.getenv("GRAPH_OPTIMIZATION", "auto")
+    CHANNELS_LAST = True
+    GRAPH_OPT_TOLERANCE = 1e-3  # sai lệch logit tối đa so với model gốc, vượt thì dùng model gốc
+
+    # Micro-batching trước ResNet: gom tensor từ nhiều request vào 1 forward pass
+    BATCH_MAX_SIZE = 32
+    BATCH_MAX_WAIT_MS = 5
+
+    # Làm mượt cảm xúc theo từng track trong stream
+    EMOTION_EMA_ALPHA = 0.5          # trọng số của lần classify mới trong EMA
+    RECLASSIFY_CROP_DIFF = 12.0      # chênh lệch trung bình (0-255) của thumbnail để classify lại
+    RECLASSIFY_MAX_FRAMES = 15       # classify lại sau chừng này frame dù crop không đổi
@@ -0,0 +1,62 @@
+import os
+import sys
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+
+class ExecutorConfig:
+    # Thread pool cho detect/classify (PyTorch nhả GIL trong lúc tính toán)
+    INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+    # Pool cho decode ảnh: "thread" hoặc "process"
+    DECODE_POOL = os.getenv("DECODE_POOL", "thread")
+    DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", 2))
+    # Số job decode/inference tối đa được chạy hoặc chờ cùng lúc
+    MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", 8))
+
+
+class CameraConfig:
+    # Nguồn camera server: chỉ số thiết bị ("0"), đường dẫn video, hoặc "synthetic"
+    SOURCE = os.getenv("CAMERA_SOURCE", "0")
+    # FPS cho video file / nguồn synthetic (thiết bị thật tự giới hạn theo camera)
+    FPS = float(os.getenv("CAMERA_FPS", 30))
+    RING_SIZE = 4
+    SYNTHETIC_WIDTH = 640
+    SYNTHETIC_HEIGHT = 480
+    LOOP_VIDEO = True
+
+
+class VideoConfig:
+    # /analyze-video: số frame lấy mẫu mỗi giây (mặc định, client có thể đổi bằng ?fps= hoặc ?every=)
+    SAMPLE_FPS = 5.0
+    FALLBACK_FPS = 30.0              # khi file không ghi FPS
+    WINDOW_SECONDS = 1.0             # độ dài mỗi điểm trên timeline
+    CHUNK_FRAMES = 8                 # số frame lấy mẫu detect + classify chung một batch
+    MAX_BYTES = int(os.getenv("VIDEO_MAX_BYTES", 512 * 1024 * 1024))
+
+
+class StartupConfig:
+    # Load + warm up model trong thread nền: server nhận kết nối ngay, /readyz báo khi model sẵn sàng
+    BACKGROUND_WARMUP = os.getenv("BACKGROUND_WARMUP", "1") == "1"
+    # Request tới trong lúc model đang load chờ tối đa bao lâu trước khi trả 503
+    MODEL_WAIT_SECONDS = float(os.getenv("MODEL_WAIT_SECONDS", 60))
+
+
+class WorkerConfig:
+    # Số worker process của server.py. Đặt WEB_WORKERS hoặc --workers (kể cả 1) = chế độ pre-fork,
+    # không đặt gì hoặc --dev = dev server một process với uvicorn reload
+    WORKERS = int(os.getenv("WEB_WORKERS", 1))
+    PREFORK = "WEB_WORKERS" in os.environ
+    # Thread intra-op của torch mỗi worker, 0 = tự chia: số core / số worker
+    TORCH_THREADS = int(os.getenv("TORCH_THREADS_PER_WORKER", 0))
+    HOST = os.getenv("HOST", "127.0.0.1")
+    PORT = int(os.getenv("PORT", 5000))
+    # Worker chết ngoài ý muốn được fork lại từ process cha (model đã load sẵn)
+    RESPAWN = True
+    # Chờ trước khi fork lại, gấp đôi sau mỗi lần chết liên tiếp (worker sống < RESPAWN_STABLE_SECONDS)
+    RESPAWN_BACKOFF_SECONDS = 1.0
+    RESPAWN_MAX_BACKOFF_SECONDS = 30.0
+    RESPAWN_STABLE_SECONDS = 60.0
+    # Một worker chết liên tiếp quá số lần này → dừng cả server (exit code 1) thay vì fork mãi
+    RESPAWN_MAX_FAILURES = 5
+    SHUTDOWN_TIMEOUT_SECONDS = 30.0
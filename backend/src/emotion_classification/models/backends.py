@@ -0,0 +1,61 @@
+import numpy as np
+import torch
+
+from pathlib import Path
+from src.emotion_classification.config.emotion_cfg import ModelConfig
+
+
+class TorchBackend:
+    """Eager PyTorch forward of the loaded ResNet."""
+
+    name = "torch"
+
+    def __init__(self, model: torch.nn.Module, device: str = "cpu"):
+        self.model = model
+        self.device = device
+
+    def __call__(self, input_tensor: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            output = self.model(input_tensor.to(self.device))
+        return output.cpu()
+
+
+class OnnxRuntimeBackend:
+    """
+    ONNX Runtime session over an exported classifier (see export_onnx.py).
+    Takes and returns torch tensors so it is a drop-in replacement for TorchBackend.
+    """
+
+    name = "onnxruntime"
+
+    def __init__(self, onnx_path, num_threads: int = ModelConfig.ONNX_THREADS):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("EMOTION_BACKEND=onnxruntime needs the onnxruntime package") from e
+
+        self.onnx_path = Path(onnx_path)
+        if not self.onnx_path.exists():
+            raise FileNotFoundError(
+                f"{self.onnx_path} not found, run: python -m src.emotion_classification.models.export_onnx")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            str(self.onnx_path), sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, input_tensor: torch.Tensor) -> torch.Tensor:
+        inputs = np.ascontiguousarray(input_tensor.detach().cpu().numpy(), dtype=np.float32)
+        output = self.session.run(None, {self.input_name: inputs})[0]
+        return torch.from_numpy(output)
+
+
+def create_backend(name: str, model: torch.nn.Module, device: str = "cpu", onnx_path=ModelConfig.ONNX_WEIGHT):
+    if name == "torch":
+        return TorchBackend(model, device)
+    if name == "onnxruntime":
+        return OnnxRuntimeBackend(onnx_path)
+    raise ValueError(f"Unknown classifier backend: {name}")
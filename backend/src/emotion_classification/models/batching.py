@@ -0,0 +1,154 @@
+import asyncio
+import time
+import threading
+import torch
+
+from typing import Callable, Optional
+from torch.nn import functional as F
+
+
+class BatchingStats:
+    """Counters for the micro-batcher: batch-size distribution and time spent queued."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batch_size_hist = {}
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+        self.queue_wait_sum = 0.0
+        self.queue_wait_max = 0.0
+        self.forward_time_sum = 0.0
+
+    def record(self, batch_size: int, queue_waits: list, forward_time: float):
+        with self._lock:
+            self.batch_size_hist[batch_size] = self.batch_size_hist.get(batch_size, 0) + 1
+            self.batches += 1
+            self.items += batch_size
+            self.requests += len(queue_waits)
+            self.queue_wait_sum += sum(queue_waits)
+            self.queue_wait_max = max(self.queue_wait_max, max(queue_waits))
+            self.forward_time_sum += forward_time
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "requests": self.requests,
+                "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "batch_size_hist": dict(sorted(self.batch_size_hist.items())),
+                "mean_queue_wait_ms": round(1000 * self.queue_wait_sum / self.requests, 3) if self.requests else 0.0,
+                "max_queue_wait_ms": round(1000 * self.queue_wait_max, 3),
+                "mean_forward_ms": round(1000 * self.forward_time_sum / self.batches, 3) if self.batches else 0.0,
+            }
+
+
+class MicroBatcher:
+    """
+    Dynamic batching queue in front of a classifier.
+    Callers submit tensors of shape (N, C, H, W); pending submissions are merged until
+    `max_batch_size` rows are collected or `max_wait_ms` has passed since the first one,
+    then a single forward pass runs and each caller gets its own rows of the softmax output.
+    With an `executor` the forward pass runs off the event loop.
+    """
+
+    def __init__(
+        self,
+        forward_fn: Callable[[torch.Tensor], torch.Tensor],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor=None
+    ):
+        self.forward_fn = forward_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = BatchingStats()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._carry = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        # Queue/task gắn với event loop đang chạy, tạo lại nếu loop thay đổi
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._carry = None
+            self._worker = loop.create_task(self._run())
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, inputs: torch.Tensor) -> torch.Tensor:
+        """Queue `inputs` (N, C, H, W) and wait for their softmax probabilities (N, n_classes)."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((inputs, future, time.perf_counter()))
+        return await future
+
+    async def _next_item(self, timeout: Optional[float] = None):
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        if timeout is None:
+            return await self._queue.get()
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    async def _collect(self) -> list:
+        pending = [await self._next_item()]
+        size = pending[0][0].shape[0]
+        deadline = self._loop.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await self._next_item(timeout)
+            except asyncio.TimeoutError:
+                break
+            if size + item[0].shape[0] > self.max_batch_size:
+                # Không vượt quá max_batch_size, để dành cho batch sau
+                self._carry = item
+                break
+            pending.append(item)
+            size += item[0].shape[0]
+        return pending
+
+    async def _run(self):
+        while True:
+            pending = await self._collect()
+            pending = [p for p in pending if not p[1].cancelled()]
+            if not pending:
+                continue
+
+            start_time = time.perf_counter()
+            queue_waits = [start_time - enqueued for _, _, enqueued in pending]
+            try:
+                inputs = torch.cat([p[0] for p in pending])
+                probs = await self._forward(inputs)
+            except Exception as e:
+                for _, future, _ in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats.record(inputs.shape[0], queue_waits, time.perf_counter() - start_time)
+
+            offset = 0
+            for batch, future, _ in pending:
+                n_rows = batch.shape[0]
+                if not future.done():
+                    future.set_result(probs[offset:offset + n_rows])
+                offset += n_rows
+
+    async def _forward(self, inputs: torch.Tensor) -> torch.Tensor:
+        if self.executor is not None:
+            output = await self.executor.run_inference(self.forward_fn, inputs)
+        else:
+            output = self.forward_fn(inputs)
+        return F.softmax(output, dim=1)
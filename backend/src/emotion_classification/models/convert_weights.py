@@ -0,0 +1,115 @@
+"""
+Convert the pickled checkpoints (ResNet emotion classifier, YOLOv8n-face detector) to
+memory-mappable .safetensors files with a manifest (shapes, dtypes, sha256). With the
+default WEIGHT_FORMAT=auto the server picks them up instead of the .pt files.
+Chạy từ thư mục backend:
+    python -m src.emotion_classification.models.convert_weights [--resnet-weight ...] [--yolo-weight ...]
+    python -m src.emotion_classification.models.convert_weights --only resnet --check
+"""
+import sys
+import argparse
+import torch
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+from src.emotion_classification.models.resnet_model import ResNet, Block
+from src.emotion_classification.models.weight_store import (
+    SUFFIX, WeightFormatError, file_sha256, load_weights, manifest_path, save_weights, yolo_config
+)
+
+Resnet = ResNet
+
+
+def convert_resnet(weight: Path, output: Path) -> dict:
+    # Checkpoint cũ có thể là cả nn.Module đã pickle: chỉ unpickle một lần ở đây, từ file tin cậy
+    checkpoint = torch.load(weight, map_location="cpu", weights_only=False)
+    state_dict = checkpoint.state_dict() if isinstance(checkpoint, torch.nn.Module) else checkpoint
+
+    model = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES)
+    result = model.load_state_dict(state_dict, strict=False)
+    if result.missing_keys:
+        raise WeightFormatError(f"{weight} misses {len(result.missing_keys)} ResNet keys: {result.missing_keys[:10]}")
+    if result.unexpected_keys:
+        print(f"Dropping {len(result.unexpected_keys)} keys the ResNet does not use: {result.unexpected_keys[:10]}")
+
+    return save_weights(model.state_dict(), output, {
+        "kind": "resnet",
+        "model_name": ModelConfig.MODEL_NAME,
+        "n_block_lst": EmotionDataConfig.N_BLOCK_LST,
+        "num_classes": EmotionDataConfig.N_CLASSES,
+        "source": weight.name,
+        "source_sha256": file_sha256(weight),
+    })
+
+
+def convert_yolo(weight: Path, output: Path) -> dict:
+    from ultralytics import YOLO
+    from ultralytics.utils import YAML
+
+    net = YOLO(str(weight)).model.float().eval()
+    config_file = output.with_suffix(".yaml")
+    YAML.save(config_file, yolo_config(net, config_file))
+    return save_weights(net.state_dict(), output, {
+        "kind": "yolo",
+        "task": getattr(net, "task", "detect"),
+        "config_file": config_file.name,
+        "names": {str(key): value for key, value in net.names.items()},
+        "stride": [float(s) for s in net.stride],
+        "source": weight.name,
+        "source_sha256": file_sha256(weight),
+    })
+
+
+def check(output: Path, weight: Path, kind: str):
+    """Reload the artifact the way the server does and compare it with the source checkpoint."""
+    tensors, manifest = load_weights(output, verify=True)
+    if kind == "resnet":
+        with torch.device("meta"):
+            model = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES)
+        model.load_state_dict(tensors, strict=True, assign=True)
+        reference = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES)
+        checkpoint = torch.load(weight, map_location="cpu", weights_only=False)
+        reference.load_state_dict(checkpoint.state_dict() if isinstance(checkpoint, torch.nn.Module) else checkpoint,
+                                  strict=False)
+        x = torch.randn(4, 3, EmotionDataConfig.IMG_SIZE, EmotionDataConfig.IMG_SIZE)
+        with torch.inference_mode():
+            diff = (model.eval()(x) - reference.eval()(x)).abs().max().item()
+    else:
+        from ultralytics import YOLO
+        from src.emotion_classification.models.weight_store import load_yolo
+
+        model = load_yolo(output)
+        reference = YOLO(str(weight)).model.float().eval()
+        x = torch.rand(1, 3, 320, 320)
+        with torch.inference_mode():
+            diff = (model.model(x)[0] - reference(x)[0]).abs().max().item()
+    print(f"  {output.name}: max |diff| vs {manifest['source']} = {diff:.2e}")
+    if diff > 1e-4:
+        raise WeightFormatError(f"{output} does not reproduce {manifest['source']} (max diff {diff})")
+
+
+def main():
+    from app.utils import AppPath
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", nargs="+", choices=("resnet", "yolo"), default=["resnet", "yolo"])
+    parser.add_argument("--resnet-weight", type=Path, default=Path(ModelConfig.MODEL_WEIGHT))
+    parser.add_argument("--yolo-weight", type=Path, default=AppPath.YOLO_MODEL_WEIGHT)
+    parser.add_argument("--check", action="store_true", help="reload each artifact and compare outputs with the .pt")
+    args = parser.parse_args()
+
+    jobs = {"resnet": (args.resnet_weight, convert_resnet), "yolo": (args.yolo_weight, convert_yolo)}
+    for kind in args.only:
+        weight, convert = jobs[kind]
+        output = weight.with_suffix(SUFFIX)
+        manifest = convert(weight, output)
+        print(f"Converted {weight} -> {output} ({len(manifest['tensors'])} tensors, "
+              f"{manifest['data_bytes'] / 1024 ** 2:.1f} MB, manifest {manifest_path(output).name})")
+        if args.check:
+            check(output, weight, kind)
+
+
+if __name__ == "__main__":
+    main()
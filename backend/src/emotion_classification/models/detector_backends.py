@@ -0,0 +1,222 @@
+import threading
+import numpy as np
+import cv2
+
+from pathlib import Path
+from typing import List, Tuple
+from PIL import Image
+from src.emotion_classification.config.detect_cfg import YoloConfig
+
+Face = Tuple[int, int, int, int, float]
+
+
+def to_bgr_array(image) -> np.ndarray:
+    """PIL images are RGB, numpy frames are already BGR (OpenCV convention, same as ultralytics)."""
+    if isinstance(image, Image.Image):
+        return cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR)
+    return image
+
+
+class Letterbox:
+    """
+    Resize keeping the aspect ratio and pad to a square `size` x `size` input, like the
+    ultralytics LetterBox used for fixed-size exported models. The output buffer is reused
+    per thread, so the returned blob is only valid until the next call on the same thread.
+    """
+
+    def __init__(self, size: int = YoloConfig.YOLO_IMAGE_SIZE, pad_value: int = 114):
+        self.size = size
+        self.pad_value = pad_value
+        self._local = threading.local()
+
+    def _canvas(self) -> np.ndarray:
+        canvas = getattr(self._local, "canvas", None)
+        if canvas is None:
+            canvas = np.empty((self.size, self.size, 3), dtype=np.uint8)
+            self._local.canvas = canvas
+            self._local.blob = np.empty((1, 3, self.size, self.size), dtype=np.float32)
+        return canvas
+
+    def __call__(self, bgr: np.ndarray) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+        """Returns the (1, 3, S, S) float32 RGB blob in [0, 1], the scale ratio and the (left, top) padding."""
+        h, w = bgr.shape[:2]
+        ratio = min(self.size / h, self.size / w)
+        new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+        dw, dh = (self.size - new_w) / 2, (self.size - new_h) / 2
+        left, top = int(round(dw - 0.1)), int(round(dh - 0.1))
+
+        canvas = self._canvas()
+        canvas[...] = self.pad_value
+        resized = bgr if (new_w, new_h) == (w, h) else cv2.resize(bgr, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        canvas[top:top + new_h, left:left + new_w] = resized
+
+        # BGR → RGB, HWC → CHW, /255 ghi thẳng vào blob có sẵn
+        blob = self._local.blob
+        np.multiply(canvas[..., ::-1].transpose(2, 0, 1), 1 / 255, out=blob[0], casting="unsafe")
+        return blob, ratio, (left, top)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy non-maximum suppression on (N, 4) xyxy boxes, returns kept indices by descending score."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter_w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(
+    output: np.ndarray,
+    ratio: float,
+    pad: Tuple[int, int],
+    image_shape: Tuple[int, int],
+    conf_threshold: float,
+    iou_threshold: float,
+    class_id: int = YoloConfig.YOLO_PERSON_CLASS_ID,
+    max_detections: int = YoloConfig.YOLO_MAX_DETECTIONS
+) -> List[Face]:
+    """Decode a raw YOLOv8 head output (1, 4 + n_classes, n_anchors) into boxes in original image coordinates."""
+    predictions = output[0].T
+    class_scores = predictions[:, 4:]
+    scores = class_scores.max(axis=1)
+    classes = class_scores.argmax(axis=1)
+    mask = (scores > conf_threshold) & (classes == class_id)
+    if not mask.any():
+        return []
+
+    xywh, scores = predictions[mask, :4], scores[mask]
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+
+    keep = nms(boxes, scores, iou_threshold)[:max_detections]
+    boxes, scores = boxes[keep], scores[keep]
+
+    # Bỏ padding + scale về kích thước ảnh gốc
+    h, w = image_shape
+    boxes[:, [0, 2]] = np.clip((boxes[:, [0, 2]] - pad[0]) / ratio, 0, w)
+    boxes[:, [1, 3]] = np.clip((boxes[:, [1, 3]] - pad[1]) / ratio, 0, h)
+    return [(int(x1), int(y1), int(x2), int(y2), float(conf))
+            for (x1, y1, x2, y2), conf in zip(boxes.tolist(), scores.tolist())]
+
+
+class UltralyticsBackend:
+    """The ultralytics YOLO.predict pipeline (generic pre/post-processing)."""
+
+    name = "ultralytics"
+
+    def __init__(self, model):
+        self.model = model
+        # ultralytics predictor giữ state giữa các lần gọi, không an toàn khi gọi song song
+        self._lock = threading.Lock()
+
+    def detect(self, image, conf_threshold: float, iou_threshold: float) -> List[Face]:
+        return self.detect_batch([image], conf_threshold, iou_threshold)[0]
+
+    def detect_batch(self, images: list, conf_threshold: float, iou_threshold: float) -> List[List[Face]]:
+        """One YOLO.predict call for several images (ultralytics stacks them into one batch)."""
+        with self._lock:
+            results = self.model.predict(
+                images,
+                conf=conf_threshold,
+                iou=iou_threshold,
+                classes=[YoloConfig.YOLO_PERSON_CLASS_ID],
+                verbose=False
+            )
+
+        batch_faces = []
+        for result in results:
+            faces = []
+            if result.boxes is not None and len(result.boxes) > 0:
+                boxes = result.boxes.xyxy.cpu().numpy()
+                confidences = result.boxes.conf.cpu().numpy()
+                for box, conf in zip(boxes, confidences):
+                    x1, y1, x2, y2 = map(int, box)
+                    faces.append((x1, y1, x2, y2, float(conf)))
+            batch_faces.append(faces)
+        return batch_faces
+
+
+class _ExportedYoloBackend:
+    def __init__(self, onnx_path, image_size: int):
+        self.onnx_path = Path(onnx_path)
+        if not self.onnx_path.exists():
+            raise FileNotFoundError(
+                f"{self.onnx_path} not found, run: python -m src.emotion_classification.models.export_detector")
+        self.image_size = image_size
+        self.letterbox = Letterbox(image_size)
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def detect(self, image, conf_threshold: float, iou_threshold: float) -> List[Face]:
+        bgr = to_bgr_array(image)
+        blob, ratio, pad = self.letterbox(bgr)
+        output = self._run(blob)
+        return postprocess(output, ratio, pad, bgr.shape[:2], conf_threshold, iou_threshold)
+
+    def detect_batch(self, images: list, conf_threshold: float, iou_threshold: float) -> List[List[Face]]:
+        # Graph export với batch cố định = 1
+        return [self.detect(image, conf_threshold, iou_threshold) for image in images]
+
+
+class OnnxYoloBackend(_ExportedYoloBackend):
+    """Exported YOLOv8 graph on ONNX Runtime (session.run is thread-safe)."""
+
+    name = "onnxruntime"
+
+    def __init__(self, onnx_path, image_size: int = YoloConfig.YOLO_IMAGE_SIZE):
+        super().__init__(onnx_path, image_size)
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("DETECTOR_BACKEND=onnxruntime needs the onnxruntime package") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(self.onnx_path), sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenCVYoloBackend(_ExportedYoloBackend):
+    """Exported YOLOv8 graph on OpenCV DNN, no extra runtime needed."""
+
+    name = "opencv"
+
+    def __init__(self, onnx_path, image_size: int = YoloConfig.YOLO_IMAGE_SIZE):
+        super().__init__(onnx_path, image_size)
+        self.net = cv2.dnn.readNetFromONNX(str(self.onnx_path))
+        # cv2.dnn.Net giữ buffer nội bộ, không gọi song song
+        self._lock = threading.Lock()
+
+    def _run(self, blob):
+        with self._lock:
+            self.net.setInput(blob)
+            return self.net.forward().copy()
+
+
+def export_yolo_onnx(model_weight, output_path, image_size: int = YoloConfig.YOLO_IMAGE_SIZE,
+                     opset: int = YoloConfig.YOLO_ONNX_OPSET) -> Path:
+    """Export ultralytics weights to a fixed-size ONNX graph (opset 12 also loads in OpenCV DNN)."""
+    from ultralytics import YOLO
+
+    exported = Path(YOLO(str(model_weight)).export(
+        format="onnx", imgsz=image_size, opset=opset, simplify=False, dynamic=False))
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if exported.resolve() != output_path.resolve():
+        exported.replace(output_path)
+    return output_path
@@ -1,11 +1,18 @@
 import sys
+import numpy as np
 import torch
-import torchvision
 
+from typing import Tuple
 from .resnet_model import ResNet, Block
-from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
-from app.utils import Logger, AppPath, save_cache
-from .load_model import resnet_download
+from .batching import MicroBatcher
+from .backends import create_backend
+from .quantization import load_quantized
+from .graph_optimizer import optimize_for_inference
+from .weight_store import SUFFIX, LoadStats, WeightFormatError, load_into, load_weights
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+from src.emotion_classification.utils.executor import EXECUTOR
+from src.emotion_classification.utils.processor import decode_pil_image, PREPROCESSOR
+from app.utils import Logger, CAPTURE_WRITER, METRICS, file_fingerprint
 from torch.nn import functional as F
 from PIL import Image
 
@@ -16,40 +23,92 @@ LOGGER = Logger(__file__, log_file='predictor.log')
 LOGGER.log.info('Starting Model Serving')
 
 
+def load_resnet(model_weight, device: str = "cpu") -> Tuple[ResNet, dict]:
+    """Build the ResNet and load its weights; returns (model, load time / memory report)."""
+    if Path(model_weight).suffix == SUFFIX:
+        with LoadStats("safetensors") as stats:
+            tensors, manifest = load_weights(model_weight)
+            if manifest.get("kind") != "resnet" or manifest.get("num_classes") != EmotionDataConfig.N_CLASSES:
+                raise WeightFormatError(f"{model_weight} holds {manifest.get('kind')!r} weights with "
+                                        f"{manifest.get('num_classes')} classes, expected a {EmotionDataConfig.N_CLASSES}-class ResNet")
+            # Tạo model trên meta device (không cấp phát), tensor mmap được gán thẳng làm parameter
+            with torch.device("meta"):
+                model = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES)
+            load_into(model, tensors, model_weight)
+        return model, stats.report
+
+    with LoadStats("pickle") as stats:
+        model = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES)
+        checkpoint = torch.load(
+            model_weight,
+            map_location=device,
+            weights_only=False
+        )
+
+        if isinstance(checkpoint, torch.nn.Module):
+            state_dict = checkpoint.state_dict()
+        else:
+            state_dict = checkpoint
+
+        result = model.load_state_dict(state_dict, strict=False)
+    if result.missing_keys or result.unexpected_keys:
+        LOGGER.log.warning(f"{model_weight}: {len(result.missing_keys)} missing keys "
+                           f"{result.missing_keys[:5]}, {len(result.unexpected_keys)} unexpected keys "
+                           f"{result.unexpected_keys[:5]}; convert_weights refuses such checkpoints")
+    return model, stats.report
+
+
 class Predictor:
-    def __init__(self, model_name: str, model_weight: str, device: str = "cpu"):
+    def __init__(
+        self,
+        model_name: str,
+        model_weight: str,
+        device: str = "cpu",
+        backend: str = ModelConfig.BACKEND,
+        precision: str = ModelConfig.PRECISION
+    ):
         self.model_name = model_name
         self.model_weight = model_weight
         self.device = device
+        self.backend_name = backend
+        self.precision = precision
         self.load_model()
         self.create_transform()
+        self.preprocessor = PREPROCESSOR
+        # Định danh model + weights + backend + precision, dùng làm một phần key của result cache
+        weight_fingerprint = file_fingerprint(self.served_weight)
+        self.cache_tag = f"{self.model_name}|{self.backend_name}|{self.precision}|{weight_fingerprint}"
+        self.batcher = MicroBatcher(
+            self.forward,
+            max_batch_size=ModelConfig.BATCH_MAX_SIZE,
+            max_wait_ms=ModelConfig.BATCH_MAX_WAIT_MS,
+            executor=EXECUTOR
+        )
 
-    async def predict(self, image, image_name):
-        pil_img = Image.open(image)
-        LOGGER.save_requests(pil_img, image_name)
-
-        if pil_img.mode == 'RGBA':
-            pil_img = pil_img.convert('RGB')
+    async def predict(self, image: bytes, image_name):
+        with METRICS.stage("predict", "decode"):
+            pil_img = await EXECUTOR.run_decode(decode_pil_image, image)
 
-        transformed_image = self.transforms_(pil_img).unsqueeze(0)
-        output = await self.model_inference(transformed_image)
-        probs, best_prob, predicted_id, predicted_class = self.output2pred(
-            output)
+        with METRICS.stage("predict", "preprocess"):
+            transformed_image = await EXECUTOR.run_inference(self.preprocess, pil_img)
+        with METRICS.stage("predict", "classify"):
+            probabilities = await self.classify(transformed_image)
+        probs, best_prob, predicted_id, predicted_class = self.probs2pred(
+            probabilities)
 
         LOGGER.log_model(self.model_name)
         LOGGER.log_response(best_prob, predicted_id, predicted_class)
 
         torch.cuda.empty_cache()
-        save_cache(
-            image_name,
-            AppPath.CAPTURED_DATA_DIR,
-            self.model_name,
-            self.model_weight,
-            probs,
-            best_prob,
-            predicted_id,
-            predicted_class
-        )
+        # Ảnh + kết quả được ghi ở background thread, không chặn request
+        CAPTURE_WRITER.submit(image, image_name, {
+            "predictor_name": self.model_name,
+            "predictor_weight": str(self.model_weight),
+            "probs": probs,
+            "best_prob": best_prob,
+            "predicted_id": predicted_id,
+            "predicted_class": predicted_class,
+        })
         return {
             "probs": probs,
             "best_prob": best_prob,
@@ -61,34 +120,55 @@ class Predictor:
 
     def load_model(self):
         try:
-            self.model = ResNet(
-                Block,[2,2,2,2],
-                num_classes=EmotionDataConfig.N_CLASSES
-            )
-
-            checkpoint = torch.load(
-                AppPath.RESNET_MODEL_WEIGHT,  # Đảm bảo AppPath đúng
-                map_location=self.device,
-                weights_only=False
-            )
-
-            if isinstance(checkpoint, torch.nn.Module):
-                state_dict = checkpoint.state_dict()
+            if self.precision not in ("fp32", "int8"):
+                raise ValueError(f"Unknown classifier precision: {self.precision}")
+            if self.precision == "int8" and self.backend_name != "torch":
+                # Model INT8 (static PTQ) chỉ chạy trên CPU với backend torch
+                raise ValueError("EMOTION_PRECISION=int8 is only supported with the torch backend")
+
+            self.optimization_report = {"mode": "off"}
+            # Chỉ load file thực sự được dùng để chạy, không load model fp32 rồi bỏ đi
+            if self.precision == "int8":
+                self.device = "cpu"
+                self.served_weight = ModelConfig.INT8_WEIGHT
+                with LoadStats("int8") as stats:
+                    self.model = load_quantized(self.served_weight)
+                self.weights_report = stats.report
+            elif self.backend_name == "onnxruntime":
+                # Session ORT đọc file .onnx, không cần model torch trong bộ nhớ
+                self.served_weight = ModelConfig.ONNX_WEIGHT
+                self.model = None
+                with LoadStats("onnx") as stats:
+                    self.backend = create_backend(self.backend_name, None, self.device, self.served_weight)
+                self.weights_report = stats.report
             else:
-                state_dict = checkpoint
-
-            self.model.load_state_dict(state_dict, strict=False)
-
-            self.model.to(self.device)
-            self.model.eval()
+                self.served_weight = self.model_weight
+                self.model, self.weights_report = load_resnet(self.model_weight, self.device)
+                self.model.to(self.device)
+            LOGGER.log.info(f"Weights loaded from {self.served_weight}: {self.weights_report}")
+
+            if self.model is not None:
+                self.model.eval()
+                # Trước khi tối ưu: module TorchScript đã freeze không có requires_grad_
+                self.model.requires_grad_(False)
+                if self.precision == "fp32":
+                    # Gộp BN + channels_last + TorchScript/compile, tự quay về model gốc nếu lỗi hoặc lệch kết quả
+                    runtime_model, self.optimization_report = optimize_for_inference(self.model, device=self.device)
+                    LOGGER.log.info(f"Graph optimization: {self.optimization_report}")
+                    # Chỉ giữ module đang chạy: model gốc chưa gộp BN sẽ tốn gấp đôi bộ nhớ (export ONNX dùng load_resnet)
+                    self.model = runtime_model
+                self.backend = create_backend(self.backend_name, self.model, self.device)
 
             LOGGER.log.info(
-                f"Successfully loaded model: {self.model_name} from {self.model_weight}")
+                f"Successfully loaded model: {self.model_name} from {self.model_weight} ({self.backend_name}, {self.precision})")
         except Exception as e:
             LOGGER.log.error(f"Fail to load model: {str(e)}")
             raise e
 
     def create_transform(self):
+        # torchvision chỉ cần cho transform tham chiếu, import lúc load model thay vì lúc import app
+        import torchvision
+
         img_size = EmotionDataConfig.IMG_SIZE
         mean = EmotionDataConfig.NORMALIZE_MEAN
         std = EmotionDataConfig.NORMALIZE_STD
@@ -103,14 +183,28 @@ class Predictor:
             )
         ])
 
+    def forward(self, input_tensor):
+        """Logits for a (N, 3, H, W) batch through the configured backend, returned on CPU."""
+        return self.backend(input_tensor)
+
     async def model_inference(self, input_tensor):
-        with torch.no_grad():
-            input_tensor = input_tensor.to(self.device)
-            output = self.model(input_tensor)
-        return output.cpu()
+        return await EXECUTOR.run_inference(self.forward, input_tensor)
+
+    def preprocess(self, image):
+        """(1, 3, H, W) classifier input from a PIL image or an RGB uint8 array."""
+        if isinstance(image, Image.Image):
+            image = np.asarray(image if image.mode == 'RGB' else image.convert('RGB'))
+        return self.preprocessor(image)
+
+    async def classify(self, input_tensor):
+        """Softmax probabilities for a (N, 3, H, W) batch, merged with other callers by the batcher."""
+        return await self.batcher.submit(input_tensor)
 
     def output2pred(self, output):
         probabilities = F.softmax(output, dim=1)
+        return self.probs2pred(probabilities)
+
+    def probs2pred(self, probabilities):
         best_prob, predict_id = torch.max(probabilities, 1)
         best_prob = best_prob.item()
         predicted_id = predict_id.item()
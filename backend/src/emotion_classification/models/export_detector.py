@@ -0,0 +1,58 @@
+"""
+Export the YOLOv8n-face weights to ONNX for DETECTOR_BACKEND=onnxruntime / opencv, then compare
+the new backends with ultralytics on the same exported graph.
+Chạy từ thư mục backend:
+    python -m src.emotion_classification.models.export_detector [--weight ...] [--output ...] [--image face.jpg]
+"""
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.emotion_classification.config.detect_cfg import YoloConfig
+from src.emotion_classification.models.detector_backends import (
+    UltralyticsBackend, OnnxYoloBackend, OpenCVYoloBackend, export_yolo_onnx
+)
+
+
+def main():
+    from app.utils import AppPath
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weight", type=Path, default=AppPath.YOLO_MODEL_WEIGHT)
+    parser.add_argument("--output", type=Path, default=AppPath.YOLO_ONNX_WEIGHT)
+    parser.add_argument("--image", type=Path, default=None, help="image used for the comparison (default: noise)")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    path = export_yolo_onnx(args.weight, args.output)
+    print(f"Exported {args.weight} -> {path}")
+
+    if args.image is not None:
+        image = cv2.imread(str(args.image))
+    else:
+        image = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+    from ultralytics import YOLO
+    backends = [UltralyticsBackend(YOLO(str(path), task="detect")), OnnxYoloBackend(path), OpenCVYoloBackend(path)]
+    reference = None
+    for backend in backends:
+        faces = backend.detect(image, YoloConfig.YOLO_CONFIG_THRESHOLD, YoloConfig.YOLO_IOU_THRESHOLD)
+        start_time = time.perf_counter()
+        for _ in range(args.repeat):
+            backend.detect(image, YoloConfig.YOLO_CONFIG_THRESHOLD, YoloConfig.YOLO_IOU_THRESHOLD)
+        ms = (time.perf_counter() - start_time) / args.repeat * 1000
+
+        if reference is None:
+            reference = faces
+        same = len(faces) == len(reference) and all(
+            max(abs(a - b) for a, b in zip(face[:4], ref[:4])) <= 1 for face, ref in zip(faces, reference))
+        print(f"{backend.name:>12}: {ms:7.1f} ms/image, {len(faces)} faces, matches ultralytics: {same}")
+
+
+if __name__ == "__main__":
+    main()
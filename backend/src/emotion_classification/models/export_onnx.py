@@ -0,0 +1,85 @@
+"""
+Export the ResNet emotion classifier checkpoint to ONNX with a dynamic batch axis.
+Chạy từ thư mục backend:
+    python -m src.emotion_classification.models.export_onnx [--weight ...] [--output ...]
+"""
+import sys
+import argparse
+import torch
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+
+
+def export_onnx(model: torch.nn.Module, output_path, opset: int = ModelConfig.ONNX_OPSET) -> Path:
+    """Write `model` as ONNX with input "input" (N, 3, H, W) and output "logits" (N, n_classes)."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    img_size = EmotionDataConfig.IMG_SIZE
+    # Batch 2 khi trace để BatchNorm1d ở fc không bị coi là batch cố định
+    dummy = torch.zeros(2, 3, img_size, img_size)
+
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy,),
+            str(output_path),
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=opset,
+            dynamo=False
+        )
+    return output_path
+
+
+def check_onnx(model: torch.nn.Module, onnx_path, batch_sizes=(1, 8, 32),
+               tolerance: float = ModelConfig.ONNX_CHECK_TOLERANCE) -> dict:
+    """
+    Max absolute difference of logits between the torch model and onnxruntime, per batch size.
+    Raises ValueError when any batch differs by more than `tolerance`.
+    """
+    from .backends import OnnxRuntimeBackend
+
+    backend = OnnxRuntimeBackend(onnx_path)
+    img_size = EmotionDataConfig.IMG_SIZE
+    generator = torch.Generator().manual_seed(0)
+    diffs = {}
+    for batch_size in batch_sizes:
+        inputs = torch.randn(batch_size, 3, img_size, img_size, generator=generator)
+        with torch.no_grad():
+            expected = model(inputs)
+        diffs[batch_size] = (backend(inputs) - expected).abs().max().item()
+    if max(diffs.values()) > tolerance:
+        details = ", ".join(f"batch {batch_size}: {diff:.2e}" for batch_size, diff in diffs.items())
+        raise ValueError(f"{onnx_path} does not reproduce the torch model ({details} > {tolerance})")
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weight", type=Path, default=ModelConfig.MODEL_WEIGHT)
+    parser.add_argument("--output", type=Path, default=ModelConfig.ONNX_WEIGHT)
+    parser.add_argument("--opset", type=int, default=ModelConfig.ONNX_OPSET)
+    parser.add_argument("--no-check", action="store_true", help="skip the onnxruntime comparison")
+    parser.add_argument("--tolerance", type=float, default=ModelConfig.ONNX_CHECK_TOLERANCE,
+                        help="max |torch - onnxruntime| logit difference before the export is rejected")
+    args = parser.parse_args()
+
+    from .emotion_predictor import load_resnet
+
+    # Export từ model eager chưa tối ưu (Predictor chỉ giữ module đã gộp BN / TorchScript)
+    model, _ = load_resnet(args.weight)
+    path = export_onnx(model, args.output, args.opset)
+    print(f"Exported {args.weight} -> {path} ({path.stat().st_size / 1024 ** 2:.1f} MB)")
+
+    if not args.no_check:
+        for batch_size, diff in check_onnx(model, path, tolerance=args.tolerance).items():
+            print(f"batch {batch_size:>3}: max |torch - onnxruntime| = {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import copy
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+
+from torch.nn.utils.fusion import fuse_conv_bn_eval, fuse_linear_bn_eval
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+from .resnet_model import ResNet, Block
+
+OPTIMIZATION_MODES = ("off", "eager", "torchscript", "compile", "auto")
+
+
+def fold_batchnorm(model: ResNet) -> ResNet:
+    """
+    Fold every BatchNorm of an eval-mode ResNet into the layer before it, in place:
+    stem conv, both convs of each Block, the downsample conv and the Linear → BatchNorm1d of the fc head.
+    """
+    model.conv1 = fuse_conv_bn_eval(model.conv1, model.bn1)
+    model.bn1 = nn.Identity()
+
+    for module in model.modules():
+        if isinstance(module, Block):
+            module.conv1 = fuse_conv_bn_eval(module.conv1, module.bn1)
+            module.bn1 = nn.Identity()
+            module.conv2 = fuse_conv_bn_eval(module.conv2, module.bn2)
+            module.bn2 = nn.Identity()
+            if module.downsample is not None:
+                module.downsample[0] = fuse_conv_bn_eval(module.downsample[0], module.downsample[1])
+                module.downsample[1] = nn.Identity()
+
+    if isinstance(model.fc[0], nn.Linear) and isinstance(model.fc[1], nn.BatchNorm1d):
+        model.fc[0] = fuse_linear_bn_eval(model.fc[0], model.fc[1])
+        model.fc[1] = nn.Identity()
+    return model
+
+
+class ChannelsLastInput(nn.Module):
+    """Converts NCHW inputs to channels_last before a channels_last model."""
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model(x.contiguous(memory_format=torch.channels_last))
+
+
+def _example_input(device, batch_size: int = 4) -> torch.Tensor:
+    img_size = EmotionDataConfig.IMG_SIZE
+    generator = torch.Generator().manual_seed(0)
+    return torch.randn(batch_size, 3, img_size, img_size, generator=generator).to(device)
+
+
+def _timed_call(model, inputs) -> float:
+    start_time = time.perf_counter()
+    with torch.no_grad():
+        model(inputs)
+    return time.perf_counter() - start_time
+
+
+def steady_state_ms(model, inputs, repeat: int = 10) -> float:
+    return float(np.median([_timed_call(model, inputs) for _ in range(repeat)])) * 1000
+
+
+def optimize_for_inference(
+    model: ResNet,
+    mode: str = ModelConfig.GRAPH_OPTIMIZATION,
+    channels_last: bool = ModelConfig.CHANNELS_LAST,
+    tolerance: float = ModelConfig.GRAPH_OPT_TOLERANCE,
+    device: str = "cpu"
+):
+    """
+    Returns (runtime_model, report). The runtime model is the BN-folded network, optionally
+    channels_last, and frozen with TorchScript or wrapped by torch.compile. Any failure, or
+    logits further than `tolerance` from the original model, falls back to the plain model.
+    """
+    if mode not in OPTIMIZATION_MODES:
+        raise ValueError(f"Unknown graph optimization mode: {mode}")
+    report = {"requested": mode, "mode": "off", "channels_last": False}
+    if mode == "off":
+        return model, report
+
+    inputs = _example_input(device)
+    with torch.no_grad():
+        expected = model(inputs)
+
+    start_time = time.perf_counter()
+    optimized = fold_batchnorm(copy.deepcopy(model)).eval()
+    if channels_last:
+        optimized = ChannelsLastInput(optimized.to(memory_format=torch.channels_last)).eval()
+        report["channels_last"] = True
+    report["fold_seconds"] = round(time.perf_counter() - start_time, 3)
+
+    # auto: TorchScript freeze (khởi động nhanh), torch.compile chỉ khi yêu cầu rõ
+    candidates = {"eager": ["eager"], "torchscript": ["torchscript", "eager"],
+                  "compile": ["compile", "eager"], "auto": ["torchscript", "eager"]}[mode]
+    for candidate in candidates:
+        try:
+            start_time = time.perf_counter()
+            if candidate == "torchscript":
+                with torch.no_grad():
+                    runtime = torch.jit.optimize_for_inference(torch.jit.freeze(torch.jit.trace(optimized, inputs)))
+            elif candidate == "compile":
+                runtime = torch.compile(optimized, dynamic=True)
+            else:
+                runtime = optimized
+            # Lần gọi đầu gồm cả thời gian trace/compile thật sự
+            first_call = _timed_call(runtime, inputs)
+            with torch.no_grad():
+                max_diff = (runtime(inputs) - expected).abs().max().item()
+                # Batch khác lúc trace vẫn phải chạy đúng
+                max_diff = max(max_diff, (runtime(inputs[:1]) - expected[:1]).abs().max().item())
+        except Exception as e:
+            report.setdefault("fallbacks", []).append(f"{candidate}: {type(e).__name__}: {e}")
+            continue
+
+        if max_diff > tolerance:
+            report.setdefault("fallbacks", []).append(f"{candidate}: max diff {max_diff:.2e} > {tolerance}")
+            continue
+
+        report.update({
+            "mode": candidate,
+            "max_abs_diff": max_diff,
+            "startup_seconds": round(time.perf_counter() - start_time, 3),
+            "first_call_ms": round(first_call * 1000, 2),
+        })
+        return runtime, report
+
+    report["channels_last"] = False
+    return model, report
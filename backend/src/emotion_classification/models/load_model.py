@@ -1,8 +1,5 @@
-import gdown
 import sys
 import os
-from ultralytics import YOLO
-import requests
 
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
@@ -18,9 +15,12 @@ YOLO_MODEL_WEIGHT = WEIGHTS_DIR/'yolov8n-face-lindevs.pt'
 def resnet_download():
     RESNET_MODEL_WEIGHT.parent.mkdir(parents=True, exist_ok=True)
     if not os.path.exists(RESNET_MODEL_WEIGHT):
+        import gdown
         url = f'https://drive.google.com/uc?id={FILE_ID}'
-        # 2. Thuc hien tai ve
-        gdown.download(url, str(RESNET_MODEL_WEIGHT), quiet=False, fuzzy=True)
+        # 2. Thuc hien tai ve (file tạm rồi đổi tên: tải dở không để lại weights hỏng)
+        partial = RESNET_MODEL_WEIGHT.with_suffix('.part')
+        gdown.download(url, str(partial), quiet=False, fuzzy=True)
+        partial.replace(RESNET_MODEL_WEIGHT)
         print(f"Downloaded: {RESNET_MODEL_WEIGHT}")
         return True
     else:
@@ -32,12 +32,15 @@ def yoloface_download():
     WEIGHTS_DIR.mkdir(parents=True, exist_ok=True)
     url = "https://github.com/lindevs/yolov8-face/releases/latest/download/yolov8n-face-lindevs.pt"
     if not YOLO_MODEL_WEIGHT.exists():
+        import requests
         print(f"Đang tải model về: {YOLO_MODEL_WEIGHT}...")
         response = requests.get(url, stream=True)
         if response.status_code == 200:
-            with open(YOLO_MODEL_WEIGHT, 'wb') as f:
+            partial = YOLO_MODEL_WEIGHT.with_suffix('.part')
+            with open(partial, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     f.write(chunk)
+            partial.replace(YOLO_MODEL_WEIGHT)
             print("Tải model thành công!")
         else:
             print(f"Lỗi tải file: Mã lỗi {response.status_code}")
@@ -0,0 +1,238 @@
+import sys
+import time
+import asyncio
+import threading
+import numpy as np
+import torch
+
+from .emotion_predictor import Predictor
+from .yolo_detector import FacesDetector
+from .weight_store import resolve_weight
+from src.emotion_classification.config.emotion_cfg import ModelConfig, EmotionDataConfig
+from src.emotion_classification.config.detect_cfg import YoloConfig
+from app.utils import Logger, AppPath
+
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+LOGGER = Logger(__file__, log_file='registry.log')
+
+
+def module_memory_bytes(module: torch.nn.Module) -> dict:
+    """Bytes held by the parameters and buffers of a module (constants of a frozen TorchScript graph)."""
+    param_bytes = sum(p.numel() * p.element_size() for p in module.parameters())
+    buffer_bytes = sum(b.numel() * b.element_size() for b in module.buffers())
+    # Module INT8 giữ weight dạng packed, không nằm trong parameters()/buffers()
+    known = {name for name, _ in module.named_parameters()} | {name for name, _ in module.named_buffers()}
+    packed_bytes = sum(value.numel() * value.element_size() for name, value in module.state_dict().items()
+                       if name not in known and isinstance(value, torch.Tensor))
+    if isinstance(module, torch.jit.ScriptModule) and hasattr(module, "graph"):
+        # Module đã freeze: weight nằm thành hằng số trong graph (có thể ở layout MKLDNN)
+        packed_bytes += _graph_constant_bytes(module.graph)
+    total_bytes = param_bytes + buffer_bytes + packed_bytes
+    return {
+        "param_bytes": param_bytes,
+        "buffer_bytes": buffer_bytes,
+        "packed_bytes": packed_bytes,
+        "total_bytes": total_bytes,
+        "total_mb": round(total_bytes / 1024 ** 2, 2),
+    }
+
+
+def _graph_constant_bytes(graph) -> int:
+    total = 0
+    for kind in ("prim::Constant", "prim::ConstantMKLDNNTensor"):
+        for node in graph.findAllNodes(kind):
+            if "value" in node.attributeNames() and node.kindOf("value") == "t":
+                value = node.t("value")
+                total += value.numel() * value.element_size()
+    return total
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the emotion classifier and the face detector.
+    Each model is loaded once, frozen for inference and shared by every router.
+    `start_warmup` loads and warms both models in a background thread; `state` goes
+    "idle" → "loading" → "ready" (or "failed") and `wait_ready` lets handlers await it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._load_seconds = {}
+        self._warmup_lock = threading.Lock()
+        self._warmup_thread = None
+        self._warmup_done = threading.Event()
+        self.state = "idle"
+        self.error = None
+        self.warmup_seconds = None
+
+    def _get_or_load(self, key, loader):
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Một thread khác có thể đã load xong trong lúc chờ lock
+            if key not in self._models:
+                start_time = time.perf_counter()
+                self._models[key] = loader()
+                self._load_seconds[key] = time.perf_counter() - start_time
+                LOGGER.log.info(
+                    f"Loaded {key} in {self._load_seconds[key]:.2f}s")
+        return self._models[key]
+
+    def _load_predictor(self) -> Predictor:
+        predictor = Predictor(
+            model_name=ModelConfig.MODEL_NAME,
+            model_weight=resolve_weight(ModelConfig.MODEL_WEIGHT),
+            device=ModelConfig.DEVICE
+        )
+        return predictor
+
+    def _load_detector(self) -> FacesDetector:
+        detector = FacesDetector(
+            model_name=YoloConfig.YOLO_MODEL_NAME,
+            model_weight=resolve_weight(AppPath.YOLO_MODEL_WEIGHT),
+            device=ModelConfig.DEVICE,
+            backend=YoloConfig.DETECTOR_BACKEND,
+            onnx_weight=AppPath.YOLO_ONNX_WEIGHT
+        )
+        if detector.model is not None:
+            detector.model.model.requires_grad_(False)
+        return detector
+
+    def get_predictor(self) -> Predictor:
+        return self._get_or_load("predictor", self._load_predictor)
+
+    def get_detector(self) -> FacesDetector:
+        return self._get_or_load("detector", self._load_detector)
+
+    def loaded(self, key: str):
+        """The model already loaded under `key` ("predictor" / "detector"), never triggers a load."""
+        return self._models.get(key)
+
+    def weights_report(self) -> dict:
+        """Load time and RSS growth of the weights of each loaded model."""
+        return {key: model.weights_report for key, model in self._models.items()}
+
+    def download_weights(self):
+        """Download the default checkpoints that are missing (no-op, and no gdown / requests import, once present)."""
+        from .load_model import resnet_download, yoloface_download
+
+        # Chế độ int8 / onnxruntime chạy từ file riêng, không cần checkpoint fp32
+        serves_fp32_torch = ModelConfig.PRECISION == "fp32" and ModelConfig.BACKEND == "torch"
+        if serves_fp32_torch and not resolve_weight(ModelConfig.MODEL_WEIGHT).exists():
+            resnet_download()
+        if YoloConfig.DETECTOR_BACKEND == "ultralytics" and not resolve_weight(AppPath.YOLO_MODEL_WEIGHT).exists():
+            yoloface_download()
+
+    def warmup(self):
+        """Download missing weights, load both models and run one dummy inference so the first request is not slow."""
+        start_time = time.perf_counter()
+        # Event của lần warm-up này: lần trước (đã lỗi) set muộn cũng không đánh thức người đang chờ lần mới
+        done = self._warmup_done
+        self.state = "loading"
+        try:
+            # Tải trong warm-up (thread nền): server vẫn nhận request, lỗi tải hiện ở /readyz thay vì chặn khởi động
+            self.download_weights()
+            predictor = self.get_predictor()
+            detector = self.get_detector()
+
+            img_size = EmotionDataConfig.IMG_SIZE
+            predictor.forward(torch.zeros(1, 3, img_size, img_size))
+
+            yolo_size = YoloConfig.YOLO_IMAGE_SIZE
+            detector.detect(np.zeros((yolo_size, yolo_size, 3), dtype=np.uint8))
+        except Exception as e:
+            self.state = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+            LOGGER.log.error(f"Model warm-up failed: {self.error}")
+            done.set()
+            raise
+        self.warmup_seconds = time.perf_counter() - start_time
+        self.state = "ready"
+        self.error = None
+        # Báo xong sau khi state đã đổi: request đang chờ không thấy "loading" cũ
+        done.set()
+        LOGGER.log.info(f"Models warmed up in {self.warmup_seconds:.2f}s")
+
+    def start_warmup(self):
+        """Run `warmup` in a background thread (once; again only after a failure)."""
+        with self._warmup_lock:
+            if self.state in ("loading", "ready"):
+                return
+            self.state = "loading"
+            self._warmup_done = threading.Event()
+            self._warmup_thread = threading.Thread(target=self._background_warmup, name="model-warmup", daemon=True)
+            self._warmup_thread.start()
+
+    def _background_warmup(self):
+        try:
+            self.warmup()
+        except Exception:
+            # Đã ghi log + state "failed", /readyz trả lỗi
+            pass
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Await the background warm-up without blocking the event loop; starts it if nobody did."""
+        if self.ready:
+            return True
+        self.start_warmup()
+        # Poll thay vì chờ Event trong thread: không giữ thread nào khi nhiều request cùng chờ
+        deadline = time.monotonic() + timeout
+        while not self._warmup_done.is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return self.ready
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            "load_seconds": {key: round(seconds, 3) for key, seconds in self._load_seconds.items()},
+        }
+
+    def memory_report(self) -> dict:
+        report = {}
+        if "predictor" in self._models:
+            predictor = self._models["predictor"]
+            report["predictor"] = {
+                "model_name": predictor.model_name,
+                "model_weight": str(predictor.model_weight),
+                "backend": predictor.backend_name,
+                "precision": predictor.precision,
+                "optimization": predictor.optimization_report,
+                "load_seconds": round(self._load_seconds["predictor"], 3),
+                "served_weight": str(predictor.served_weight),
+                "weights_load": predictor.weights_report,
+            }
+            if predictor.model is not None:
+                report["predictor"]["runtime_module"] = type(predictor.model).__name__
+                report["predictor"].update(module_memory_bytes(predictor.model))
+            else:
+                report["predictor"]["runtime_module"] = type(predictor.backend.session).__name__
+                report["predictor"]["onnx_mb"] = round(Path(predictor.served_weight).stat().st_size / 1024 ** 2, 2)
+        if "detector" in self._models:
+            detector = self._models["detector"]
+            report["detector"] = {
+                "model_name": detector.model_name,
+                "model_weight": str(detector.model_weight),
+                "backend": detector.backend_name,
+                "load_seconds": round(self._load_seconds["detector"], 3),
+                "weights_load": detector.weights_report,
+            }
+            if detector.model is not None:
+                report["detector"].update(module_memory_bytes(detector.model.model))
+            else:
+                report["detector"]["onnx_weight"] = str(detector.onnx_weight)
+                report["detector"]["onnx_mb"] = round(detector.onnx_weight.stat().st_size / 1024 ** 2, 2)
+        return report
+
+
+MODEL_REGISTRY = ModelRegistry()
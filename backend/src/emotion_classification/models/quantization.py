@@ -0,0 +1,270 @@
+"""
+Static post-training INT8 quantization of the ResNet emotion classifier.
+Conv-BN-ReLU are fused, activations are calibrated on captured uploads (or a synthetic
+set when nothing has been captured yet) and the small fc head stays in float.
+
+Chạy từ thư mục backend:
+    python -m src.emotion_classification.models.quantization [--calib-dir ...] [--eval-dir ...]
+"""
+import io
+import sys
+import time
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+
+from pathlib import Path
+from typing import Iterator, List, Optional
+from torch.ao.nn.quantized import FloatFunctional
+from torch.ao.quantization import QuantStub, DeQuantStub, get_default_qconfig, prepare, convert, fuse_modules
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from .resnet_model import ResNet, Block
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+from src.emotion_classification.utils.processor import PREPROCESSOR, decode_rgb_array
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+class QuantizableBlock(Block):
+    """Block with one ReLU per use and a quantizable residual add (fused with the last ReLU)."""
+
+    def __init__(self, inchannels, outchannels, stride=1, downsample=None):
+        super().__init__(inchannels, outchannels, stride, downsample)
+        self.relu = nn.ReLU()
+        self.skip_add = FloatFunctional()
+
+    def forward(self, x):
+        identity = x
+        out = self.relu(self.bn1(self.conv1(x)))
+        out = self.bn2(self.conv2(out))
+        if self.downsample is not None:
+            identity = self.downsample(x)
+        return self.skip_add.add_relu(out, identity)
+
+    def fuse_model(self):
+        fuse_modules(self, [["conv1", "bn1", "relu"], ["conv2", "bn2"]], inplace=True)
+        if self.downsample is not None:
+            fuse_modules(self.downsample, [["0", "1"]], inplace=True)
+
+
+class QuantizableResNet(ResNet):
+    """Same layout and state-dict keys as ResNet; the backbone runs in INT8, the fc head in float."""
+
+    def __init__(self, layer=EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES):
+        super().__init__(QuantizableBlock, layer, num_classes)
+        self.relu = nn.ReLU()
+        self.quant = QuantStub()
+        self.dequant = DeQuantStub()
+
+    def forward(self, x):
+        x = self.quant(x)
+        x = self.relu(self.bn1(self.conv1(x)))
+        x = self.layer1(x)
+        x = self.layer2(x)
+        x = self.layer3(x)
+        x = self.layer4(x)
+        x = self.avgpooling(x)
+        x = torch.flatten(x, 1)
+        x = self.dequant(x)
+        return self.fc(x)
+
+    def fuse_model(self):
+        fuse_modules(self, [["conv1", "bn1", "relu"]], inplace=True)
+        for module in self.modules():
+            if isinstance(module, QuantizableBlock):
+                module.fuse_model()
+
+
+def _prepared_model(state_dict: Optional[dict], engine: str) -> QuantizableResNet:
+    torch.backends.quantized.engine = engine
+    model = QuantizableResNet()
+    if state_dict is not None:
+        # Cùng key với ResNet: checkpoint sai phải lỗi ngay, không được calibrate thành artifact INT8
+        model.load_state_dict(state_dict, strict=True)
+    model.eval()
+    model.fuse_model()
+    model.qconfig = get_default_qconfig(engine)
+    # fc head (Linear + BatchNorm1d + GELU) giữ float: nhỏ và nhạy với sai số
+    model.fc.qconfig = None
+    return prepare(model)
+
+
+def quantize_model(float_state_dict: dict, calibration_batches, engine: str = ModelConfig.QUANT_ENGINE) -> nn.Module:
+    """Fuse, calibrate on `calibration_batches` (iterable of (N, 3, H, W) tensors) and convert to INT8."""
+    model = _prepared_model(float_state_dict, engine)
+    with torch.no_grad():
+        for batch in calibration_batches:
+            model(batch)
+    return convert(model)
+
+
+def save_quantized(model: nn.Module, path, engine: str = ModelConfig.QUANT_ENGINE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    torch.save({"format": "int8-static", "engine": engine, "state_dict": model.state_dict()}, path)
+
+
+def load_quantized(path) -> nn.Module:
+    """Rebuild the INT8 graph and load a state dict written by save_quantized."""
+    checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    if not isinstance(checkpoint, dict) or checkpoint.get("format") != "int8-static":
+        raise ValueError(f"{path} is not an INT8 classifier artifact")
+    model = convert(_prepared_model(None, checkpoint["engine"]))
+    model.load_state_dict(checkpoint["state_dict"])
+    return model.eval()
+
+
+def list_images(data_dir) -> List[Path]:
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        return []
+    return sorted(p for p in data_dir.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def image_batches(paths: List[Path], batch_size: int, labels: Optional[List[int]] = None) -> Iterator:
+    """
+    Preprocessed batches of the images that decode. With `labels` (one per path) yields
+    (batch, batch labels) instead, dropping the label of every image that is skipped.
+    """
+    for start in range(0, len(paths), batch_size):
+        images, batch_labels = [], []
+        for index, path in enumerate(paths[start:start + batch_size], start):
+            try:
+                images.append(decode_rgb_array(path.read_bytes()))
+            except Exception:
+                continue
+            if labels is not None:
+                batch_labels.append(labels[index])
+        if images:
+            batch = PREPROCESSOR(images)
+            yield batch if labels is None else (batch, torch.tensor(batch_labels))
+
+
+def synthetic_batches(n_images: int, batch_size: int, seed: int = 0) -> Iterator[torch.Tensor]:
+    """Smooth random images; only good enough to set activation ranges when no real data exists."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    img_size = EmotionDataConfig.IMG_SIZE
+    for start in range(0, n_images, batch_size):
+        images = []
+        for _ in range(min(batch_size, n_images - start)):
+            small = rng.integers(0, 256, (12, 12, 3), dtype=np.uint8)
+            images.append(cv2.resize(small, (img_size, img_size), interpolation=cv2.INTER_CUBIC))
+        yield PREPROCESSOR(images)
+
+
+def state_dict_bytes(model: nn.Module) -> int:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
+
+
+def latency_ms(model: nn.Module, batch_size: int, repeat: int = 20) -> float:
+    img_size = EmotionDataConfig.IMG_SIZE
+    inputs = torch.randn(batch_size, 3, img_size, img_size)
+    timings = []
+    with torch.no_grad():
+        model(inputs)
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            model(inputs)
+            timings.append(time.perf_counter() - start_time)
+    return float(np.median(timings)) * 1000
+
+
+def compare(float_model: nn.Module, int8_model: nn.Module, batches) -> dict:
+    """
+    Top-1 agreement and probability drift of INT8 vs fp32; accuracy of both when the
+    batches are (batch, labels) pairs as yielded by image_batches(..., labels=...).
+    """
+    fp32_preds, int8_preds, prob_diffs, targets = [], [], [], []
+    with torch.no_grad():
+        for batch in batches:
+            if isinstance(batch, tuple):
+                batch, batch_labels = batch
+                targets.append(batch_labels)
+            fp32_probs = torch.softmax(float_model(batch), dim=1)
+            int8_probs = torch.softmax(int8_model(batch), dim=1)
+            fp32_preds.append(fp32_probs.argmax(1))
+            int8_preds.append(int8_probs.argmax(1))
+            prob_diffs.append((fp32_probs - int8_probs).abs().max(1).values)
+
+    fp32_preds, int8_preds = torch.cat(fp32_preds), torch.cat(int8_preds)
+    prob_diffs = torch.cat(prob_diffs)
+    report = {
+        "images": len(fp32_preds),
+        "top1_agreement": round((fp32_preds == int8_preds).float().mean().item(), 4),
+        "mean_max_prob_diff": round(prob_diffs.mean().item(), 4),
+    }
+    if targets:
+        targets = torch.cat(targets)
+        report["fp32_accuracy"] = round((fp32_preds == targets).float().mean().item(), 4)
+        report["int8_accuracy"] = round((int8_preds == targets).float().mean().item(), 4)
+    return report
+
+
+def labelled_images(eval_dir) -> tuple:
+    """Images under <eval_dir>/<class name>/ with their class ids (class names as in EmotionDataConfig)."""
+    paths, labels = [], []
+    for label, class_id in EmotionDataConfig.LABEL2ID.items():
+        class_paths = list_images(Path(eval_dir) / label)
+        paths.extend(class_paths)
+        labels.extend([class_id] * len(class_paths))
+    return paths, labels
+
+
+def main():
+    from app.utils import AppPath
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weight", type=Path, default=ModelConfig.MODEL_WEIGHT)
+    parser.add_argument("--output", type=Path, default=ModelConfig.INT8_WEIGHT)
+    parser.add_argument("--calib-dir", type=Path, default=AppPath.CAPTURED_DATA_DIR)
+    parser.add_argument("--calib-images", type=int, default=512)
+    parser.add_argument("--eval-dir", type=Path, default=None,
+                        help="optional <dir>/<class name>/*.jpg set for accuracy; otherwise agreement on the calibration images")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--engine", default=ModelConfig.QUANT_ENGINE)
+    args = parser.parse_args()
+
+    checkpoint = torch.load(args.weight, map_location="cpu", weights_only=False)
+    state_dict = checkpoint.state_dict() if isinstance(checkpoint, nn.Module) else checkpoint
+    float_model = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES)
+    float_model.load_state_dict(state_dict, strict=True)
+    float_model.eval()
+
+    calib_paths = list_images(args.calib_dir)[:args.calib_images]
+    if calib_paths:
+        print(f"Calibrating on {len(calib_paths)} images from {args.calib_dir}")
+        make_calib = lambda: image_batches(calib_paths, args.batch_size)
+    else:
+        print(f"No images in {args.calib_dir}, calibrating on {args.calib_images} synthetic images")
+        make_calib = lambda: synthetic_batches(args.calib_images, args.batch_size)
+
+    start_time = time.perf_counter()
+    int8_model = quantize_model(state_dict, make_calib(), args.engine)
+    print(f"Quantized in {time.perf_counter() - start_time:.1f}s")
+    save_quantized(int8_model, args.output, args.engine)
+
+    if args.eval_dir is not None:
+        eval_paths, labels = labelled_images(args.eval_dir)
+        quality = compare(float_model, int8_model, image_batches(eval_paths, args.batch_size, labels))
+    else:
+        quality = compare(float_model, int8_model, make_calib())
+
+    print(f"Saved {args.output}")
+    for key, value in quality.items():
+        print(f"  {key}: {value}")
+    print(f"  size fp32: {state_dict_bytes(float_model) / 1024 ** 2:.1f} MB, "
+          f"int8: {args.output.stat().st_size / 1024 ** 2:.1f} MB")
+    for batch_size in (1, args.batch_size):
+        print(f"  latency batch {batch_size}: fp32 {latency_ms(float_model, batch_size):.1f} ms, "
+              f"int8 {latency_ms(int8_model, batch_size):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
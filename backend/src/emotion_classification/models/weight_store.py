@@ -0,0 +1,279 @@
+import os
+import json
+import mmap
+import time
+import struct
+import hashlib
+import torch
+
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from src.emotion_classification.config.emotion_cfg import ModelConfig
+
+# Định dạng safetensors: 8 byte độ dài header (little-endian) + header JSON + data liền nhau.
+# Tự đọc / ghi để không thêm dependency, file vẫn mở được bằng thư viện safetensors.
+DTYPES = {
+    torch.float64: "F64", torch.float32: "F32", torch.float16: "F16", torch.bfloat16: "BF16",
+    torch.int64: "I64", torch.int32: "I32", torch.int16: "I16", torch.int8: "I8",
+    torch.uint8: "U8", torch.bool: "BOOL",
+}
+TORCH_DTYPES = {code: dtype for dtype, code in DTYPES.items()}
+SUFFIX = ".safetensors"
+MANIFEST_SUFFIX = ".manifest.json"
+_ALIGNMENT = 8
+
+
+class WeightFormatError(ValueError):
+    """The weight artifact is corrupt, does not match its manifest or does not fit the model."""
+
+
+def manifest_path(path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name[:-len(SUFFIX)] + MANIFEST_SUFFIX if path.name.endswith(SUFFIX)
+                          else path.name + MANIFEST_SUFFIX)
+
+
+def resolve_weight(path, weight_format: str = ModelConfig.WEIGHT_FORMAT) -> Path:
+    """
+    The file to load for a checkpoint path: its converted `.safetensors` sibling when
+    `weight_format` is "auto" (and it exists) or "safetensors", the path itself for "pickle".
+    """
+    path = Path(path)
+    if weight_format not in ("auto", "safetensors", "pickle"):
+        raise ValueError(f"Unknown weight format: {weight_format}")
+    converted = path if path.suffix == SUFFIX else path.with_suffix(SUFFIX)
+    if weight_format == "pickle" or (weight_format == "auto" and not converted.exists()):
+        return path
+    if not converted.exists():
+        raise FileNotFoundError(f"{converted} not found, convert {path} with convert_weights first")
+    return converted
+
+
+def save_weights(tensors: Dict[str, torch.Tensor], path, manifest: Optional[dict] = None) -> dict:
+    """Write `tensors` as a safetensors file plus a manifest (shapes, dtypes, sha256 of the data)."""
+    path = Path(path)
+    tensors = {name: tensor.detach().cpu().contiguous() for name, tensor in tensors.items()}
+    for name, tensor in tensors.items():
+        if tensor.dtype not in DTYPES:
+            raise WeightFormatError(f"{name}: dtype {tensor.dtype} is not supported")
+
+    # Tensor có phần tử lớn trước: offset của mọi tensor chia hết cho kích thước phần tử của nó
+    names = sorted(tensors, key=lambda name: (-tensors[name].element_size(), name))
+    header, offset = {}, 0
+    for name in names:
+        size = tensors[name].numel() * tensors[name].element_size()
+        header[name] = {"dtype": DTYPES[tensors[name].dtype], "shape": list(tensors[name].shape),
+                        "data_offsets": [offset, offset + size]}
+        offset += size
+    header["__metadata__"] = {"format": "pt", "kind": str((manifest or {}).get("kind", ""))}
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    header_bytes += b" " * (-(8 + len(header_bytes)) % _ALIGNMENT)
+
+    digest = hashlib.sha256()
+    tmp_path = path.with_name(path.name + ".part")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name in names:
+            data = tensors[name].reshape(-1).view(torch.uint8).numpy().tobytes() if tensors[name].numel() else b""
+            digest.update(data)
+            f.write(data)
+    tmp_path.replace(path)
+
+    manifest = {
+        **(manifest or {}),
+        "format": "safetensors",
+        "file": path.name,
+        "data_bytes": offset,
+        "sha256": digest.hexdigest(),
+        "tensors": {name: {"dtype": header[name]["dtype"], "shape": header[name]["shape"]} for name in names},
+    }
+    with open(manifest_path(path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_weights(path, verify: bool = ModelConfig.WEIGHT_VERIFY_HASH) -> Tuple[Dict[str, torch.Tensor], dict]:
+    """
+    Memory-map a safetensors file and return (tensors, manifest) without copying: every tensor is
+    a view on the mapping (private copy-on-write, pages are shared with the page cache and across
+    forked workers). Raises WeightFormatError when the file disagrees with its manifest.
+    """
+    path = Path(path)
+    try:
+        with open(manifest_path(path), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise WeightFormatError(f"Manifest {manifest_path(path)} is missing")
+    except ValueError as e:
+        raise WeightFormatError(f"Manifest {manifest_path(path)} is not valid JSON ({e})")
+    if not isinstance(manifest, dict) or not {"data_bytes", "sha256", "tensors"} <= set(manifest):
+        raise WeightFormatError(f"Manifest {manifest_path(path)} lacks data_bytes / sha256 / tensors")
+
+    try:
+        with open(path, "rb") as f:
+            # mmap không map được file rỗng (ValueError): kiểm tra kích thước trước
+            if os.fstat(f.fileno()).st_size < 8:
+                raise WeightFormatError(f"{path} is too small to be a safetensors file")
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except WeightFormatError:
+        raise
+    except FileNotFoundError:
+        raise WeightFormatError(f"{path} is missing but its manifest {manifest_path(path)} exists")
+    except (OSError, ValueError) as e:
+        raise WeightFormatError(f"Cannot map {path} ({e})")
+    header_size = struct.unpack("<Q", mapping[:8])[0]
+    data_start = 8 + header_size
+    if data_start > len(mapping):
+        raise WeightFormatError(f"{path}: header of {header_size} bytes runs past the end of the file")
+    try:
+        header = json.loads(mapping[8:data_start])
+    except ValueError as e:
+        raise WeightFormatError(f"{path}: invalid header ({e})")
+    if not isinstance(header, dict):
+        raise WeightFormatError(f"{path}: header is not a JSON object")
+    header.pop("__metadata__", None)
+
+    if len(mapping) - data_start != manifest["data_bytes"]:
+        raise WeightFormatError(f"{path}: {len(mapping) - data_start} data bytes, manifest says {manifest['data_bytes']}")
+    expected = manifest["tensors"]
+    if set(header) != set(expected):
+        raise WeightFormatError(f"{path}: tensors differ from the manifest "
+                                f"(missing {sorted(set(expected) - set(header))[:5]}, "
+                                f"unexpected {sorted(set(header) - set(expected))[:5]})")
+    if verify:
+        digest = hashlib.sha256(memoryview(mapping)[data_start:]).hexdigest()
+        if digest != manifest["sha256"]:
+            raise WeightFormatError(f"{path}: sha256 {digest} does not match the manifest {manifest['sha256']}")
+
+    _check_offsets(path, header, manifest["data_bytes"])
+    tensors = {}
+    for name, info in header.items():
+        if info["dtype"] != expected[name]["dtype"] or info["shape"] != expected[name]["shape"]:
+            raise WeightFormatError(f"{path}: {name} is {info['dtype']}{info['shape']}, "
+                                    f"manifest says {expected[name]['dtype']}{expected[name]['shape']}")
+        dtype = TORCH_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        if count == 0:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(mapping, dtype=dtype, count=count, offset=data_start + start).view(info["shape"])
+    return tensors, manifest
+
+
+def _check_offsets(path, header: dict, data_bytes: int):
+    """Every entry must have a known dtype and a byte range of numel x itemsize; ranges tile the data exactly."""
+    spans = []
+    for name, info in header.items():
+        try:
+            dtype = TORCH_DTYPES[info["dtype"]]
+            shape = [int(dim) for dim in info["shape"]]
+            start, end = (int(offset) for offset in info["data_offsets"])
+        except (KeyError, TypeError, ValueError):
+            raise WeightFormatError(f"{path}: malformed header entry for {name}: {info}")
+        numel = 1
+        for dim in shape:
+            if dim < 0:
+                raise WeightFormatError(f"{path}: {name} has a negative dimension {shape}")
+            numel *= dim
+        size = numel * torch.empty((), dtype=dtype).element_size()
+        if end - start != size:
+            raise WeightFormatError(f"{path}: {name} spans {end - start} bytes, {info['dtype']}{shape} needs {size}")
+        spans.append((start, end, name))
+
+    position = 0
+    for start, end, name in sorted(spans):
+        if start != position:
+            raise WeightFormatError(f"{path}: {name} starts at byte {start}, expected {position} (gap or overlap)")
+        position = end
+    if position != data_bytes:
+        raise WeightFormatError(f"{path}: tensors cover {position} bytes of {data_bytes} data bytes")
+
+
+def load_into(module: torch.nn.Module, tensors: Dict[str, torch.Tensor], path="") -> torch.nn.Module:
+    """Assign `tensors` as the parameters / buffers of `module` (no copy); any key mismatch is an error."""
+    own = module.state_dict()
+    missing, unexpected = sorted(set(own) - set(tensors)), sorted(set(tensors) - set(own))
+    wrong_shape = [name for name in set(own) & set(tensors) if own[name].shape != tensors[name].shape]
+    if missing or unexpected or wrong_shape:
+        raise WeightFormatError(f"{path}: weights do not fit {type(module).__name__} "
+                                f"(missing {missing[:5]}, unexpected {unexpected[:5]}, wrong shape {wrong_shape[:5]})")
+    module.load_state_dict(tensors, strict=True, assign=True)
+    return module
+
+
+def _memory_kb() -> Dict[str, int]:
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith(("VmRSS", "VmHWM")))
+        return {key: int(value.split()[0]) for key, value in fields.items()}
+    except OSError:
+        return {}
+
+
+def process_memory_mb() -> Dict[str, float]:
+    """Current and peak RSS of this process (empty off Linux)."""
+    memory = _memory_kb()
+    if not memory:
+        return {}
+    return {"rss_mb": round(memory["VmRSS"] / 1024, 1), "peak_rss_mb": round(memory["VmHWM"] / 1024, 1)}
+
+
+class LoadStats:
+    """Wall time, RSS growth and peak RSS growth of a `with` block (memory on Linux only)."""
+
+    def __init__(self, weight_format: str):
+        self.report = {"format": weight_format}
+
+    def __enter__(self):
+        self._before = _memory_kb()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.report["seconds"] = round(time.perf_counter() - self._start, 4)
+        after = _memory_kb()
+        if self._before and after:
+            self.report["rss_delta_mb"] = round((after["VmRSS"] - self._before["VmRSS"]) / 1024, 1)
+            # VmHWM là đỉnh của cả process: chỉ tăng nếu lúc load vượt đỉnh cũ
+            self.report["peak_rss_delta_mb"] = round((after["VmHWM"] - self._before["VmHWM"]) / 1024, 1)
+        return False
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_yolo(path, verify: bool = ModelConfig.WEIGHT_VERIFY_HASH):
+    """Build the ultralytics YOLO model from the architecture file of the manifest and map the weights into it."""
+    from ultralytics import YOLO
+
+    path = Path(path)
+    tensors, manifest = load_weights(path, verify)
+    if manifest.get("kind") != "yolo":
+        raise WeightFormatError(f"{path} holds {manifest.get('kind')!r} weights, not a YOLO detector")
+    model = YOLO(str(path.parent / manifest["config_file"]), task=manifest.get("task", "detect"))
+    load_into(model.model, tensors, path)
+    model.model.names = {int(key): value for key, value in manifest.get("names", {}).items()}
+    model.model.eval()
+    return model
+
+
+def yolo_config(net, config_path) -> dict:
+    """Architecture dict of an ultralytics model, pinned to its scale so it rebuilds the same layers."""
+    from ultralytics.nn.tasks import guess_model_scale
+
+    config = {key: value for key, value in net.yaml.items() if key != "yaml_file"}
+    scales = config.get("scales")
+    if scales:
+        scale = config.get("scale") or next(iter(scales))
+        # ultralytics đoán lại scale từ tên file khi đọc yaml, giữ đúng một scale dưới đúng tên đó
+        config["scales"] = {guess_model_scale(config_path) or scale: scales[scale]}
+        config.pop("scale", None)
+    return config
@@ -1,5 +1,4 @@
 from pathlib import Path
-import io
 import sys
 import numpy as np
 import cv2
@@ -7,12 +6,15 @@ import torch
 
 from typing import List, Tuple, Optional
 from PIL import Image
-from ultralytics import YOLO
 from src.emotion_classification.config.detect_cfg import YoloConfig
-from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
-from app.utils import Logger, AppPath, save_cache
-from torchvision import transforms
+from src.emotion_classification.utils.executor import EXECUTOR
+from src.emotion_classification.utils.processor import ScaledImage, decode_for_detection, pad_boxes
+from src.emotion_classification.utils.tracker import FaceTracker
+from src.emotion_classification.utils.emotion_smoother import TrackEmotionSmoother
+from app.utils import Logger, AppPath, METRICS, file_fingerprint
 from .emotion_predictor import Predictor
+from .detector_backends import UltralyticsBackend, OnnxYoloBackend, OpenCVYoloBackend
+from .weight_store import SUFFIX, LoadStats, load_yolo
 from .resnet_model import ResNet, Block
 Resnet = ResNet
 
@@ -31,24 +33,53 @@ class FacesDetector:
         model_weight: Optional[Path] = "src/emotion_classification/models/weights/yolov8n-face-lindevs.pt",
         conf_threshold: float = YoloConfig.YOLO_CONFIG_THRESHOLD,
         iou_threshold: float = YoloConfig.YOLO_IOU_THRESHOLD,
-        device: str = "cpu"
+        device: str = "cpu",
+        backend: str = YoloConfig.DETECTOR_BACKEND,
+        onnx_weight: Optional[Path] = None
     ):
         self.model_name = model_name
         self.model_weight = Path(model_weight)
+        self.onnx_weight = Path(onnx_weight) if onnx_weight is not None else self.model_weight.with_suffix(".onnx")
         self.conf_threshold = conf_threshold
         self.iou_threshold = iou_threshold
         self.device = device
+        self.backend_name = backend
+        self.model = None
+        self.weights_report = None
         self._load_model()
+        # Định danh model + weights + backend + ngưỡng, dùng làm một phần key của result cache
+        weight = self.model_weight if backend == "ultralytics" else self.onnx_weight
+        self.cache_tag = (f"{self.model_name}|{self.backend_name}|{file_fingerprint(weight)}"
+                          f"|{self.conf_threshold}|{self.iou_threshold}")
 
     def _load_model(self):
+        if self.backend_name == "onnxruntime":
+            self.backend = OnnxYoloBackend(self.onnx_weight)
+            return
+        if self.backend_name == "opencv":
+            self.backend = OpenCVYoloBackend(self.onnx_weight)
+            return
+        if self.backend_name != "ultralytics":
+            raise ValueError(f"Unknown detector backend: {self.backend_name}")
+
         try:
-            if not self.model_weight.exists():
+            # ultralytics import mất ~1 s, chỉ cần khi dùng backend này
+            from ultralytics import YOLO
+            if self.model_weight.suffix == SUFFIX:
+                # Weights đã convert: kiến trúc từ manifest, tensor mmap không copy
+                with LoadStats("safetensors") as stats:
+                    self.model = load_yolo(self.model_weight)
+                self.weights_report = stats.report
+            elif not self.model_weight.exists():
                 self.model = YOLO('yolov8n-face-lindevs.pt')
                 self.model_weight.parent.mkdir(parents=True, exist_ok=True)
             else:
-                self.model = YOLO(str(self.model_weight))
+                with LoadStats("pickle") as stats:
+                    self.model = YOLO(str(self.model_weight))
+                self.weights_report = stats.report
 
             self.model.to(self.device)
+            self.backend = UltralyticsBackend(self.model)
             # LOGGER.log.info(
             #     f"Successfully loaded model: {self.model_name} from {self.model_weight}")
 
@@ -56,53 +87,32 @@ class FacesDetector:
             # LOGGER.log.error(f"Fail to load model: {str(e)}")
             raise RuntimeError(f"Failed to load YOLO model: {e}")
 
-    async def detect_faces(
-        self,
-        image,
-        image_name: str
-    ):
-        image = image.read()
-        pil_img = Image.open(io.BytesIO(image))
-
-        # if isinstance(image, bytes):
-        #     nparr = np.frombuffer(image, np.uint8)
-        #     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        # else:
-        #     image_bytes = await image.read()
-        #     nparr = np.frombuffer(image_bytes, np.uint8)
-        #     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        # # LOGGER.save_requests(pil_img, image_name)
-
-        if pil_img.mode == "RGBA":
-            pil_img = pil_img.convert("RGB")
-
-        results = self.model.predict(
-            pil_img,
-            conf=self.conf_threshold,
-            iou=self.iou_threshold,
-            classes=[YoloConfig.YOLO_PERSON_CLASS_ID],
-            verbose=False
-        )
+    def detect(self, image) -> List[Tuple[int, int, int, int, float]]:
+        """Blocking detection on a PIL image or BGR array, returns (x1, y1, x2, y2, conf) tuples."""
+        return self.backend.detect(image, self.conf_threshold, self.iou_threshold)
 
-        faces = []
+    def detect_scaled(self, scaled: ScaledImage) -> List[Tuple[int, int, int, int, float]]:
+        """Detect on a reduced-resolution decode, boxes in original image coordinates."""
+        return scaled.to_original(self.detect(scaled.image))
 
-        if len(results) > 0:
-            result = results[0]
+    def detect_batch(self, images: list) -> List[List[Tuple[int, int, int, int, float]]]:
+        """detect for several images in one backend call."""
+        return self.backend.detect_batch(images, self.conf_threshold, self.iou_threshold)
 
-            if result.boxes is not None and len(result.boxes) > 0:
-                boxes = result.boxes.xyxy.cpu().numpy()
-                confidences = result.boxes.conf.cpu().numpy()
+    def detect_scaled_batch(self, scaled_images: List[ScaledImage]) -> List[List[Tuple[int, int, int, int, float]]]:
+        """detect_scaled for several images in one backend call."""
+        batch_faces = self.detect_batch([scaled.image for scaled in scaled_images])
+        return [scaled.to_original(faces) for scaled, faces in zip(scaled_images, batch_faces)]
 
-                for box, conf in zip(boxes, confidences):
-                    x1, y1, x2, y2 = map(int, box)
-                    faces.append((x1, y1, x2, y2, float(conf)))
-
-        # LOGGER.log_model(self.model_name)
-        # LOGGER.log_response(x1, y1, x2, y2, float(conf))
-
-        # torch.cuda.empty_cache()
-
-        return faces
+    async def detect_faces(
+        self,
+        image: bytes,
+        image_name: str
+    ):
+        with METRICS.stage("detect", "decode"):
+            scaled = await EXECUTOR.run_decode(decode_for_detection, image)
+        with METRICS.stage("detect", "detect"):
+            return await EXECUTOR.run_inference(self.detect_scaled, scaled)
 
     def visualize_detections(
         self,
@@ -111,6 +121,7 @@ class FacesDetector:
         color: Tuple[int, int, int] = (0, 255, 0),
         thickness: int = 2
     ) -> Image:
+        from torchvision import transforms
         transform = transforms.ToTensor()
         output = transform(image)
 
@@ -153,9 +164,8 @@ async def test_detector_realtime():
         device="cpu"
     )
 
-    face_buffer = []
-    last_label = "Initializing..."
-    batch_size = 5
+    tracker = FaceTracker()
+    smoother = TrackEmotionSmoother()
 
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
@@ -169,46 +179,21 @@ async def test_detector_realtime():
         if not ret:
             break
 
-        results = detector.model.predict(
-            frame,
-            conf=detector.conf_threshold,
-            iou=detector.iou_threshold,
-            classes=[YoloConfig.YOLO_PERSON_CLASS_ID],
-            verbose=False
-        )
-
-        if len(results) > 0:
-            result = results[0]
-            boxes = result.boxes.xyxy.cpu().numpy()
-            confidences = result.boxes.conf.cpu().numpy()
-
-            for box, conf in zip(boxes, confidences):
-                x1, y1, x2, y2 = map(int, box)
-                cv2.rectangle(frame, (x1 - 50, y1 - 50),
-                              (x2 + 50, y2 + 50), (0, 255, 0), 2)
-                cv2.putText(frame, last_label, (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-                face_img = frame[y1 - 50: y2 + 50, x1 - 50: x2 + 50]
-
-                if face_img.size > 0:
-                    face_img = Image.fromarray(face_img)
-                    predictor.create_transform()
-                    transform = predictor.transforms_
-                    face_tensor = transform(face_img)
-                    face_buffer.append(face_tensor)
-
-                    if len(face_buffer) == batch_size:
-                        input_batch = torch.stack(face_buffer).to(device)
-
-                        with torch.no_grad():
-                            outputs = predictor.model(input_batch)
-                            probs = torch.softmax(outputs, dim=1)
-                            avg_probs = torch.mean(probs, dim=0)
-                            max_idx = torch.argmax(avg_probs).item()
-                            last_label = f"{EmotionDataConfig.ID2LABEL[max_idx]} ({avg_probs[max_idx]*100:.1f}%)"
-
-                        face_buffer = []
+        tracks = tracker.step_tracks(frame, detector.detect)
+        faces = [track.as_face() for track in tracks]
+        h, w = frame.shape[:2]
+        boxes, keep = pad_boxes(faces, w, h, pad=50)
+        track_ids = [tracks[i].track_id for i in keep]
+
+        # Mỗi khuôn mặt có nhãn riêng, đã làm mượt theo thời gian
+        smoother.step(frame, track_ids, boxes, tracker.frame_idx, predictor.forward, bgr=True)
+        smoother.prune(track.track_id for track in tracker.tracks)
+
+        for (x1_p, y1_p, x2_p, y2_p), i, track_id in zip(boxes.tolist(), keep, track_ids):
+            x1, y1 = faces[i][:2]
+            cv2.rectangle(frame, (x1_p, y1_p), (x2_p, y2_p), (0, 255, 0), 2)
+            cv2.putText(frame, f"#{track_id} {smoother.label(track_id)}", (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
         cv2.imshow('Realtime Detection', frame)
 
@@ -0,0 +1,323 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import cv2
+
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+from src.emotion_classification.config.serving_cfg import CameraConfig
+from src.emotion_classification.utils.processor import encode_jpeg
+
+
+class FrameSource:
+    """A blocking frame producer owned by the capture thread."""
+
+    def open(self):
+        pass
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class DeviceSource(FrameSource):
+    """Local camera through cv2.VideoCapture; the device paces the reads."""
+
+    def __init__(self, index: int = 0):
+        self.index = index
+        self.capture = None
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.index)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Cannot open camera {self.index}")
+
+    def read(self):
+        return self.capture.read()
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class _PacedSource(FrameSource):
+    def __init__(self, fps: float):
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self._next_time = None
+
+    def _wait_turn(self):
+        # Giữ đúng nhịp fps như camera thật
+        now = time.perf_counter()
+        if self._next_time is None:
+            self._next_time = now
+        elif self._next_time > now:
+            time.sleep(self._next_time - now)
+        self._next_time = max(self._next_time + self.interval, time.perf_counter())
+
+
+class VideoFileSource(_PacedSource):
+    """Video file played back at `fps`, looping by default."""
+
+    def __init__(self, path, fps: float = CameraConfig.FPS, loop: bool = CameraConfig.LOOP_VIDEO):
+        super().__init__(fps)
+        self.path = Path(path)
+        self.loop = loop
+        self.capture = None
+
+    def open(self):
+        self.capture = cv2.VideoCapture(str(self.path))
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Cannot open video {self.path}")
+
+    def read(self):
+        self._wait_turn()
+        ret, frame = self.capture.read()
+        if not ret and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        return ret, frame
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class SyntheticSource(_PacedSource):
+    """Moving test pattern, for running the stream without a camera."""
+
+    def __init__(
+        self,
+        width: int = CameraConfig.SYNTHETIC_WIDTH,
+        height: int = CameraConfig.SYNTHETIC_HEIGHT,
+        fps: float = CameraConfig.FPS,
+        max_frames: Optional[int] = None
+    ):
+        super().__init__(fps)
+        self.width = width
+        self.height = height
+        self.max_frames = max_frames
+        self.frame_idx = 0
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        self._background = np.dstack([np.tile(gradient, (height, 1))] * 3)
+
+    def read(self):
+        if self.max_frames is not None and self.frame_idx >= self.max_frames:
+            return False, None
+        self._wait_turn()
+        frame = self._background.copy()
+        t = self.frame_idx
+        center = (int(self.width / 2 + self.width / 4 * np.sin(t / 20)), int(self.height / 2 + self.height / 6 * np.cos(t / 15)))
+        cv2.circle(frame, center, min(self.width, self.height) // 8, (200, 180, 160), -1)
+        cv2.putText(frame, f"#{t}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        self.frame_idx += 1
+        return True, frame
+
+
+def make_source(spec: str = CameraConfig.SOURCE) -> FrameSource:
+    """'0', '1'... → camera device, 'synthetic' → test pattern, anything else → video file."""
+    if spec == "synthetic":
+        return SyntheticSource()
+    if spec.isdigit():
+        return DeviceSource(int(spec))
+    return VideoFileSource(spec)
+
+
+class Subscription:
+    """One viewer of the camera stream. Holds at most one undelivered frame: a newer frame replaces it."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.delivered = 0
+        self.dropped = 0
+        self._slot = asyncio.Queue(maxsize=1)
+
+    def _put(self, item):
+        # Chạy trên event loop (call_soon_threadsafe)
+        if self._slot.full():
+            self._slot.get_nowait()
+            self.dropped += 1
+        self._slot.put_nowait(item)
+
+    async def get(self) -> Optional[Tuple[int, bytes]]:
+        """Newest (seq, jpeg_bytes), or None once the capture has stopped."""
+        item = await self._slot.get()
+        if item is not None:
+            self.delivered += 1
+        return item
+
+
+class CameraService:
+    """
+    Owns the server camera. A capture thread keeps reading the source into a small ring
+    buffer; a pipeline thread takes the newest frame, runs `process_fn` (detect, classify,
+    annotate) and JPEG-encodes it once, and the result is broadcast to every subscriber.
+    Slow subscribers lose frames instead of queueing them. The source is opened on the
+    first subscription and released when the last subscriber leaves.
+    """
+
+    def __init__(
+        self,
+        source_factory: Callable[[], FrameSource] = make_source,
+        pipeline_factory: Optional[Callable[[], Callable[[np.ndarray], np.ndarray]]] = None,
+        ring_size: int = CameraConfig.RING_SIZE
+    ):
+        self.source_factory = source_factory
+        self.pipeline_factory = pipeline_factory
+        self.ring_size = ring_size
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._frame_ready = threading.Condition()
+        self._ring = deque(maxlen=ring_size)
+        self._subscribers = set()
+        self._stop_event: Optional[threading.Event] = None
+        self._threads = []
+        self._source_done = False
+        self.captured = 0
+        self.processed = 0
+        self.skipped = 0
+        self.error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    async def subscribe(self) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+        # Mở camera có thể mất vài trăm ms, không chạy trên event loop
+        try:
+            await asyncio.to_thread(self._ensure_running)
+        except BaseException:
+            self.unsubscribe(subscription)
+            raise
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            if not self._subscribers and self._stop_event is not None:
+                self._stop_event.set()
+
+    def _ensure_running(self):
+        with self._start_lock:
+            if self.running and not self._stop_event.is_set():
+                return
+            # Chờ lượt chạy trước nhả camera rồi mới mở lại
+            for thread in self._threads:
+                thread.join()
+
+            source = None
+            try:
+                # Load model trước khi mở camera: lỗi load không giữ camera mở
+                process_fn = self.pipeline_factory() if self.pipeline_factory is not None else None
+                source = self.source_factory()
+                source.open()
+            except Exception as e:
+                if source is not None:
+                    source.release()
+                self.error = str(e)
+                self._threads = []
+                self._broadcast(None)
+                return
+
+            self.error = None
+            self._ring.clear()
+            self._source_done = False
+            self._stop_event = threading.Event()
+            self._threads = [
+                threading.Thread(target=self._capture_loop, args=(source, self._stop_event),
+                                 name="camera-capture", daemon=True),
+                threading.Thread(target=self._pipeline_loop, args=(process_fn, self._stop_event),
+                                 name="camera-pipeline", daemon=True),
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _capture_loop(self, source: FrameSource, stop_event: threading.Event):
+        try:
+            while not stop_event.is_set():
+                ret, frame = source.read()
+                if not ret:
+                    break
+                with self._frame_ready:
+                    self.captured += 1
+                    self._ring.append((self.captured, frame))
+                    self._frame_ready.notify_all()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            source.release()
+            with self._frame_ready:
+                self._source_done = True
+                self._frame_ready.notify_all()
+
+    def _pipeline_loop(self, process_fn, stop_event: threading.Event):
+        last_seq = self._ring[-1][0] if self._ring else 0
+        while not stop_event.is_set():
+            with self._frame_ready:
+                while not stop_event.is_set() and not self._source_done and \
+                        not (self._ring and self._ring[-1][0] > last_seq):
+                    self._frame_ready.wait(0.5)
+                if not (self._ring and self._ring[-1][0] > last_seq):
+                    break
+                # Luôn lấy frame mới nhất, bỏ qua các frame cũ hơn trong ring
+                seq, frame = self._ring[-1]
+
+            self.skipped += seq - last_seq - 1
+            last_seq = seq
+            try:
+                if process_fn is not None:
+                    frame = process_fn(frame)
+                jpeg_bytes = encode_jpeg(frame)
+            except Exception as e:
+                self.error = str(e)
+                continue
+            if jpeg_bytes is not None:
+                self.processed += 1
+                self._broadcast((seq, jpeg_bytes))
+
+        if not stop_event.is_set():
+            # Nguồn đã hết (video kết thúc, camera lỗi) → báo cho các viewer
+            self._broadcast(None)
+
+    def _broadcast(self, item):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, item)
+            except RuntimeError:
+                # Event loop của viewer đã đóng
+                pass
+
+    def latest_frame(self) -> Optional[Tuple[int, np.ndarray]]:
+        with self._frame_ready:
+            return self._ring[-1] if self._ring else None
+
+    def stop(self, timeout: Optional[float] = 2.0):
+        with self._start_lock:
+            if self._stop_event is not None:
+                self._stop_event.set()
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "running": self.running,
+            "subscribers": len(subscribers),
+            "captured": self.captured,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "dropped_per_subscriber": [subscription.dropped for subscription in subscribers],
+            "error": self.error,
+        }
@@ -0,0 +1,101 @@
+import numpy as np
+import cv2
+import torch
+
+from typing import Callable, Dict, Iterable, List, Optional
+from torch.nn import functional as F
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+from src.emotion_classification.utils.processor import crop_faces_batch
+
+THUMB_SIZE = 16
+
+
+def crop_thumbnail(frame: np.ndarray, box) -> np.ndarray:
+    """Tiny grayscale thumbnail of a crop, used to tell whether a face has changed since it was classified."""
+    x1, y1, x2, y2 = box
+    crop = frame[y1:y2, x1:x2]
+    return cv2.resize(crop, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32).mean(axis=2)
+
+
+class TrackEmotionSmoother:
+    """
+    Per-track emotion state for video streams.
+    Each track keeps an exponential moving average of its softmax output. A track is
+    only sent to the classifier when it is new, when its crop has changed noticeably
+    since the last classification, or after `max_frames` frames; other frames reuse
+    the smoothed probabilities. One smoother per stream, paired with a FaceTracker.
+    """
+
+    def __init__(
+        self,
+        alpha: float = ModelConfig.EMOTION_EMA_ALPHA,
+        crop_diff: float = ModelConfig.RECLASSIFY_CROP_DIFF,
+        max_frames: int = ModelConfig.RECLASSIFY_MAX_FRAMES
+    ):
+        self.alpha = alpha
+        self.crop_diff = crop_diff
+        self.max_frames = max_frames
+        self._probs: Dict[int, torch.Tensor] = {}
+        self._thumbs: Dict[int, np.ndarray] = {}
+        self._classified_at: Dict[int, int] = {}
+        self.classified = 0
+
+    def needs_update(self, track_id: int, thumb: np.ndarray, frame_idx: int) -> bool:
+        if track_id not in self._probs:
+            return True
+        if frame_idx - self._classified_at[track_id] >= self.max_frames:
+            return True
+        return float(np.abs(thumb - self._thumbs[track_id]).mean()) > self.crop_diff
+
+    def update(self, track_id: int, probs: torch.Tensor, thumb: np.ndarray, frame_idx: int):
+        previous = self._probs.get(track_id)
+        self._probs[track_id] = probs if previous is None else self.alpha * probs + (1 - self.alpha) * previous
+        self._thumbs[track_id] = thumb
+        self._classified_at[track_id] = frame_idx
+
+    def probs(self, track_id: int) -> Optional[torch.Tensor]:
+        return self._probs.get(track_id)
+
+    def label(self, track_id: int) -> str:
+        probs = self._probs.get(track_id)
+        if probs is None:
+            return "Initializing..."
+        max_idx = int(torch.argmax(probs))
+        return f"{EmotionDataConfig.ID2LABEL[max_idx]} ({probs[max_idx] * 100:.1f}%)"
+
+    def prune(self, track_ids: Iterable[int]):
+        """Forget tracks that are no longer followed."""
+        alive = set(track_ids)
+        for track_id in list(self._probs):
+            if track_id not in alive:
+                del self._probs[track_id]
+                del self._thumbs[track_id]
+                del self._classified_at[track_id]
+
+    def step(
+        self,
+        frame: np.ndarray,
+        track_ids: List[int],
+        boxes: np.ndarray,
+        frame_idx: int,
+        forward_fn: Callable[[torch.Tensor], torch.Tensor],
+        bgr: bool = True,
+        crop_fn: Callable[..., torch.Tensor] = crop_faces_batch
+    ) -> Dict[int, torch.Tensor]:
+        """
+        Classify the tracks that need it in one batch and return the smoothed probabilities
+        of every track in `track_ids`. `boxes` are the padded (N, 4) crop boxes, in the same order.
+        `crop_fn` builds the classifier batch (crop + preprocess), replaceable e.g. to time it.
+        """
+        thumbs = [crop_thumbnail(frame, box) for box in boxes.tolist()]
+        pending = [i for i, track_id in enumerate(track_ids)
+                   if self.needs_update(track_id, thumbs[i], frame_idx)]
+
+        if pending:
+            batch = crop_fn(frame, boxes[pending], bgr=bgr)
+            probs = F.softmax(forward_fn(batch), dim=1)
+            for row, i in enumerate(pending):
+                self.update(track_ids[i], probs[row], thumbs[i], frame_idx)
+            self.classified += len(pending)
+
+        return {track_id: self._probs[track_id] for track_id in track_ids}
@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+import threading
+
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
+from src.emotion_classification.config.serving_cfg import ExecutorConfig
+
+
+class InferenceExecutor:
+    """
+    Runs blocking decode / detect / classify work outside the asyncio event loop.
+    Inference always goes to a thread pool (the models are shared in-process);
+    decoding can use a thread pool or, for pure functions on bytes, a process pool.
+    The number of jobs running or waiting at the same time is bounded by `max_concurrent_jobs`.
+    """
+
+    def __init__(
+        self,
+        inference_workers: int = ExecutorConfig.INFERENCE_WORKERS,
+        decode_workers: int = ExecutorConfig.DECODE_WORKERS,
+        decode_pool: str = ExecutorConfig.DECODE_POOL,
+        max_concurrent_jobs: int = ExecutorConfig.MAX_CONCURRENT_JOBS
+    ):
+        if decode_pool not in ("thread", "process"):
+            raise ValueError(f"Unknown decode pool: {decode_pool}")
+        self.inference_workers = inference_workers
+        self.decode_workers = decode_workers
+        self.decode_pool = decode_pool
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._lock = threading.Lock()
+        self._inference_executor: Optional[Executor] = None
+        self._decode_executor: Optional[Executor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active_jobs = 0
+
+    def _get_inference_executor(self) -> Executor:
+        with self._lock:
+            if self._inference_executor is None:
+                self._inference_executor = ThreadPoolExecutor(
+                    max_workers=self.inference_workers, thread_name_prefix="inference")
+            return self._inference_executor
+
+    def _get_decode_executor(self) -> Executor:
+        with self._lock:
+            if self._decode_executor is None:
+                if self.decode_pool == "process":
+                    # spawn: không fork process đang giữ thread pool của torch
+                    self._decode_executor = ProcessPoolExecutor(
+                        max_workers=self.decode_workers,
+                        mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    self._decode_executor = ThreadPoolExecutor(
+                        max_workers=self.decode_workers, thread_name_prefix="decode")
+            return self._decode_executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+        return self._semaphore
+
+    async def _submit(self, executor: Executor, fn, *args):
+        async with self._get_semaphore():
+            self.active_jobs += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            finally:
+                self.active_jobs -= 1
+
+    async def run_inference(self, fn, *args):
+        """Run a detect/classify step in the inference thread pool."""
+        return await self._submit(self._get_inference_executor(), fn, *args)
+
+    async def run_decode(self, fn, *args):
+        """Run a decode step; with a process pool `fn` and its arguments must be picklable."""
+        return await self._submit(self._get_decode_executor(), fn, *args)
+
+    def stats(self) -> dict:
+        return {
+            "inference_workers": self.inference_workers,
+            "decode_pool": self.decode_pool,
+            "decode_workers": self.decode_workers,
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "active_jobs": self.active_jobs,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            for executor in (self._inference_executor, self._decode_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+            self._inference_executor = None
+            self._decode_executor = None
+
+
+EXECUTOR = InferenceExecutor()
@@ -0,0 +1,186 @@
+import itertools
+import numpy as np
+import cv2
+
+from typing import Callable, List, Optional, Tuple
+from src.emotion_classification.config.detect_cfg import YoloConfig
+
+Face = Tuple[int, int, int, int, float]
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes, shape (N, M)."""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def greedy_match(iou: np.ndarray, threshold: float) -> List[Tuple[int, int]]:
+    """Match rows to columns by descending IoU, each used at most once."""
+    matches = []
+    if iou.size == 0:
+        return matches
+    used_rows, used_cols = set(), set()
+    for flat_idx in np.argsort(-iou, axis=None):
+        row, col = np.unravel_index(flat_idx, iou.shape)
+        if iou[row, col] < threshold:
+            break
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matches.append((int(row), int(col)))
+    return matches
+
+
+class Track:
+    """One face followed across frames."""
+
+    def __init__(self, track_id: int, box: np.ndarray, confidence: float, frame_idx: int):
+        self.track_id = track_id
+        self.box = box.astype(np.float32)
+        self.detected_box = self.box.copy()
+        self.confidence = confidence
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.last_detected = frame_idx
+        self.hits = 1
+        self.misses = 0
+
+    def as_face(self) -> Face:
+        x1, y1, x2, y2 = np.round(self.box).astype(int).tolist()
+        return x1, y1, x2, y2, float(self.confidence)
+
+
+class FaceTracker:
+    """
+    Lightweight IoU tracker for video streams.
+    The detector only runs every `detect_interval` frames (or earlier when a track's
+    confidence has decayed below `min_confidence`); in between, boxes are moved with
+    a constant-velocity model or, optionally, sparse Lucas-Kanade optical flow.
+    One tracker per stream: it keeps the previous frame and the frame counter.
+    """
+
+    def __init__(
+        self,
+        detect_interval: int = YoloConfig.DETECT_INTERVAL,
+        iou_threshold: float = YoloConfig.TRACK_IOU_THRESHOLD,
+        max_misses: int = YoloConfig.TRACK_MAX_MISSES,
+        confidence_decay: float = YoloConfig.TRACK_CONFIDENCE_DECAY,
+        min_confidence: float = YoloConfig.TRACK_MIN_CONFIDENCE,
+        use_optical_flow: bool = YoloConfig.TRACK_USE_OPTICAL_FLOW
+    ):
+        self.detect_interval = max(1, detect_interval)
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.confidence_decay = confidence_decay
+        self.min_confidence = min_confidence
+        self.use_optical_flow = use_optical_flow
+        self.tracks: List[Track] = []
+        self.frame_idx = -1
+        self.detections_run = 0
+        self._last_detect_idx: Optional[int] = None
+        self._prev_gray: Optional[np.ndarray] = None
+        self._ids = itertools.count(1)
+
+    def needs_detection(self) -> bool:
+        if self._last_detect_idx is None:
+            return True
+        if self.frame_idx - self._last_detect_idx >= self.detect_interval:
+            return True
+        return any(track.confidence < self.min_confidence for track in self.tracks)
+
+    def step(self, frame: np.ndarray, detect_fn: Callable[[np.ndarray], List[Face]]) -> List[Face]:
+        """Advance one frame; calls `detect_fn(frame)` only when needed. Returns faces like the detector."""
+        return [track.as_face() for track in self.step_tracks(frame, detect_fn)]
+
+    def step_tracks(self, frame: np.ndarray, detect_fn: Callable[[np.ndarray], List[Face]]) -> List[Track]:
+        self.frame_idx += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if self.use_optical_flow else None
+
+        if self.needs_detection():
+            self.update(detect_fn(frame))
+        else:
+            self._propagate(gray, frame.shape[1], frame.shape[0])
+
+        self._prev_gray = gray
+        return [track for track in self.tracks if track.misses == 0]
+
+    def update(self, faces: List[Face]) -> List[Track]:
+        """Associate fresh detections with existing tracks."""
+        self._last_detect_idx = self.frame_idx
+        self.detections_run += 1
+
+        det_boxes = np.array([face[:4] for face in faces], dtype=np.float32).reshape(-1, 4)
+        track_boxes = np.array([track.box for track in self.tracks], dtype=np.float32).reshape(-1, 4)
+        matches = greedy_match(iou_matrix(track_boxes, det_boxes), self.iou_threshold)
+
+        matched_tracks, matched_dets = set(), set()
+        for track_idx, det_idx in matches:
+            track = self.tracks[track_idx]
+            # Vận tốc tính giữa 2 lần detect liên tiếp, không dùng box đã dời
+            elapsed = max(1, self.frame_idx - track.last_detected)
+            track.velocity = (det_boxes[det_idx] - track.detected_box) / elapsed
+            track.box = det_boxes[det_idx].copy()
+            track.detected_box = track.box.copy()
+            track.confidence = float(faces[det_idx][4])
+            track.last_detected = self.frame_idx
+            track.hits += 1
+            track.misses = 0
+            matched_tracks.add(track_idx)
+            matched_dets.add(det_idx)
+
+        alive = []
+        for idx, track in enumerate(self.tracks):
+            if idx not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            alive.append(track)
+
+        for det_idx in range(len(faces)):
+            if det_idx not in matched_dets:
+                alive.append(Track(next(self._ids), det_boxes[det_idx], float(faces[det_idx][4]), self.frame_idx))
+
+        self.tracks = alive
+        return self.tracks
+
+    def _propagate(self, gray: Optional[np.ndarray], width: int, height: int):
+        for track in self.tracks:
+            if track.misses > 0:
+                continue
+            shift = None
+            if gray is not None and self._prev_gray is not None:
+                shift = self._flow_shift(self._prev_gray, gray, track.box)
+            if shift is None:
+                track.box = track.box + track.velocity
+            else:
+                track.box = track.box + np.array([shift[0], shift[1], shift[0], shift[1]], dtype=np.float32)
+            track.box[[0, 2]] = np.clip(track.box[[0, 2]], 0, width - 1)
+            track.box[[1, 3]] = np.clip(track.box[[1, 3]], 0, height - 1)
+            track.confidence *= self.confidence_decay
+
+    @staticmethod
+    def _flow_shift(prev_gray: np.ndarray, gray: np.ndarray, box: np.ndarray) -> Optional[Tuple[float, float]]:
+        """Median displacement of corner features inside `box`, None if too few points were tracked."""
+        x1, y1, x2, y2 = np.round(box).astype(int)
+        if x2 - x1 < 8 or y2 - y1 < 8:
+            return None
+        # Tìm góc trong vùng box thay vì cả frame cho nhanh
+        points = cv2.goodFeaturesToTrack(prev_gray[y1:y2, x1:x2], maxCorners=30, qualityLevel=0.01, minDistance=3)
+        if points is None or len(points) < 3:
+            return None
+        points = points + np.array([x1, y1], dtype=np.float32)
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None, winSize=(15, 15), maxLevel=2)
+        good = status.reshape(-1) == 1
+        if good.sum() < 3:
+            return None
+        delta = (next_points[good] - points[good]).reshape(-1, 2)
+        dx, dy = np.median(delta, axis=0)
+        return float(dx), float(dy)
@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+from src.emotion_classification.config.serving_cfg import VideoConfig
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
+
+# (frame index trong video gốc, thời điểm tính bằng giây, frame BGR)
+SampledFrame = Tuple[int, float, np.ndarray]
+
+
+class VideoSampler:
+    """
+    Reads a video file as a stream and keeps every `step`-th frame. Skipped frames are only
+    grabbed (demuxed), not decoded to BGR, so sampling at a low rate is cheap.
+    `step` comes from `every` when given, otherwise from `fps` relative to the file's frame rate.
+    """
+
+    def __init__(self, path, every: Optional[int] = None, fps: Optional[float] = None):
+        self.capture = cv2.VideoCapture(str(path))
+        if not self.capture.isOpened():
+            raise ValueError("Cannot open the uploaded video")
+        self.source_fps = self.capture.get(cv2.CAP_PROP_FPS) or VideoConfig.FALLBACK_FPS
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if every is None:
+            target_fps = fps if fps else VideoConfig.SAMPLE_FPS
+            every = round(self.source_fps / target_fps)
+        self.step = max(1, int(every))
+        self.frame_idx = 0
+        self.sampled = 0
+        self.finished = False
+
+    @property
+    def sample_fps(self) -> float:
+        return self.source_fps / self.step
+
+    def read_chunk(self, n: int) -> List[SampledFrame]:
+        """Next `n` sampled frames (fewer at the end of the video)."""
+        frames = []
+        while len(frames) < n and not self.finished:
+            if not self.capture.grab():
+                self.finished = True
+                break
+            idx = self.frame_idx
+            self.frame_idx += 1
+            if idx % self.step:
+                continue
+            ret, frame = self.capture.retrieve()
+            if not ret:
+                continue
+            frames.append((idx, idx / self.source_fps, frame))
+            self.sampled += 1
+        return frames
+
+    def release(self):
+        self.capture.release()
+
+
+class EmotionTimeline:
+    """
+    Per-track emotion probabilities averaged over fixed time windows.
+    Frames are added in time order; `closed_windows(t)` returns every window that ended
+    before `t` and can therefore no longer change.
+    """
+
+    def __init__(self, window_seconds: float = VideoConfig.WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._window = 0
+        self._tracks: Dict[int, dict] = {}
+        self._frames = 0
+
+    def add(self, t: float, track_ids: List[int], boxes: np.ndarray, probs: np.ndarray) -> List[dict]:
+        """Add the classified tracks of one sampled frame; returns the windows closed by it."""
+        closed = self.closed_windows(t)
+        self._frames += 1
+        for track_id, box, track_probs in zip(track_ids, boxes.tolist(), probs):
+            entry = self._tracks.setdefault(track_id, {"frames": 0, "probs": np.zeros(len(track_probs))})
+            entry["frames"] += 1
+            entry["probs"] += track_probs
+            entry["box"] = box
+        return closed
+
+    def closed_windows(self, t: float) -> List[dict]:
+        closed = []
+        while t >= (self._window + 1) * self.window_seconds:
+            closed.append(self._flush())
+        return closed
+
+    def finish(self) -> List[dict]:
+        return [self._flush()] if self._frames > 0 or self._tracks else []
+
+    def _flush(self) -> dict:
+        tracks = []
+        for track_id, entry in sorted(self._tracks.items()):
+            probs = entry["probs"] / entry["frames"]
+            best = int(probs.argmax())
+            tracks.append({
+                "track_id": track_id,
+                "frames": entry["frames"],
+                "box": entry["box"],
+                "predicted_class": EmotionDataConfig.ID2LABEL[best],
+                "best_prob": round(float(probs[best]), 4),
+                "probs": [round(float(p), 4) for p in probs],
+            })
+        window = {
+            "type": "window",
+            "start": round(self._window * self.window_seconds, 3),
+            "end": round((self._window + 1) * self.window_seconds, 3),
+            "frames": self._frames,
+            "tracks": tracks,
+        }
+        self._window += 1
+        self._tracks = {}
+        self._frames = 0
+        return window
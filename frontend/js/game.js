@@ -57,6 +57,9 @@ const FRAME_SEND_INTERVAL = 500; // ms giữa mỗi lần gửi frame
 let emotionWS = null;
 let frameSendTimer = null;
 let faceDetected = false;
+let frameSeq = 0;              // số thứ tự frame đã gửi (khớp với result.seq)
+const frameSentAt = new Map(); // seq → thời điểm gửi
+let frameLatency = null;       // độ trễ end-to-end của kết quả gần nhất (ms)
 
 // Canvas ẩn để chụp frame từ webcam
 const captureCanvas = document.createElement('canvas');
@@ -66,6 +69,9 @@ function connectEmotionWS() {
     if (emotionWS && emotionWS.readyState === WebSocket.OPEN) return;
 
     emotionWS = new WebSocket(WS_URL);
+    frameSeq = 0;
+    frameSentAt.clear();
+    frameLatency = null;
 
     emotionWS.onopen = () => {
         console.log('[EmotionWS] Connected');
@@ -76,6 +82,7 @@ function connectEmotionWS() {
         try {
             const result = JSON.parse(event.data);
             faceDetected = result.face_detected;
+            trackLatency(result.seq);
 
             if (result.face_detected && result.emotion) {
                 lastDetectedEmotion = result.emotion;
@@ -89,6 +96,8 @@ function connectEmotionWS() {
                 faceDetected = false;
                 hudEmotion.textContent = '⚠️ Không thấy mặt';
             }
+            // Hiện độ trễ gửi frame → nhận kết quả để người chơi biết nhận diện đang chậm
+            hudEmotion.textContent += latencyLabel();
         } catch (e) {
             console.warn('[EmotionWS] Parse error:', e);
         }
@@ -134,8 +143,27 @@ function sendFrame() {
     captureCanvas.height = 240;
     captureCtx.drawImage(video, 0, 0, 320, 240);
 
-    const dataUrl = captureCanvas.toDataURL('image/jpeg', 0.6);
-    emotionWS.send(dataUrl);
+    // Gửi JPEG dạng binary thay vì base64 dataURL
+    captureCanvas.toBlob((blob) => {
+        if (!blob || !emotionWS || emotionWS.readyState !== WebSocket.OPEN) return;
+        frameSeq += 1;
+        frameSentAt.set(frameSeq, performance.now());
+        emotionWS.send(blob);
+    }, 'image/jpeg', 0.6);
+}
+
+function trackLatency(seq) {
+    if (seq === undefined) return;
+    const sentAt = frameSentAt.get(seq);
+    // Các frame cũ hơn đã bị server bỏ qua
+    for (const key of frameSentAt.keys()) {
+        if (key <= seq) frameSentAt.delete(key);
+    }
+    if (sentAt !== undefined) frameLatency = performance.now() - sentAt;
+}
+
+function latencyLabel() {
+    return frameLatency === null ? '' : ` · ${Math.round(frameLatency)} ms`;
 }
 
 
@@ -277,6 +277,9 @@ function clearResults() {
 let cameraSource = 'server';
 let clientStream = null;   // MediaStream from getUserMedia
 let captureInterval = null; // setInterval ID for frame capture
+let frameSeq = 0;           // số thứ tự frame đã gửi (khớp với seq server trả về)
+const frameSentAt = new Map(); // seq → thời điểm gửi, để đo độ trễ end-to-end
+let lastLatencyLog = 0;
 
 const btnSourceServer = document.getElementById('btn-source-server');
 const btnSourceClient = document.getElementById('btn-source-client');
@@ -367,7 +370,9 @@ async function startClientStream() {
     // Connect to client WebSocket endpoint
     const wsProto = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
     socket = new WebSocket(`${wsProto}//${window.location.host}/v1/emotion_classification/ws-client`);
-    socket.binaryType = 'blob';
+    socket.binaryType = 'arraybuffer';
+    frameSeq = 0;
+    frameSentAt.clear();
 
     socket.onopen = () => {
         btnToggleText.textContent = 'Dừng Camera';
@@ -381,10 +386,12 @@ async function startClientStream() {
     };
 
     socket.onmessage = (event) => {
-        // Receive annotated frame from server
-        const url = URL.createObjectURL(event.data);
+        // Receive annotated frame from server: 4-byte big-endian seq + JPEG
+        const seq = new DataView(event.data, 0, 4).getUint32(0);
+        const url = URL.createObjectURL(new Blob([event.data.slice(4)], { type: 'image/jpeg' }));
         streamImg.src = url;
         streamImg.onload = () => URL.revokeObjectURL(url);
+        logLatency(seq);
     };
 
     socket.onclose = () => {
@@ -406,11 +413,31 @@ function startFrameCapture() {
         clientCanvas.height = clientVideo.videoHeight;
         ctx.drawImage(clientVideo, 0, 0);
 
-        const dataUrl = clientCanvas.toDataURL('image/jpeg', 0.7);
-        socket.send(dataUrl);
+        // Gửi JPEG dạng binary, nhỏ hơn ~33% so với base64 dataURL
+        clientCanvas.toBlob((blob) => {
+            if (!blob || !socket || socket.readyState !== WebSocket.OPEN) return;
+            frameSeq += 1;
+            frameSentAt.set(frameSeq, performance.now());
+            socket.send(blob);
+        }, 'image/jpeg', 0.7);
     }, 100); // ~10 FPS
 }
 
+function logLatency(seq) {
+    const sentAt = frameSentAt.get(seq);
+    // Frame cũ hơn seq đã bị server bỏ qua (chỉ xử lý frame mới nhất)
+    for (const key of frameSentAt.keys()) {
+        if (key <= seq) frameSentAt.delete(key);
+    }
+    if (sentAt === undefined) return;
+
+    const now = performance.now();
+    if (now - lastLatencyLog > 5000) {
+        lastLatencyLog = now;
+        addLogEntry(`Độ trễ frame #${seq}: ${(now - sentAt).toFixed(0)} ms`, '#818cf8');
+    }
+}
+
 // --- Stop everything ---
 function stopStream() {
     // Close WebSocket
@@ -0,0 +1,9 @@
+import os
+import sys
+
+from pathlib import Path
+
+# Module của backend import theo gốc backend/ (src.emotion_classification..., app.utils...)
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("YOLO_CONFIG_DIR", str(Path(os.getenv("TMPDIR", "/tmp")) / "Ultralytics"))
@@ -0,0 +1,57 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.middleware import BodySizeLimitMiddleware
+
+LIMIT = 1000
+
+
+def _client():
+    app = FastAPI()
+    handled = []
+
+    @app.post("/upload")
+    async def upload(file_upload: UploadFile = File(...)):
+        handled.append(file_upload.filename)
+        return {"size": len(await file_upload.read())}
+
+    @app.post("/other")
+    async def other(file_upload: UploadFile = File(...)):
+        return {"size": len(await file_upload.read())}
+
+    app.add_middleware(BodySizeLimitMiddleware, limits={"/upload": LIMIT}, overhead=0)
+    return TestClient(app), handled
+
+
+def _multipart(n_bytes):
+    boundary = "limit-test"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file_upload\"; filename=\"a.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + b"x" * n_bytes + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def test_declared_length_over_limit_is_rejected_before_parsing():
+    client, handled = _client()
+    body, headers = _multipart(2 * LIMIT)
+    response = client.post("/upload", content=body, headers=headers)
+    assert response.status_code == 413
+    assert not handled
+
+
+def test_streamed_body_over_limit_is_rejected():
+    client, handled = _client()
+    body, headers = _multipart(4 * LIMIT)
+    # Không có Content-Length (chunked): dừng khi body vượt giới hạn
+    chunks = (body[i:i + 256] for i in range(0, len(body), 256))
+    response = client.post("/upload", content=chunks, headers=headers)
+    assert response.status_code == 413
+    assert not handled
+
+
+def test_small_upload_and_other_routes_pass():
+    client, handled = _client()
+    body, headers = _multipart(LIMIT // 2)
+    assert client.post("/upload", content=body, headers=headers).json() == {"size": LIMIT // 2}
+    body, headers = _multipart(4 * LIMIT)
+    assert client.post("/other", content=body, headers=headers).json() == {"size": 4 * LIMIT}
+    assert handled == ["a.jpg"]
@@ -0,0 +1,42 @@
+import asyncio
+
+from src.emotion_classification.utils.camera import CameraService, SyntheticSource
+
+
+class TrackedSource(SyntheticSource):
+    def __init__(self):
+        super().__init__(width=64, height=48, fps=0)
+        self.opened = False
+        self.released = False
+
+    def open(self):
+        self.opened = True
+
+    def release(self):
+        self.released = True
+
+
+def test_pipeline_load_failure_leaves_camera_closed():
+    sources = []
+
+    def source_factory():
+        sources.append(TrackedSource())
+        return sources[-1]
+
+    def failing_pipeline():
+        raise RuntimeError("weights missing")
+
+    service = CameraService(source_factory=source_factory, pipeline_factory=failing_pipeline)
+
+    async def viewer():
+        subscription = await service.subscribe()
+        item = await asyncio.wait_for(subscription.get(), timeout=5)
+        service.unsubscribe(subscription)
+        return item
+
+    # Viewer nhận None (camera dừng) thay vì treo, camera không bị mở
+    assert asyncio.run(viewer()) is None
+    assert all(not source.opened or source.released for source in sources)
+    assert not service.running
+    assert service.error == "weights missing"
+    assert service.stats()["subscribers"] == 0
@@ -0,0 +1,62 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from starlette.requests import ClientDisconnect
+from app.routers.emotion_router import _SpooledVideoResponse
+from src.emotion_classification.utils.video import VideoSampler
+
+
+@pytest.fixture
+def spooled_video(tmp_path):
+    path = tmp_path / "upload.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(5):
+        writer.write(np.full((48, 64, 3), i * 40, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def _scope():
+    return {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}}
+
+
+async def _receive():
+    return {"type": "http.disconnect"}
+
+
+def test_temp_video_removed_when_client_leaves_before_first_line(spooled_video):
+    started = []
+
+    async def timeline():
+        started.append(True)
+        yield "{}\n"
+
+    async def gone(message):
+        # Client đã ngắt trước khi nhận header
+        raise OSError("connection reset")
+
+    response = _SpooledVideoResponse(timeline(), str(spooled_video), VideoSampler(spooled_video))
+    # Starlette mới đổi OSError thành ClientDisconnect, bản cũ để nguyên OSError
+    with pytest.raises((ClientDisconnect, OSError)):
+        asyncio.run(response(_scope(), _receive, gone))
+    assert not started
+    assert not spooled_video.exists()
+
+
+def test_temp_video_removed_after_full_stream(spooled_video):
+    sampler = VideoSampler(spooled_video, every=1)
+    sent = []
+
+    async def timeline():
+        while frames := sampler.read_chunk(2):
+            yield f"{len(frames)}\n"
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(_SpooledVideoResponse(timeline(), str(spooled_video), sampler)(_scope(), _receive, send))
+    assert b"".join(message.get("body", b"") for message in sent) == b"2\n2\n1\n"
+    assert not spooled_video.exists()
@@ -0,0 +1,38 @@
+import pytest
+import torch
+
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
+from src.emotion_classification.models.resnet_model import ResNet, Block
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from src.emotion_classification.models.export_onnx import check_onnx, export_onnx  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    torch.manual_seed(0)
+    model = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES).eval()
+    path = export_onnx(model, tmp_path_factory.mktemp("onnx") / "classifier.onnx")
+    return model, path
+
+
+def test_export_matches_torch(exported):
+    model, path = exported
+    assert path.exists()
+    diffs = check_onnx(model, path, batch_sizes=(1, 3))
+    assert set(diffs) == {1, 3}
+    assert max(diffs.values()) <= 1e-4
+
+
+def test_check_rejects_diverging_model(exported):
+    model, path = exported
+    with torch.no_grad():
+        model.fc[-1].bias.add_(1.0)
+    try:
+        with pytest.raises(ValueError, match="does not reproduce"):
+            check_onnx(model, path, batch_sizes=(1,))
+    finally:
+        with torch.no_grad():
+            model.fc[-1].bias.sub_(1.0)
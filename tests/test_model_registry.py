@@ -0,0 +1,20 @@
+import asyncio
+
+from src.emotion_classification.config.emotion_cfg import ModelConfig
+from src.emotion_classification.models import load_model
+from src.emotion_classification.models.model_registry import ModelRegistry
+
+
+def test_failed_download_is_reported_not_raised(tmp_path, monkeypatch):
+    def offline_download():
+        raise ConnectionError("drive.google.com unreachable")
+
+    monkeypatch.setattr(ModelConfig, "MODEL_WEIGHT", tmp_path / "missing.pt")
+    monkeypatch.setattr(load_model, "resnet_download", offline_download)
+
+    registry = ModelRegistry()
+    # Tải weights chạy trong thread warm-up: start_warmup trả về ngay
+    registry.start_warmup()
+    assert not asyncio.run(registry.wait_ready(timeout=30))
+    assert registry.state == "failed"
+    assert "ConnectionError" in registry.status()["error"]
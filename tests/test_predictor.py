@@ -0,0 +1,84 @@
+import gc
+import weakref
+
+import pytest
+import torch
+
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig, ModelConfig
+from src.emotion_classification.models import emotion_predictor
+from src.emotion_classification.models.resnet_model import ResNet, Block
+
+
+@pytest.fixture(scope="module")
+def resnet_weight(tmp_path_factory):
+    torch.manual_seed(0)
+    model = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES)
+    path = tmp_path_factory.mktemp("weights") / "resnet.pt"
+    torch.save(model.state_dict(), path)
+    return path
+
+
+def test_predictor_keeps_only_runtime_module(resnet_weight, monkeypatch):
+    loaded = []
+    load_resnet = emotion_predictor.load_resnet
+
+    def tracked_load_resnet(model_weight, device="cpu"):
+        model, report = load_resnet(model_weight, device)
+        loaded.append(weakref.ref(model))
+        return model, report
+
+    monkeypatch.setattr(emotion_predictor, "load_resnet", tracked_load_resnet)
+
+    predictor = emotion_predictor.Predictor(ModelConfig.MODEL_NAME, resnet_weight, backend="torch", precision="fp32")
+    gc.collect()
+
+    if predictor.optimization_report["mode"] == "off":
+        pytest.skip("graph optimization is disabled")
+    # Model gốc (chưa gộp BN) đã được giải phóng, Predictor chỉ giữ module backend đang chạy
+    assert loaded and loaded[0]() is None
+    assert predictor.model is predictor.backend.model
+
+    reference, _ = load_resnet(resnet_weight)
+    inputs = torch.randn(2, 3, EmotionDataConfig.IMG_SIZE, EmotionDataConfig.IMG_SIZE)
+    with torch.no_grad():
+        expected = reference.eval()(inputs)
+    assert (predictor.forward(inputs) - expected).abs().max().item() <= ModelConfig.GRAPH_OPT_TOLERANCE
+
+
+def _refuse_fp32_load(model_weight, device="cpu"):
+    raise AssertionError("the fp32 checkpoint must not be loaded in this mode")
+
+
+def test_int8_predictor_loads_only_the_int8_artifact(resnet_weight, tmp_path, monkeypatch):
+    from src.emotion_classification.models.quantization import quantize_model, save_quantized, synthetic_batches
+
+    state_dict = torch.load(resnet_weight, map_location="cpu")
+    int8_path = tmp_path / "resnet_int8.pt"
+    save_quantized(quantize_model(state_dict, synthetic_batches(4, 2)), int8_path)
+    monkeypatch.setattr(ModelConfig, "INT8_WEIGHT", int8_path)
+    monkeypatch.setattr(emotion_predictor, "load_resnet", _refuse_fp32_load)
+
+    predictor = emotion_predictor.Predictor(ModelConfig.MODEL_NAME, resnet_weight, backend="torch", precision="int8")
+    assert predictor.served_weight == int8_path
+    assert predictor.weights_report["format"] == "int8"
+    inputs = torch.randn(2, 3, EmotionDataConfig.IMG_SIZE, EmotionDataConfig.IMG_SIZE)
+    assert predictor.forward(inputs).shape == (2, EmotionDataConfig.N_CLASSES)
+
+
+def test_onnxruntime_predictor_skips_torch_weights(resnet_weight, tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from src.emotion_classification.models.export_onnx import export_onnx
+
+    reference, _ = emotion_predictor.load_resnet(resnet_weight)
+    onnx_path = export_onnx(reference.eval(), tmp_path / "classifier.onnx")
+    monkeypatch.setattr(ModelConfig, "ONNX_WEIGHT", onnx_path)
+    monkeypatch.setattr(emotion_predictor, "load_resnet", _refuse_fp32_load)
+
+    predictor = emotion_predictor.Predictor(ModelConfig.MODEL_NAME, resnet_weight, backend="onnxruntime", precision="fp32")
+    assert predictor.model is None
+    assert predictor.served_weight == onnx_path
+    inputs = torch.randn(2, 3, EmotionDataConfig.IMG_SIZE, EmotionDataConfig.IMG_SIZE)
+    with torch.no_grad():
+        expected = reference(inputs)
+    assert (predictor.forward(inputs) - expected).abs().max().item() <= ModelConfig.ONNX_CHECK_TOLERANCE
@@ -0,0 +1,58 @@
+import warnings
+
+import numpy as np
+import pytest
+import torchvision
+
+from PIL import Image
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
+from src.emotion_classification.utils.processor import Preprocessor
+
+# Sai lệch đã ghi trong docstring của Preprocessor: tối đa 2 bước làm tròn uint8
+MAX_ABS_DIFF = 2 / (255 * min(EmotionDataConfig.NORMALIZE_STD))
+MAX_MEAN_DIFF = 1e-3
+
+
+@pytest.fixture(scope="module")
+def reference_transform():
+    img_size = EmotionDataConfig.IMG_SIZE
+    return torchvision.transforms.Compose([
+        torchvision.transforms.Resize((img_size, img_size)),
+        torchvision.transforms.ToTensor(),
+        torchvision.transforms.Normalize(mean=EmotionDataConfig.NORMALIZE_MEAN, std=EmotionDataConfig.NORMALIZE_STD),
+    ])
+
+
+def _photo_like(height, width, seed):
+    # Gradient mượt + nhiễu: gần ảnh thật hơn nhiễu trắng thuần
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height)], axis=-1)
+    return np.clip(base + rng.normal(0, 20, base.shape), 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("size", [(480, 640), (100, 90), (224, 224), (37, 300)])
+def test_matches_torchvision_transform(reference_transform, size):
+    image = _photo_like(*size, seed=sum(size))
+    expected = reference_transform(Image.fromarray(image)).unsqueeze(0)
+    actual = Preprocessor()(image)
+    diff = (actual - expected).abs()
+    assert actual.shape == expected.shape
+    assert diff.max().item() <= MAX_ABS_DIFF
+    assert diff.mean().item() < MAX_MEAN_DIFF
+
+
+def test_bgr_input_matches_rgb():
+    image = _photo_like(120, 160, seed=1)
+    preprocessor = Preprocessor()
+    assert (preprocessor(image[..., ::-1].copy(), bgr=True) - preprocessor(image)).abs().max().item() == 0
+
+
+def test_read_only_image_does_not_warn():
+    # np.asarray trên ảnh PIL trả mảng read-only
+    image = np.asarray(Image.fromarray(_photo_like(64, 48, seed=2)))
+    assert not image.flags.writeable
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        batch = Preprocessor().crop_batch(image, np.array([[0, 0, 30, 40], [10, 5, 48, 64]]))
+    assert batch.shape == (2, 3, EmotionDataConfig.IMG_SIZE, EmotionDataConfig.IMG_SIZE)
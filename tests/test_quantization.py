@@ -0,0 +1,84 @@
+import io
+
+import numpy as np
+import pytest
+import torch
+
+from PIL import Image
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
+from src.emotion_classification.models.quantization import (
+    compare, image_batches, labelled_images, quantize_model, synthetic_batches
+)
+from src.emotion_classification.models.resnet_model import ResNet, Block
+
+CLASSES = ["Angry", "Happy", "Sad"]
+
+
+def _jpeg(value: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (48, 48), (value, value, value)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class BrightnessModel(torch.nn.Module):
+    """Predicts the class whose training brightness is closest to the mean of the image."""
+
+    def __init__(self, class_means: dict):
+        super().__init__()
+        self.class_ids = torch.tensor(list(class_means))
+        self.means = torch.tensor(list(class_means.values()))
+
+    def forward(self, x):
+        distance = (x.mean(dim=(1, 2, 3))[:, None] - self.means[None]).abs()
+        logits = torch.full((len(x), EmotionDataConfig.N_CLASSES), -1e4)
+        logits[torch.arange(len(x)), self.class_ids[distance.argmin(1)]] = 0.0
+        return logits
+
+
+def test_corrupt_image_does_not_shift_labels(tmp_path):
+    brightness = {name: 40 + 80 * i for i, name in enumerate(CLASSES)}
+    for name, value in brightness.items():
+        (tmp_path / name).mkdir()
+        for i in range(3):
+            (tmp_path / name / f"{i}.jpg").write_bytes(_jpeg(value))
+    # File hỏng ở lớp đầu tiên: mọi nhãn phía sau sẽ lệch nếu nhãn không bị bỏ cùng ảnh
+    (tmp_path / "Angry" / "00_broken.jpg").write_bytes(b"not a jpeg")
+
+    paths, labels = labelled_images(tmp_path)
+    assert len(paths) == len(labels) == 10
+
+    pairs = list(image_batches(paths, batch_size=4, labels=labels))
+    assert sum(len(batch) for batch, _ in pairs) == 9
+    assert all(len(batch) == len(batch_labels) for batch, batch_labels in pairs)
+
+    class_means = {}
+    for batch, batch_labels in pairs:
+        for image, label in zip(batch, batch_labels.tolist()):
+            class_means.setdefault(label, image.mean().item())
+    model = BrightnessModel(class_means)
+
+    report = compare(model, model, image_batches(paths, batch_size=4, labels=labels))
+    assert report["images"] == 9
+    assert report["fp32_accuracy"] == 1.0
+    assert report["int8_accuracy"] == 1.0
+    assert report["top1_agreement"] == 1.0
+
+
+def test_unlabelled_batches_are_tensors(tmp_path):
+    paths = []
+    for i, data in enumerate([_jpeg(100), b"broken", _jpeg(200)]):
+        path = tmp_path / f"{i}.jpg"
+        path.write_bytes(data)
+        paths.append(path)
+    batches = list(image_batches(paths, batch_size=8))
+    assert len(batches) == 1 and isinstance(batches[0], torch.Tensor)
+    assert batches[0].shape[0] == 2
+    assert np.isfinite(batches[0].numpy()).all()
+
+
+def test_quantize_rejects_mismatched_checkpoint():
+    state_dict = ResNet(Block, EmotionDataConfig.N_BLOCK_LST, num_classes=EmotionDataConfig.N_CLASSES).state_dict()
+    # Checkpoint thiếu key (sai model) không được calibrate thành artifact INT8
+    state_dict.pop("conv1.weight")
+    with pytest.raises(RuntimeError, match="conv1.weight"):
+        quantize_model(state_dict, synthetic_batches(2, 2))
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+from app.utils.result_cache import ResultCache
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = ResultCache(disk_path=path)
+    cache.set("a", {"label": "happy"})
+    # Ghi đĩa chạy ở thread nền
+    cache.flush()
+
+    restarted = ResultCache(disk_path=path)
+    assert asyncio.run(restarted.aget("a")) == {"label": "happy"}
+    assert asyncio.run(restarted.aget("b")) is None
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["misses"]) == (1, 1)
+    # Hit trên đĩa được đưa lên tầng memory
+    assert asyncio.run(restarted.aget("a")) == {"label": "happy"}
+    assert restarted.stats()["hits"] == 1
+
+
+def test_sqlite_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ResultCache(disk_path=tmp_path / "cache.sqlite3")
+    threads = {}
+    get_disk, connect = cache._get_disk, cache._connect
+
+    def tracked_get_disk(*args):
+        threads["read"] = threading.current_thread()
+        return get_disk(*args)
+
+    def tracked_connect():
+        threads.setdefault("connect", []).append(threading.current_thread())
+        return connect()
+
+    monkeypatch.setattr(cache, "_get_disk", tracked_get_disk)
+    monkeypatch.setattr(cache, "_connect", tracked_connect)
+
+    async def handler():
+        cache.set("a", {"label": "sad"})
+        await cache.aget("missing")
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(handler())
+    cache.flush()
+    assert threads["read"] is not loop_thread
+    assert loop_thread not in threads["connect"]
+    assert any(thread.name == "result-cache-writer" for thread in threads["connect"])
@@ -0,0 +1,46 @@
+from concurrent.futures import Future
+
+import torch
+
+from score import BulkScorer, output_columns
+from src.emotion_classification.config.emotion_cfg import EmotionDataConfig
+
+
+def _scorer(mode):
+    # Không load model: chỉ kiểm tra cách dựng dòng kết quả
+    scorer = BulkScorer.__new__(BulkScorer)
+    scorer.mode = mode
+    scorer.n_classes = EmotionDataConfig.N_CLASSES
+    return scorer
+
+
+def _failed(error):
+    future = Future()
+    future.set_exception(error)
+    return future
+
+
+def test_classifier_error_becomes_error_rows():
+    items = [
+        {"source": "a.jpg", "faces": [(1, (0, 0, 10, 10, 0.9)), (2, (5, 5, 20, 20, 0.8))]},
+        {"source": "no_face.jpg", "faces": []},
+        {"source": "broken.jpg", "error": "UnidentifiedImageError: cannot identify image"},
+    ]
+    rows = _scorer("analyze").batch_rows(items, _failed(RuntimeError("out of memory")))
+
+    columns = output_columns()
+    assert all(len(row) == len(columns) for row in rows)
+    by_source = {row[0]: row for row in rows}
+    assert len(rows) == 3
+    assert by_source["a.jpg"][-1] == "RuntimeError: out of memory"
+    assert by_source["no_face.jpg"][1] == 0 and by_source["no_face.jpg"][-1] == ""
+    assert by_source["broken.jpg"][-1].startswith("UnidentifiedImageError")
+
+
+def test_classified_batch_rows():
+    future = Future()
+    future.set_result(torch.eye(EmotionDataConfig.N_CLASSES)[:2])
+    rows = _scorer("predict").batch_rows([{"source": "a.jpg"}, {"source": "b.jpg"}], future)
+    predicted = output_columns().index("predicted_class")
+    assert [row[predicted] for row in rows] == [EmotionDataConfig.ID2LABEL[0], EmotionDataConfig.ID2LABEL[1]]
+    assert all(row[-1] == "" for row in rows)
@@ -0,0 +1,10 @@
+from server import respawn_delay
+from src.emotion_classification.config.serving_cfg import WorkerConfig
+
+
+def test_respawn_delay_backs_off_exponentially():
+    base = WorkerConfig.RESPAWN_BACKOFF_SECONDS
+    # Worker đã chạy ổn định → fork lại ngay
+    assert respawn_delay(0) == 0.0
+    assert [respawn_delay(n) for n in (1, 2, 3)] == [base, 2 * base, 4 * base]
+    assert respawn_delay(100) == WorkerConfig.RESPAWN_MAX_BACKOFF_SECONDS
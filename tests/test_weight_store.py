@@ -0,0 +1,169 @@
+import json
+import struct
+
+import pytest
+import torch
+
+from src.emotion_classification.models.weight_store import (
+    WeightFormatError, load_into, load_weights, manifest_path, save_weights
+)
+
+
+class TinyNet(torch.nn.Module):
+    def __init__(self, out_features: int = 3):
+        super().__init__()
+        self.linear = torch.nn.Linear(4, out_features)
+        self.bn = torch.nn.BatchNorm1d(out_features)
+
+
+def _rewrite_header(path, mutate):
+    """Parse the header, let `mutate` edit it and write the file back with the same data bytes."""
+    raw = path.read_bytes()
+    header_size = struct.unpack("<Q", raw[:8])[0]
+    header = json.loads(raw[8:8 + header_size])
+    mutate(header)
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (-(8 + len(header_bytes)) % 8)
+    path.write_bytes(struct.pack("<Q", len(header_bytes)) + header_bytes + raw[8 + header_size:])
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    torch.manual_seed(0)
+    net = TinyNet()
+    path = tmp_path / "tiny.safetensors"
+    save_weights(net.state_dict(), path, {"kind": "tiny"})
+    return net, path
+
+
+def test_round_trip(artifact):
+    net, path = artifact
+    tensors, manifest = load_weights(path, verify=True)
+    assert manifest["kind"] == "tiny"
+    assert set(tensors) == set(net.state_dict())
+    for name, value in net.state_dict().items():
+        assert tensors[name].dtype == value.dtype
+        assert torch.equal(tensors[name], value)
+        assert manifest["tensors"][name]["shape"] == list(value.shape)
+
+    with torch.device("meta"):
+        fresh = TinyNet()
+    load_into(fresh, tensors, path)
+    assert torch.equal(fresh.linear.weight, net.linear.weight)
+    # Gán thẳng, không copy
+    assert fresh.linear.weight.data_ptr() == tensors["linear.weight"].data_ptr()
+
+
+def test_missing_key(artifact):
+    _, path = artifact
+    tensors, _ = load_weights(path)
+    del tensors["linear.bias"]
+    with pytest.raises(WeightFormatError, match="missing"):
+        load_into(TinyNet(), tensors, path)
+
+
+def test_unexpected_key(artifact):
+    _, path = artifact
+    tensors, _ = load_weights(path)
+    tensors["extra.weight"] = torch.zeros(2)
+    with pytest.raises(WeightFormatError, match="unexpected"):
+        load_into(TinyNet(), tensors, path)
+
+
+def test_wrong_shape(artifact):
+    _, path = artifact
+    tensors, _ = load_weights(path)
+    with pytest.raises(WeightFormatError, match="wrong shape"):
+        load_into(TinyNet(out_features=5), tensors, path)
+
+
+def test_corrupt_data_fails_hash(artifact):
+    _, path = artifact
+    raw = bytearray(path.read_bytes())
+    raw[-1] ^= 0xFF
+    path.write_bytes(bytes(raw))
+    with pytest.raises(WeightFormatError, match="sha256"):
+        load_weights(path, verify=True)
+
+
+def test_header_tensor_not_in_manifest(artifact):
+    _, path = artifact
+    _rewrite_header(path, lambda header: header.update({"linear.weight2": header.pop("linear.weight")}))
+    with pytest.raises(WeightFormatError, match="differ from the manifest"):
+        load_weights(path, verify=False)
+
+
+def test_header_shape_differs_from_manifest(artifact):
+    _, path = artifact
+
+    def reshape(header):
+        header["linear.weight"]["shape"] = [4, 3]
+    _rewrite_header(path, reshape)
+    with pytest.raises(WeightFormatError, match="manifest says"):
+        load_weights(path, verify=False)
+
+
+def test_offsets_not_matching_size(artifact):
+    _, path = artifact
+
+    def shrink(header):
+        start, end = header["linear.weight"]["data_offsets"]
+        header["linear.weight"]["data_offsets"] = [start, end - 4]
+    _rewrite_header(path, shrink)
+    with pytest.raises(WeightFormatError, match="needs"):
+        load_weights(path, verify=False)
+
+
+def test_overlapping_offsets(artifact):
+    _, path = artifact
+
+    def overlap(header):
+        # Hai tensor cùng kích thước đổi sang cùng một vùng byte
+        header["bn.running_var"]["data_offsets"] = list(header["bn.running_mean"]["data_offsets"])
+    _rewrite_header(path, overlap)
+    with pytest.raises(WeightFormatError, match="gap or overlap"):
+        load_weights(path, verify=False)
+
+
+def test_offsets_past_data(artifact):
+    _, path = artifact
+
+    def shift(header):
+        for info in header.values():
+            if isinstance(info, dict) and "data_offsets" in info:
+                info["data_offsets"] = [info["data_offsets"][0] + 8, info["data_offsets"][1] + 8]
+    _rewrite_header(path, shift)
+    with pytest.raises(WeightFormatError):
+        load_weights(path, verify=False)
+
+
+def test_malformed_header_entry(artifact):
+    _, path = artifact
+
+    def break_entry(header):
+        header["linear.bias"]["data_offsets"] = "nonsense"
+    _rewrite_header(path, break_entry)
+    with pytest.raises(WeightFormatError, match="malformed"):
+        load_weights(path, verify=False)
+
+
+def test_missing_manifest(artifact):
+    _, path = artifact
+    manifest_path(path).unlink()
+    with pytest.raises(WeightFormatError, match="Manifest"):
+        load_weights(path)
+
+
+@pytest.mark.parametrize("size", [0, 5])
+def test_truncated_file(artifact, size):
+    _, path = artifact
+    path.write_bytes(path.read_bytes()[:size])
+    with pytest.raises(WeightFormatError, match="too small"):
+        load_weights(path)
+
+
+def test_missing_data_file(artifact):
+    _, path = artifact
+    path.unlink()
+    with pytest.raises(WeightFormatError, match="missing"):
+        load_weights(path)